@@ -20,6 +20,40 @@ def create_app(config_class=Config):
     app.register_blueprint(admin.bp)
     app.register_blueprint(chatbot.bp)
     
+    # Memory-map the exported network snapshot so workers start without a database build
+    try:
+        from app.chatbot_modules.transit_graph import load_graph_snapshot
+        load_graph_snapshot(app.config.get('NETWORK_SNAPSHOT_PATH'))
+    except Exception as e:
+        print(f"Warning: Network snapshot not loaded: {e}")
+    
+    # Load the precomputed contraction hierarchies for both edge metrics
+    try:
+        from app.chatbot_modules.contraction import load_hierarchy_artifact, hierarchy_artifact_path
+        for metric in ('distance', 'fare'):
+            load_hierarchy_artifact(hierarchy_artifact_path(app.config.get('CONTRACTION_HIERARCHY_PATH'), metric), metric)
+    except Exception as e:
+        print(f"Warning: Contraction hierarchy not loaded: {e}")
+    
+    # Load the precomputed ALT landmarks for both edge metrics
+    try:
+        from app.chatbot_modules.landmarks import load_landmark_artifact, landmark_artifact_path
+        for metric in ('distance', 'fare'):
+            load_landmark_artifact(landmark_artifact_path(app.config.get('LANDMARKS_PATH'), metric), metric)
+    except Exception as e:
+        print(f"Warning: Landmarks not loaded: {e}")
+    
+    # Share the location catalogue between workers through a file, so only one of them queries the tables
+    try:
+        from app.chatbot_modules.location_catalog import load_location_catalog_file
+        load_location_catalog_file(app.config.get('LOCATION_CATALOG_PATH'))
+    except Exception as e:
+        print(f"Warning: Location catalog not loaded: {e}")
+    
+    # Patch the shared transit graph when routes or stops are edited
+    from app.chatbot_modules.transit_graph import register_route_listeners
+    register_route_listeners()
+    
     # Root route
     @app.route('/')
     def index():
@@ -4,193 +4,886 @@ Implements Dijkstra's and Greedy algorithms for route optimization
 """
 
 import heapq
-from app.models.database_models import Route, Stop
+import math
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from scipy.sparse.csgraph import dijkstra as sparse_dijkstra
+from flask import current_app, has_app_context
+from app.models.database_models import Route
+from .cache import LRUCache
+from .transit_graph import get_transit_graph, WALK_ROUTE
+from .raptor import get_raptor_planner, DEFAULT_MAX_TRANSFERS
+from .contraction import get_contraction_hierarchy
+from .landmarks import get_landmarks
+from .live_speeds import get_live_speed_table
+
+# Edge weight arrays of the transit graph
+DISTANCE = 'distance'
+FARE = 'fare'
+# Fare model where boarding a route costs its flat fare once, however far you ride
+ROUTE_FARE = 'route_fare'
+
+# Search engines for point-to-point queries
+DIJKSTRA = 'dijkstra'
+ASTAR = 'astar'
+BIDIRECTIONAL = 'bidirectional'
+CONTRACTION = 'ch'
+ALT = 'alt'
+ENGINES = (DIJKSTRA, ASTAR, BIDIRECTIONAL, CONTRACTION, ALT)
+
+# Outcome of a graph search; expanded counts the nodes settled by the engine
+SearchResult = namedtuple('SearchResult', ['route_id', 'cost', 'path', 'expanded'])
+
+# Point-to-point result cache defaults (PATH_CACHE_SIZE / PATH_CACHE_TTL_SECONDS)
+DEFAULT_PATH_CACHE_SIZE = 4096
+DEFAULT_PATH_CACHE_TTL_SECONDS = 600
+
+# Alternative itineraries (Yen's algorithm)
+DEFAULT_ALTERNATIVES = 3
+MAX_ALTERNATIVES = 5
+# Edge paths explored per requested itinerary; the same legs can be ridden on a
+# route's direct edge or on its stop-by-stop segments, and those repeats are skipped
+YEN_PATHS_PER_ALTERNATIVE = 4
+
+# Default budget for "where can I go from here" queries
+DEFAULT_REACH_KM = 10.0
+
+# Batch origin-destination matrices: rows are distinct origins, columns distinct
+# destinations, NaN where a destination is unknown or unreachable; fare is the
+# ROUTE_FARE ticket price
+ODMatrix = namedtuple('ODMatrix', ['origins', 'destinations', 'distance', 'fare'])
+# Below this many distinct origins the pool costs more than it saves
+BATCH_MIN_PARALLEL_ORIGINS = 16
+BATCH_CHUNKS_PER_PROCESS = 4
+# Sources per dense tree block; each block holds sources x stops costs per metric
+BATCH_MAX_CHUNK = 64
 
 class PathfindingAlgorithms:
     """Implements pathfinding algorithms for route optimization"""
     
     @staticmethod
-    def dijkstra_shortest_path(source, destination):
+    def dijkstra_shortest_path(source, destination, engine=DIJKSTRA):
         """
         Dijkstra's algorithm to find shortest path by distance
+        engine: one of ENGINES (DIJKSTRA, ASTAR, BIDIRECTIONAL, CONTRACTION, ALT)
         Returns: (shortest_route, total_distance, path)
         """
         try:
-            # Build graph from routes
-            graph = {}  # {location: [(neighbor, distance, route_obj), ...]}
-            all_routes = Route.query.filter_by(is_active=True).all()
-            
-            for route in all_routes:
-                start = route.start_location
-                end = route.end_location
-                distance = float(route.distance_km) if route.distance_km else 999999
-                
-                if start not in graph:
-                    graph[start] = []
-                graph[start].append((end, distance, route))
-                
-                # Add stops as intermediate nodes
-                stops = Stop.query.filter_by(route_id=route.id).order_by(Stop.stop_order).all()
-                prev_stop = start
-                for stop in stops:
-                    stop_name = stop.stop_name
-                    stop_distance = distance / (len(stops) + 1) if stops else distance
-                    
-                    if prev_stop not in graph:
-                        graph[prev_stop] = []
-                    graph[prev_stop].append((stop_name, stop_distance, route))
-                    prev_stop = stop_name
-                
-                # Connect last stop to end
-                if stops and prev_stop != end:
-                    if prev_stop not in graph:
-                        graph[prev_stop] = []
-                    graph[prev_stop].append((end, distance / (len(stops) + 1), route))
-            
-            # Dijkstra's algorithm
-            distances = {node: float('inf') for node in graph}
-            distances[source] = 0
-            previous = {node: None for node in graph}
-            route_used = {node: None for node in graph}
-            pq = [(0, source)]
-            visited = set()
+            graph = get_transit_graph()
+            route_id, total_distance, path, _ = PathfindingAlgorithms.cached_search(
+                graph, source, destination, DISTANCE, engine=engine
+            )
             
-            while pq:
-                current_dist, current = heapq.heappop(pq)
-                
-                if current in visited:
-                    continue
-                visited.add(current)
-                
-                if current == destination:
-                    break
-                
-                if current not in graph:
-                    continue
-                
-                for neighbor, weight, route in graph[current]:
-                    distance = current_dist + weight
-                    
-                    if distance < distances.get(neighbor, float('inf')):
-                        distances[neighbor] = distance
-                        previous[neighbor] = current
-                        route_used[neighbor] = route
-                        heapq.heappush(pq, (distance, neighbor))
-            
-            # Reconstruct path
-            if distances.get(destination, float('inf')) == float('inf'):
+            if path is None:
                 return None, None, None
             
-            path = []
-            current = destination
-            while current is not None:
-                path.append(current)
-                current = previous.get(current)
-            path.reverse()
+            shortest_route = Route.query.get(route_id) if route_id else None
             
-            shortest_route = route_used.get(destination)
-            
-            if len(path) == 2 and shortest_route:
-                total_distance = float(shortest_route.distance_km) if shortest_route.distance_km else distances[destination]
-            else:
-                total_distance = distances[destination]
+            if len(path) == 2 and shortest_route and shortest_route.distance_km:
+                total_distance = float(shortest_route.distance_km)
             
             return shortest_route, total_distance, path
-            
+        
         except Exception as e:
             print(f"Dijkstra error: {e}")
             return None, None, None
     
+    @staticmethod
+    def astar_shortest_path(source, destination):
+        """
+        A* search to find shortest path by distance using a great-circle bound
+        Returns: (shortest_route, total_distance, path)
+        """
+        return PathfindingAlgorithms.dijkstra_shortest_path(source, destination, engine=ASTAR)
+    
     @staticmethod
     def greedy_minimum_fare(source, destination):
         """
-        Greedy algorithm to find minimum fare route
+        Minimum fare route, paying each boarded route's fare once (ROUTE_FARE)
         Returns: (cheapest_route, total_fare, path)
         """
         try:
-            # Build graph from routes with fare as weight
-            graph = {}  # {location: [(neighbor, fare, route_obj), ...]}
-            all_routes = Route.query.filter_by(is_active=True).all()
-            
-            for route in all_routes:
-                start = route.start_location
-                end = route.end_location
-                fare = float(route.fare)
-                
-                if start not in graph:
-                    graph[start] = []
-                graph[start].append((end, fare, route))
-                
-                # Add stops
-                stops = Stop.query.filter_by(route_id=route.id).order_by(Stop.stop_order).all()
-                prev_stop = start
-                for stop in stops:
-                    stop_name = stop.stop_name
-                    stop_fare = fare / (len(stops) + 1) if stops else fare
-                    
-                    if prev_stop not in graph:
-                        graph[prev_stop] = []
-                    graph[prev_stop].append((stop_name, stop_fare, route))
-                    prev_stop = stop_name
+            graph = get_transit_graph()
+            route_id, total_fare, path, _ = PathfindingAlgorithms.cached_search(graph, source, destination, ROUTE_FARE)
+            
+            if path is None:
+                return None, None, None
+            
+            cheapest_route = Route.query.get(route_id) if route_id else None
+            return cheapest_route, total_fare, path
+        
+        except Exception as e:
+            print(f"Greedy error: {e}")
+            return None, None, None
+    
+    @staticmethod
+    def plan_journeys(source, destination, departure=None, max_transfers=DEFAULT_MAX_TRANSFERS):
+        """
+        RAPTOR journey planner: trade-offs between arrival time and transfers
+        departure: 'HH:MM', datetime/time or None for now
+        Returns: list of journey dicts, fewest transfers first
+        """
+        try:
+            return get_raptor_planner().plan(source, destination, departure, max_transfers)
+        except Exception as e:
+            print(f"RAPTOR error: {e}")
+            return []
+    
+    @staticmethod
+    def fastest_right_now(source, destination):
+        """
+        Fastest path by current travel time: live route speeds where buses are
+        reporting, scheduled durations elsewhere (no database access)
+        Returns: itinerary dict with 'minutes' and 'live_routes', or None
+        """
+        try:
+            graph = get_transit_graph()
+            minutes, live_routes = get_live_speed_table().edge_minutes(graph)
+            itinerary = PathfindingAlgorithms.timed_path(graph, source, destination, minutes)
+            if itinerary is not None:
+                itinerary['live_routes'] = live_routes
+            return itinerary
+        except Exception as e:
+            print(f"Live fastest path error: {e}")
+            return None
+    
+    @staticmethod
+    def k_shortest_paths(source, destination, k=DEFAULT_ALTERNATIVES, metric=DISTANCE):
+        """
+        Yen's algorithm: the k cheapest loopless itineraries by distance or fare
+        (see yen_k_shortest for how fares are ranked)
+        Returns: list of itinerary dicts, cheapest first
+        """
+        try:
+            graph = get_transit_graph()
+            return PathfindingAlgorithms.yen_k_shortest(graph, source, destination, metric, k)
+        except Exception as e:
+            print(f"Yen error: {e}")
+            return []
+    
+    @staticmethod
+    def reachable_stops(source, budget, metric=DISTANCE):
+        """
+        Isochrone: every stop reachable from source within budget km (DISTANCE)
+        or ₹ (ROUTE_FARE)
+        Returns: list of reachable stop dicts, nearest first
+        """
+        try:
+            graph = get_transit_graph()
+            return PathfindingAlgorithms.reachable_within(graph, source, budget, metric)
+        except Exception as e:
+            print(f"Reachability error: {e}")
+            return []
+    
+    @staticmethod
+    def od_matrix(pairs, processes=None):
+        """
+        Shortest distance and minimum ticket fare for many (source, destination) pairs
+        processes: worker processes (default: CPU count, 1 runs inline)
+        Returns: ODMatrix over the distinct origins and destinations of pairs
+        """
+        return PathfindingAlgorithms.od_matrix_for_graph(get_transit_graph(), pairs, processes)
+    
+    @staticmethod
+    def od_matrix_for_graph(graph, pairs, processes=None):
+        """
+        Batch OD computation on a TransitGraph: pairs are grouped by source and
+        each distinct source grows one single-source tree per metric (scipy's
+        compiled Dijkstra; fares on the route fare graph, see
+        TransitGraph.route_fare_matrix); sources are spread across a process
+        pool that converts the graph once per worker
+        Returns: ODMatrix with distance and fare arrays of shape (origins, destinations)
+        """
+        origins, destinations = [], []
+        origin_index, destination_index = {}, {}
+        wanted = {}
+        for source, destination in pairs:
+            if source not in origin_index:
+                origin_index[source] = len(origins)
+                origins.append(source)
+            if destination not in destination_index:
+                destination_index[destination] = len(destinations)
+                destinations.append(destination)
+            wanted.setdefault(source, set()).add(destination)
+        
+        distance = np.full((len(origins), len(destinations)), np.nan)
+        fare = np.full((len(origins), len(destinations)), np.nan)
+        
+        # One task per known source: (row, source node, [(column, target node), ...])
+        tasks = []
+        for source, targets in wanted.items():
+            source_id = graph.node_ids.get(source)
+            if source_id is None:
+                continue
+            columns = [(destination_index[target], graph.node_ids[target]) for target in targets
+                       if target in graph.node_ids]
+            if columns:
+                tasks.append((origin_index[source], source_id, columns))
+        
+        processes = processes or os.cpu_count() or 1
+        parallel = processes > 1 and len(tasks) >= BATCH_MIN_PARALLEL_ORIGINS
+        chunk = max(1, min(BATCH_MAX_CHUNK, len(tasks) // (processes * BATCH_CHUNKS_PER_PROCESS))) if parallel else BATCH_MAX_CHUNK
+        chunks = [tasks[i:i + chunk] for i in range(0, len(tasks), chunk)]
+        
+        if parallel:
+            with ProcessPoolExecutor(processes, initializer=_init_batch_worker, initargs=(graph,)) as pool:
+                results = list(pool.map(_batch_tree_rows, chunks))
+        else:
+            matrices = _build_batch_matrices(graph)
+            results = [_batch_tree_rows(tasks_chunk, matrices) for tasks_chunk in chunks]
+        
+        for rows, cols, distances, fares in results:
+            distance[rows, cols] = distances
+            fare[rows, cols] = fares
+        
+        return ODMatrix(origins, destinations, distance, fare)
+    
+    @staticmethod
+    def cached_search(graph, source, destination, metric, engine=DIJKSTRA):
+        """
+        search() behind the shared path cache, keyed by the exact location names
+        (the nodes search() resolves), the metric and the engine. Each entry
+        remembers the routes its path rides: when the graph version moves on by
+        route updates that can only make paths costlier, just the entries riding
+        those routes are dropped, otherwise the whole cache. Lookups with unknown locations are not cached
+        Returns: SearchResult
+        """
+        cache = get_path_cache()
+        _sync_path_cache(cache, graph)
+        if cache.version != graph.version:
+            # A reader still holding an older graph; its results must not be cached
+            return PathfindingAlgorithms.search(graph, source, destination, metric, engine)
+        
+        if source not in graph.node_ids or destination not in graph.node_ids:
+            return PathfindingAlgorithms.search(graph, source, destination, metric, engine)
+        
+        key = (source, destination, metric, engine)
+        entry = cache.get(key)
+        if entry is None:
+            result, edges = PathfindingAlgorithms._search(graph, source, destination, metric, engine)
+            ridden = graph.edge_route[edges] if edges else np.zeros(0, dtype=np.int32)
+            routes = frozenset(graph.route_ids[ridden[ridden != WALK_ROUTE]].tolist())
+            entry = (result, routes)
+            # Skipped if a patch moved the cache past this graph during the search
+            cache.put(key, entry, version=graph.version)
+        return entry[0]
+    
+    @staticmethod
+    def cache_stats():
+        """Hit/miss counters and occupancy of the path cache"""
+        return get_path_cache().stats()
+    
+    @staticmethod
+    def search(graph, source, destination, metric, engine=DIJKSTRA):
+        """
+        Point-to-point search over the CSR arrays of a TransitGraph
+        metric: DISTANCE, FARE (each edge's share of its route fare) or
+        ROUTE_FARE (each boarding pays the route fare once; any engine runs
+        the route-fare label-setting search)
+        engine: DIJKSTRA; ASTAR (distance only) orders the queue by cost plus the
+        great-circle lower bound; BIDIRECTIONAL grows from both ends until the
+        frontiers meet; CONTRACTION queries the precomputed contraction
+        hierarchy, falling back to BIDIRECTIONAL while it is being rebuilt; ALT
+        is A* on landmark triangle bounds, for either metric (falling back to
+        ASTAR, or DIJKSTRA for fares, while the landmarks are being rebuilt).
+        Hierarchies and landmarks need a fixed weight per edge, which ROUTE_FARE
+        lacks (a ride's price depends on where the route was boarded), so their
+        fare artifacts serve FARE queries only
+        Returns: SearchResult(last_route_id, total_cost, path, expanded)
+        """
+        return PathfindingAlgorithms._search(graph, source, destination, metric, engine)[0]
+    
+    @staticmethod
+    def _search(graph, source, destination, metric, engine=DIJKSTRA):
+        """search() that also returns the edge ids of the path (None if not found)"""
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown search engine: {engine}")
+        
+        source_id = graph.node_ids.get(source)
+        target_id = graph.node_ids.get(destination)
+        if source_id is None or target_id is None:
+            return SearchResult(None, None, None, 0), None
+        
+        if metric == ROUTE_FARE:
+            cost, edges, expanded = PathfindingAlgorithms._route_fare_search(graph, source_id, target_id)
+            return PathfindingAlgorithms._result(graph, source_id, cost, edges, expanded)
+        
+        weights = graph.weights(metric)
+        hierarchy = get_contraction_hierarchy(graph, metric) if engine == CONTRACTION else None
+        if hierarchy is not None:
+            cost, edges, expanded = hierarchy.query(source_id, target_id)
+        elif engine in (BIDIRECTIONAL, CONTRACTION):
+            cost, edges, expanded = PathfindingAlgorithms._bidirectional_search(graph, source_id, target_id, weights)
+        else:
+            landmarks = get_landmarks(graph, metric) if engine == ALT else None
+            if landmarks is not None:
+                bounds = landmarks.lower_bounds(target_id)
+            elif engine in (ASTAR, ALT) and metric == DISTANCE:
+                bounds = graph.distance_lower_bounds(target_id)
+            else:
+                bounds = None
+            cost, edges, expanded = PathfindingAlgorithms._forward_search(
+                graph, source_id, target_id, weights, bounds
+            )
+        return PathfindingAlgorithms._result(graph, source_id, cost, edges, expanded)
+    
+    @staticmethod
+    def _result(graph, source_id, cost, edges, expanded):
+        """(SearchResult, edges) for the edge ids an engine returned"""
+        if edges is None:
+            return SearchResult(None, None, None, expanded), None
+        
+        path = [graph.node_names[source_id]] + [graph.node_names[graph.targets[edge]] for edge in edges]
+        # Route of the last bus ridden (a trailing walk has none)
+        ridden = [route for route in graph.edge_route[edges].tolist() if route != WALK_ROUTE]
+        route_id = int(graph.route_ids[ridden[-1]]) if ridden else None
+        return SearchResult(route_id, cost, path, expanded), edges
+    
+    @staticmethod
+    def _forward_search(graph, source_id, target_id, weights, bounds=None):
+        """
+        Dijkstra (or A* when bounds are given) from source_id to target_id
+        Returns: (cost, edge ids along the path, expanded) with edges None if unreachable
+        """
+        offsets = graph.offsets
+        targets = graph.targets
+        
+        # Dense labels indexed by node id
+        costs = [float('inf')] * graph.node_count
+        edge_used = [-1] * graph.node_count
+        costs[source_id] = 0.0
+        pq = [(bounds[source_id] if bounds is not None else 0.0, 0.0, source_id)]
+        expanded = 0
+        
+        while pq:
+            _, current_cost, current = heapq.heappop(pq)
+            
+            # Stale entry; a cheaper label was already expanded
+            if current_cost > costs[current]:
+                continue
+            expanded += 1
+            
+            if current == target_id:
+                break
+            
+            start, end = offsets[current], offsets[current + 1]
+            if start == end:
+                continue
+            
+            for edge, neighbor, weight in zip(range(start, end), targets[start:end].tolist(),
+                                              weights[start:end].tolist()):
+                cost = current_cost + weight
                 
-                if stops and prev_stop != end:
-                    if prev_stop not in graph:
-                        graph[prev_stop] = []
-                    graph[prev_stop].append((end, fare / (len(stops) + 1), route))
-            
-            # Greedy approach: always choose minimum fare edge
-            fares = {node: float('inf') for node in graph}
-            fares[source] = 0
-            previous = {node: None for node in graph}
-            route_used = {node: None for node in graph}
-            pq = [(0, source)]
-            visited = set()
+                if cost < costs[neighbor]:
+                    costs[neighbor] = cost
+                    edge_used[neighbor] = edge
+                    priority = cost + bounds[neighbor] if bounds is not None else cost
+                    heapq.heappush(pq, (priority, cost, neighbor))
+        
+        if costs[target_id] == float('inf'):
+            return None, None, expanded
+        
+        path_edges = []
+        current = target_id
+        while current != source_id:
+            edge = edge_used[current]
+            path_edges.append(edge)
+            current = int(graph.sources[edge])
+        path_edges.reverse()
+        
+        return costs[target_id], path_edges, expanded
+    
+    @staticmethod
+    def _route_fare_search(graph, source_id, target_id):
+        """
+        Cheapest trip when boarding a route costs its flat fare once and riding
+        on is free (see _route_fare_labels)
+        Returns: (fare, edge ids along the path, expanded) with edges None if unreachable
+        """
+        expanded = 0
+        for fare, stop, label, parent in PathfindingAlgorithms._route_fare_labels(graph, source_id):
+            expanded += 1
+            if stop == target_id:
+                path_edges = []
+                while label != (source_id, WALK_ROUTE):
+                    label, edge = parent[label]
+                    path_edges.append(edge)
+                path_edges.reverse()
+                return fare, path_edges, expanded
+        return None, None, expanded
+    
+    @staticmethod
+    def _route_fare_labels(graph, source_id, budget=float('inf')):
+        """
+        Label-setting search for the route fare model, where boarding a route
+        costs its flat fare once and riding on is free. Labels are (stop, route
+        on board) with route WALK_ROUTE when on foot, ordered by (fare, distance).
+        A stop's first settled label is its cheapest, so only that one boards
+        other routes or walks; later labels at the stop just ride on, unless
+        alighting there and boarding the same route again would be cheaper.
+        Labels costing more than budget are never queued
+        Yields: (fare, stop, label, parent) for each label about to be expanded,
+        cheapest first; parent maps labels to (previous label, edge)
+        """
+        offsets, targets, distances, edge_route = graph.offsets.tolist(), graph.targets, graph.distance, graph.edge_route
+        route_fares = graph.route_fare.tolist()
+        inf = float('inf')
+        
+        best = {(source_id, WALK_ROUTE): (0.0, 0.0)}
+        parent = {}         # {label: (previous label, edge)}
+        boarded = {}        # {stop: fare of its cheapest label, which was expanded}
+        pq = [(0.0, 0.0, source_id, WALK_ROUTE)]
+        
+        while pq:
+            fare, distance, current, on_board = heapq.heappop(pq)
+            label = (current, on_board)
+            if (fare, distance) > best[label]:
+                continue
+            cheapest = current not in boarded
+            if not cheapest and (on_board == WALK_ROUTE or fare > boarded[current] + route_fares[on_board]):
+                continue
+            yield fare, current, label, parent
             
-            while pq:
-                current_fare, current = heapq.heappop(pq)
+            start, end = offsets[current], offsets[current + 1]
+            routes = edge_route[start:end].tolist()
+            if cheapest:
+                boarded[current] = fare
+                first, last = 0, len(routes)
+            elif on_board in routes:
+                # Riding on: the route's out-edges are one block of the pre-sorted neighbour list
+                first = routes.index(on_board)
+                last = first + routes.count(on_board)
+            else:
+                continue
+            
+            for edge, neighbor, hop, route in zip(range(start + first, start + last),
+                                                  targets[start + first:start + last].tolist(),
+                                                  distances[start + first:start + last].tolist(),
+                                                  routes[first:last]):
+                if route == on_board and route != WALK_ROUTE:
+                    cost = fare
+                else:
+                    cost = fare + (route_fares[route] if route != WALK_ROUTE else 0.0)
                 
-                if current in visited:
+                next_label = (neighbor, route)
+                reached = (cost, distance + hop)
+                if cost <= budget and reached < best.get(next_label, (inf, 0.0)):
+                    best[next_label] = reached
+                    parent[next_label] = (label, edge)
+                    heapq.heappush(pq, (cost, distance + hop, neighbor, route))
+    
+    @staticmethod
+    def _bidirectional_search(graph, source_id, target_id, weights):
+        """
+        Bidirectional Dijkstra: alternately settles the smaller frontier of a
+        forward search from the source and a backward search (over the reverse
+        CSR) from the target, stopping once the two queue minima cannot beat
+        the best meeting point found so far
+        Returns: (cost, edge ids along the path, expanded) with edges None if unreachable
+        """
+        inf = float('inf')
+        offsets, targets = graph.offsets, graph.targets
+        rev_offsets, rev_edges, sources = graph.rev_offsets, graph.rev_edges, graph.sources
+        
+        forward = [inf] * graph.node_count
+        backward = [inf] * graph.node_count
+        forward_edge = [-1] * graph.node_count    # edge that reached the node from the source side
+        backward_edge = [-1] * graph.node_count   # edge that leaves the node towards the target
+        forward[source_id] = 0.0
+        backward[target_id] = 0.0
+        forward_pq = [(0.0, source_id)]
+        backward_pq = [(0.0, target_id)]
+        
+        best = 0.0 if source_id == target_id else inf
+        meeting = source_id if source_id == target_id else -1
+        expanded = 0
+        
+        while forward_pq and backward_pq:
+            if forward_pq[0][0] + backward_pq[0][0] >= best:
+                break
+            
+            if len(forward_pq) <= len(backward_pq):
+                current_cost, current = heapq.heappop(forward_pq)
+                if current_cost > forward[current]:
                     continue
-                visited.add(current)
-                
-                if current == destination:
-                    break
+                expanded += 1
                 
-                if current not in graph:
+                start, end = offsets[current], offsets[current + 1]
+                for edge, neighbor, weight in zip(range(start, end), targets[start:end].tolist(),
+                                                  weights[start:end].tolist()):
+                    cost = current_cost + weight
+                    if cost < forward[neighbor]:
+                        forward[neighbor] = cost
+                        forward_edge[neighbor] = edge
+                        heapq.heappush(forward_pq, (cost, neighbor))
+                        if cost + backward[neighbor] < best:
+                            best = cost + backward[neighbor]
+                            meeting = neighbor
+            else:
+                current_cost, current = heapq.heappop(backward_pq)
+                if current_cost > backward[current]:
                     continue
+                expanded += 1
                 
-                # Greedy: sort by fare and pick cheapest
-                neighbors = sorted(graph[current], key=lambda x: x[1])
-                
-                for neighbor, fare, route in neighbors:
-                    total_fare = current_fare + fare
-                    
-                    if total_fare < fares.get(neighbor, float('inf')):
-                        fares[neighbor] = total_fare
-                        previous[neighbor] = current
-                        route_used[neighbor] = route
-                        heapq.heappush(pq, (total_fare, neighbor))
-            
-            # Reconstruct path
-            if fares.get(destination, float('inf')) == float('inf'):
-                return None, None, None
+                in_edges = rev_edges[rev_offsets[current]:rev_offsets[current + 1]]
+                for edge, neighbor, weight in zip(in_edges.tolist(), sources[in_edges].tolist(),
+                                                  weights[in_edges].tolist()):
+                    cost = current_cost + weight
+                    if cost < backward[neighbor]:
+                        backward[neighbor] = cost
+                        backward_edge[neighbor] = edge
+                        heapq.heappush(backward_pq, (cost, neighbor))
+                        if cost + forward[neighbor] < best:
+                            best = cost + forward[neighbor]
+                            meeting = neighbor
+        
+        if meeting == -1:
+            return None, None, expanded
+        
+        path_edges = []
+        current = meeting
+        while current != source_id:
+            edge = forward_edge[current]
+            path_edges.append(edge)
+            current = int(sources[edge])
+        path_edges.reverse()
+        
+        current = meeting
+        while current != target_id:
+            edge = backward_edge[current]
+            path_edges.append(edge)
+            current = int(targets[edge])
+        
+        return best, path_edges, expanded
+    
+    @staticmethod
+    def yen_k_shortest(graph, source, destination, metric, k=DEFAULT_ALTERNATIVES):
+        """
+        Yen's k-shortest loopless paths over a TransitGraph. Spur paths are A*
+        searches guided by costs to the destination from one backward Dijkstra
+        (stopped at the source): removing edges and nodes only makes paths longer, so those
+        costs stay a consistent bound and each spur search walks almost
+        straight to the target. Spur searches also stop once they cannot beat
+        the candidates already queued
+        Itineraries riding the same legs (route, board, alight) are reported once
+        Yen splits paths into a root and a spur whose costs add up, which FARE
+        (each edge's share of its route fare) allows and ROUTE_FARE does not, so
+        fare alternatives are found by FARE, which never exceeds the ticket
+        price, and then ordered by their ticket 'fare'
+        Returns: list of itinerary dicts (see _itinerary), cheapest first
+        """
+        source_id = graph.node_ids.get(source)
+        target_id = graph.node_ids.get(destination)
+        if source_id is None or target_id is None or source_id == target_id or k < 1:
+            return []
+        
+        # Plain lists for the inner loops; every spur search walks the same arrays
+        weights = graph.weights(metric)
+        adjacency = (graph.offsets.tolist(), graph.targets.tolist(), weights.tolist(), graph.sources.tolist())
+        potentials = PathfindingAlgorithms._reverse_costs(graph, source_id, target_id, weights)
+        if potentials is None:
+            return []
+        
+        cost, edges = PathfindingAlgorithms._spur_search(adjacency, source_id, target_id, potentials, set(), set())
+        max_paths = k * YEN_PATHS_PER_ALTERNATIVE
+        shortest = [(cost, edges)]
+        seen = {tuple(edges)}
+        candidates = []
+        itineraries = []
+        legs_seen = set()
+        
+        while True:
+            cost, edges = shortest[-1]
+            itinerary = PathfindingAlgorithms._itinerary(graph, source_id, cost, edges)
+            key = tuple((leg['route_id'], leg['board'], leg['alight']) for leg in itinerary['legs'])
+            if key not in legs_seen:
+                legs_seen.add(key)
+                itineraries.append(itinerary)
+            if len(itineraries) >= k or len(shortest) >= max_paths:
+                break
             
-            path = []
-            current = destination
-            while current is not None:
-                path.append(current)
-                current = previous.get(current)
-            path.reverse()
+            # Deviate from the last path at every node along it
+            nodes = [source_id] + [adjacency[1][edge] for edge in edges]
+            root_cost = 0.0
+            for i in range(len(edges)):
+                # Only paths cheaper than the last candidate that could still be taken matter
+                remaining = max_paths - len(shortest)
+                limit = heapq.nsmallest(remaining, candidates)[-1][2] if len(candidates) >= remaining else float('inf')
+                
+                root = edges[:i]
+                blocked_edges = {path[i] for _, path in shortest if len(path) > i and path[:i] == root}
+                blocked_nodes = set(nodes[:i])
+                spur_cost, spur = PathfindingAlgorithms._spur_search(
+                    adjacency, nodes[i], target_id, potentials, blocked_nodes, blocked_edges, limit - root_cost
+                )
+                if spur is not None:
+                    path = root + spur
+                    if tuple(path) not in seen:
+                        seen.add(tuple(path))
+                        total = root_cost + spur_cost
+                        # On ties prefer stop-by-stop segments so later deviations can transfer midway
+                        heapq.heappush(candidates, (round(total, 9), -len(path), total, path))
+                root_cost += adjacency[2][edges[i]]
             
-            cheapest_route = route_used.get(destination)
+            if not candidates:
+                break
+            _, _, cost, edges = heapq.heappop(candidates)
+            shortest.append((cost, edges))
+        
+        if metric == FARE:
+            itineraries.sort(key=lambda itinerary: itinerary['fare'])
+        return itineraries
+    
+    @staticmethod
+    def _reverse_costs(graph, source_id, target_id, weights):
+        """
+        Backward Dijkstra over the reverse CSR from target_id, stopped once the
+        source is settled; nodes left unsettled get the source's cost, which is
+        still a lower bound for them
+        Returns: list of costs to target_id, or None if the source cannot reach it
+        """
+        inf = float('inf')
+        rev_offsets = graph.rev_offsets.tolist()
+        rev_sources = graph.sources[graph.rev_edges].tolist()
+        rev_weights = weights[graph.rev_edges].tolist()
+        costs = [inf] * graph.node_count
+        settled = [False] * graph.node_count
+        costs[target_id] = 0.0
+        pq = [(0.0, target_id)]
+        
+        while pq:
+            current_cost, current = heapq.heappop(pq)
+            if settled[current]:
+                continue
+            settled[current] = True
+            if current == source_id:
+                break
             
-            if len(path) == 2 and cheapest_route:
-                total_fare = float(cheapest_route.fare)
-            else:
-                total_fare = fares[destination]
+            start, end = rev_offsets[current], rev_offsets[current + 1]
+            for neighbor, weight in zip(rev_sources[start:end], rev_weights[start:end]):
+                cost = current_cost + weight
+                if cost < costs[neighbor]:
+                    costs[neighbor] = cost
+                    heapq.heappush(pq, (cost, neighbor))
+        
+        if not settled[source_id]:
+            return None
+        radius = costs[source_id]
+        return [cost if done else radius for cost, done in zip(costs, settled)]
+    
+    @staticmethod
+    def _spur_search(adjacency, source_id, target_id, potentials, blocked_nodes, blocked_edges, limit=float('inf')):
+        """
+        A* from source_id to target_id avoiding blocked nodes and edges, ordered
+        by cost plus potentials (lower bounds on the cost to the target), giving
+        up once that estimate exceeds limit. Labels live in dicts since only a
+        few nodes are touched
+        adjacency: (offsets, targets, weights, sources) as lists
+        Returns: (cost, edge ids along the path) or (None, None) if not found
+        """
+        inf = float('inf')
+        offsets, targets, weights, sources = adjacency
+        costs = {source_id: 0.0}
+        edge_used = {}
+        pq = [(potentials[source_id], 0.0, source_id)]
+        found = False
+        
+        while pq:
+            estimate, current_cost, current = heapq.heappop(pq)
+            if estimate > limit:
+                break
+            if current_cost > costs[current]:
+                continue
+            if current == target_id:
+                found = True
+                break
             
-            return cheapest_route, total_fare, path
+            start, end = offsets[current], offsets[current + 1]
+            for edge, neighbor, weight in zip(range(start, end), targets[start:end], weights[start:end]):
+                if edge in blocked_edges or neighbor in blocked_nodes:
+                    continue
+                cost = current_cost + weight
+                if cost < costs.get(neighbor, inf):
+                    costs[neighbor] = cost
+                    edge_used[neighbor] = edge
+                    heapq.heappush(pq, (cost + potentials[neighbor], cost, neighbor))
+        
+        if not found:
+            return None, None
+        
+        path_edges = []
+        current = target_id
+        while current != source_id:
+            edge = edge_used[current]
+            path_edges.append(edge)
+            current = sources[edge]
+        path_edges.reverse()
+        
+        return costs[target_id], path_edges
+    
+    @staticmethod
+    def _itinerary(graph, source_id, cost, edges):
+        """
+        Itinerary dict for an edge path: cost, distance_km, fare, path (stop names)
+        and legs, consecutive edges on one route merged into a single leg
+        (mode 'bus', or 'walk' with route_id None for walking transfers); the
+        fare is the ticket price, each bus leg paying its route fare once
+        """
+        nodes = [source_id] + graph.targets[edges].tolist()
+        routes = graph.edge_route[edges].tolist()
+        legs = []
+        fare = 0.0
+        for i, route in enumerate(routes):
+            if i > 0 and routes[i - 1] == route:
+                legs[-1]['alight'] = graph.node_names[nodes[i + 1]]
+                continue
+            walking = route == WALK_ROUTE
+            if not walking:
+                fare += float(graph.route_fare[route])
+            legs.append({
+                'mode': 'walk' if walking else 'bus',
+                'route_id': None if walking else int(graph.route_ids[route]),
+                'route_number': 'Walk' if walking else graph.route_numbers[route],
+                'board': graph.node_names[nodes[i]],
+                'alight': graph.node_names[nodes[i + 1]]
+            })
+        
+        return {
+            'cost': round(cost, 2),
+            'distance_km': round(float(graph.distance[edges].sum()), 2),
+            'fare': round(fare, 2),
+            'path': [graph.node_names[node] for node in nodes],
+            'legs': legs
+        }
+    
+    @staticmethod
+    def timed_path(graph, source, destination, minutes):
+        """
+        Bidirectional Dijkstra over per-edge travel minutes (one value per graph edge)
+        Returns: itinerary dict plus 'minutes', or None if unreachable
+        """
+        source_id = graph.node_ids.get(source)
+        target_id = graph.node_ids.get(destination)
+        if source_id is None or target_id is None:
+            return None
+        
+        cost, edges, _ = PathfindingAlgorithms._bidirectional_search(graph, source_id, target_id, minutes)
+        if edges is None:
+            return None
+        itinerary = PathfindingAlgorithms._itinerary(graph, source_id, cost, edges)
+        itinerary['minutes'] = round(cost, 1)
+        return itinerary
+    
+    @staticmethod
+    def reachable_within(graph, source, budget, metric):
+        """
+        One Dijkstra from source over the whole graph, pruned at budget
+        metric: DISTANCE, FARE, or ROUTE_FARE (the route-fare label-setting
+        search run to every stop)
+        Returns: list of {'stop', 'cost', 'latitude', 'longitude'} dicts for every
+        stop other than the source with cost <= budget, nearest first
+        (coordinates None where unknown)
+        """
+        source_id = graph.node_ids.get(source)
+        if source_id is None:
+            return []
+        
+        if metric == ROUTE_FARE:
+            # A stop's first expanded label is its cheapest
+            costs = {}
+            for fare, stop, _, _ in PathfindingAlgorithms._route_fare_labels(graph, source_id, budget):
+                costs.setdefault(stop, fare)
+            settled = list(costs)
+        else:
+            offsets = graph.offsets.tolist()
+            targets = graph.targets.tolist()
+            weights = graph.weights(metric).tolist()
+            costs = {source_id: 0.0}
+            settled = []
+            pq = [(0.0, source_id)]
             
-        except Exception as e:
-            print(f"Greedy error: {e}")
-            return None, None, None
+            while pq:
+                current_cost, current = heapq.heappop(pq)
+                if current_cost > costs[current]:
+                    continue
+                settled.append(current)
+                
+                start, end = offsets[current], offsets[current + 1]
+                for neighbor, weight in zip(targets[start:end], weights[start:end]):
+                    cost = current_cost + weight
+                    if cost <= budget and cost < costs.get(neighbor, float('inf')):
+                        costs[neighbor] = cost
+                        heapq.heappush(pq, (cost, neighbor))
+        
+        latitudes = graph.node_lat[settled].tolist()
+        longitudes = graph.node_lon[settled].tolist()
+        return [{
+            'stop': graph.node_names[node],
+            'cost': round(costs[node], 2),
+            'latitude': None if math.isnan(latitude) else latitude,
+            'longitude': None if math.isnan(longitude) else longitude
+        } for node, latitude, longitude in zip(settled[1:], latitudes[1:], longitudes[1:])]
+
+
+_path_cache = None
+_path_cache_lock = threading.Lock()
+
+def _sync_path_cache(cache, graph):
+    """Move the path cache to the graph's version, dropping only entries the route updates affect"""
+    if cache.version == graph.version or (cache.version is not None and graph.version < cache.version):
+        return
+    changes = graph.changes_since(cache.version)
+    if changes is None or not all(costlier_only for _, costlier_only in changes):
+        cache.sync_version(graph.version)
+        return
+    changed = {route_id for route_id, _ in changes}
+    cache.sync_version(graph.version, lambda key, entry: not changed.isdisjoint(entry[1]))
+
+def get_path_cache():
+    """Process-wide path cache, sized from the app config on first use"""
+    global _path_cache
+    if _path_cache is None:
+        with _path_cache_lock:
+            if _path_cache is None:
+                config = current_app.config if has_app_context() else {}
+                _path_cache = LRUCache(
+                    config.get('PATH_CACHE_SIZE', DEFAULT_PATH_CACHE_SIZE),
+                    config.get('PATH_CACHE_TTL_SECONDS', DEFAULT_PATH_CACHE_TTL_SECONDS)
+                )
+    return _path_cache
+
+# Per-process state for batch OD workers: one sparse matrix per metric, built once
+_batch_matrices = None
+
+def _build_batch_matrices(graph):
+    """The graph as scipy CSR matrices by distance and by route fare"""
+    return {DISTANCE: graph.adjacency_matrix(DISTANCE), ROUTE_FARE: graph.route_fare_matrix()}
+
+def _init_batch_worker(graph):
+    """Pool initializer: convert the graph once per worker process"""
+    global _batch_matrices
+    _batch_matrices = _build_batch_matrices(graph)
+
+def _batch_tree_rows(tasks, matrices=None):
+    """Worker: shortest-path trees by distance and by route fare from every source in tasks"""
+    matrices = matrices or _batch_matrices
+    sources = [source_id for _, source_id, _ in tasks]
+    trees = {metric: sparse_dijkstra(matrices[metric], indices=sources) for metric in (DISTANCE, ROUTE_FARE)}
+    
+    rows, cols, tree_rows, nodes = [], [], [], []
+    for position, (row, _, columns) in enumerate(tasks):
+        for col, node in columns:
+            rows.append(row)
+            cols.append(col)
+            tree_rows.append(position)
+            nodes.append(node)
+    
+    distances = trees[DISTANCE][tree_rows, nodes]
+    fares = trees[ROUTE_FARE][tree_rows, nodes]
+    # scipy marks unreachable nodes with inf
+    distances[np.isinf(distances)] = np.nan
+    fares[np.isinf(fares)] = np.nan
+    return rows, cols, distances, fares
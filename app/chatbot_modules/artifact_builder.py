@@ -0,0 +1,78 @@
+"""
+Artifact Builder Module
+Starts the single out-of-process rebuild of the routing artifacts
+(contraction hierarchies and ALT landmarks) when the route data moves past them
+"""
+
+import os
+import subprocess
+import sys
+import threading
+from flask import current_app, has_app_context
+
+try:
+    import fcntl
+except ImportError:     # Windows: rebuild with database/build_routing_artifacts.py by hand
+    fcntl = None
+
+BUILD_SCRIPT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    'database', 'build_routing_artifacts.py'
+)
+
+_requested = set()     # graph fingerprints this process already asked a rebuild for
+_request_lock = threading.Lock()
+
+def try_lock(lock_file):
+    """Take the exclusive artifact lock on an open file without waiting; False if a builder holds it"""
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+def builder_running(lock_path):
+    """Whether a builder currently holds the artifact lock file"""
+    if not os.path.exists(lock_path):
+        return False
+    with open(lock_path, 'a') as lock_file:
+        if not try_lock(lock_file):
+            return True
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+    return False
+
+def request_artifact_rebuild(fingerprint=None):
+    """
+    Start `build_routing_artifacts.py refresh` in its own process unless a
+    builder already holds ROUTING_ARTIFACT_LOCK_PATH (it re-reads the tables
+    once it is done), so the artifacts are rebuilt once for all workers,
+    outside their interpreters, while searches use the fallback engines
+    fingerprint: the graph the artifacts were found stale for; each graph asks once per process
+    Returns: True if a builder was started
+    """
+    if fcntl is None or not has_app_context():
+        return False
+    config = current_app.config
+    lock_path = config.get('ROUTING_ARTIFACT_LOCK_PATH')
+    if not config.get('ROUTING_ARTIFACT_REBUILD') or not lock_path:
+        return False
+    
+    with _request_lock:
+        if fingerprint is not None:
+            if fingerprint in _requested:
+                return False
+            _requested.add(fingerprint)
+    
+    try:
+        if builder_running(lock_path):
+            return False
+        builder = subprocess.Popen(
+            [sys.executable, BUILD_SCRIPT, 'refresh'], cwd=os.path.dirname(os.path.dirname(BUILD_SCRIPT)),
+            stdin=subprocess.DEVNULL, start_new_session=True
+        )
+    except OSError as e:
+        print(f"Artifact rebuild error: {e}")
+        return False
+    # Reap the builder when it exits
+    threading.Thread(target=builder.wait, name='artifact-builder', daemon=True).start()
+    return True
@@ -0,0 +1,92 @@
+"""
+Cache Module
+Thread-safe LRU cache with optional expiry, version binding and hit/miss counters
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+class LRUCache:
+    """
+    Least-recently-used cache holding at most maxsize entries, each expiring
+    ttl seconds after it was stored (ttl None keeps entries until evicted)
+    The cache can be bound to a data version: sync_version() empties it, or
+    drops just the entries a change affects, when the data version moves on
+    """
+    
+    def __init__(self, maxsize=1024, ttl=None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version = None
+        self._clock = clock
+        self._entries = OrderedDict()   # {key: (expires_at, value)}, oldest first
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key, default=None):
+        """Cached value for key (marking it recently used), or default"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is not None and entry[0] <= self._clock():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+    
+    def put(self, key, value, version=None):
+        """
+        Store value under key, evicting the least recently used entries if full
+        With version given, the value is only stored if the cache is still at
+        that data version (a result computed on older data is dropped)
+        Returns: whether the value was stored
+        """
+        expires_at = self._clock() + self.ttl if self.ttl else None
+        with self._lock:
+            if version is not None and version != self.version:
+                return False
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            return True
+    
+    def sync_version(self, version, discard=None):
+        """
+        Bring the cache up to a new data version: drop the entries matching
+        discard(key, value) when given (the rest stay valid), otherwise all
+        """
+        if version != self.version:
+            with self._lock:
+                if version != self.version:
+                    if discard is None:
+                        self._entries.clear()
+                    else:
+                        for key in [key for key, (_, value) in self._entries.items() if discard(key, value)]:
+                            del self._entries[key]
+                    self.version = version
+    
+    def stats(self):
+        """Counters and occupancy as a dict"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl_seconds': self.ttl,
+                'version': self.version,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+    
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,355 @@
+"""
+Contraction Hierarchy Module
+Offline preprocessing of the transit graph for fast shortest-path queries
+"""
+
+import heapq
+import os
+import threading
+import numpy as np
+from .artifact_builder import request_artifact_rebuild
+
+# Witness searches stop after settling this many nodes (more = fewer shortcuts, slower build)
+WITNESS_SETTLE_LIMIT = 200
+
+ARTIFACT_FORMAT_VERSION = 1
+
+class ContractionHierarchy:
+    """
+    Contraction hierarchy over one edge metric of a TransitGraph
+    Every edge (original or shortcut) lives in the edge_* arrays; a shortcut
+    records the two edges it replaces in edge_left / edge_right, an original
+    edge records its TransitGraph edge id in edge_original. Queries only
+    follow edges towards higher-ranked nodes: up_* lists them by tail for the
+    forward search, down_* by head for the backward search
+    """
+    
+    ARRAYS = ['rank', 'up_offsets', 'up_edges', 'down_offsets', 'down_edges', 'edge_source',
+              'edge_target', 'edge_weight', 'edge_left', 'edge_right', 'edge_original']
+    
+    def __init__(self, metric, fingerprint, **arrays):
+        self.metric = metric
+        self.fingerprint = fingerprint
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self._adjacency = None
+    
+    @classmethod
+    def build(cls, graph, metric='distance', settle_limit=WITNESS_SETTLE_LIMIT):
+        """Contract every node of the graph in edge-difference order"""
+        node_count = graph.node_count
+        weights = graph.weights(metric).tolist()
+        sources = graph.sources.tolist()
+        targets = graph.targets.tolist()
+        
+        edge_source, edge_target, edge_weight = [], [], []
+        edge_left, edge_right, edge_original = [], [], []
+        out_adj = [dict() for _ in range(node_count)]   # {head: edge id}
+        in_adj = [dict() for _ in range(node_count)]    # {tail: edge id}
+        
+        def add_edge(tail, head, weight, left=-1, right=-1, original=-1):
+            existing = out_adj[tail].get(head)
+            if existing is not None and edge_weight[existing] <= weight:
+                return
+            edge_id = len(edge_weight)
+            edge_source.append(tail)
+            edge_target.append(head)
+            edge_weight.append(weight)
+            edge_left.append(left)
+            edge_right.append(right)
+            edge_original.append(original)
+            out_adj[tail][head] = edge_id
+            in_adj[head][tail] = edge_id
+        
+        for edge, (tail, head, weight) in enumerate(zip(sources, targets, weights)):
+            if tail != head:
+                add_edge(tail, head, weight, original=edge)
+        
+        contracted = bytearray(node_count)
+        deleted_neighbors = [0] * node_count
+        
+        def witness_costs(start, skip, limit_cost):
+            """Bounded Dijkstra from start that avoids skip and contracted nodes"""
+            costs = {start: 0.0}
+            pq = [(0.0, start)]
+            settled = 0
+            while pq and settled < settle_limit:
+                cost, node = heapq.heappop(pq)
+                if cost > costs[node]:
+                    continue
+                if cost > limit_cost:
+                    break
+                settled += 1
+                for head, edge_id in out_adj[node].items():
+                    if head == skip or contracted[head]:
+                        continue
+                    new_cost = cost + edge_weight[edge_id]
+                    if new_cost < costs.get(head, float('inf')):
+                        costs[head] = new_cost
+                        heapq.heappush(pq, (new_cost, head))
+            return costs
+        
+        def shortcuts_for(node):
+            """Shortcuts needed to contract node: (tail, head, weight, in edge, out edge)"""
+            incoming = [(tail, edge) for tail, edge in in_adj[node].items() if not contracted[tail]]
+            outgoing = [(head, edge) for head, edge in out_adj[node].items() if not contracted[head]]
+            needed = []
+            if not incoming or not outgoing:
+                return needed, len(incoming) + len(outgoing)
+            max_out = max(edge_weight[edge] for _, edge in outgoing)
+            for tail, in_edge in incoming:
+                through = edge_weight[in_edge]
+                costs = witness_costs(tail, node, through + max_out)
+                for head, out_edge in outgoing:
+                    if head == tail:
+                        continue
+                    weight = through + edge_weight[out_edge]
+                    if costs.get(head, float('inf')) > weight:
+                        needed.append((tail, head, weight, in_edge, out_edge))
+            return needed, len(incoming) + len(outgoing)
+        
+        def priority(node):
+            needed, degree = shortcuts_for(node)
+            return len(needed) - degree + deleted_neighbors[node]
+        
+        pq = [(priority(node), node) for node in range(node_count)]
+        heapq.heapify(pq)
+        rank = np.zeros(node_count, dtype=np.int32)
+        order = 0
+        
+        while pq:
+            _, node = heapq.heappop(pq)
+            if contracted[node]:
+                continue
+            
+            # Lazy update: re-queue if the node is no longer the cheapest to contract
+            needed, degree = shortcuts_for(node)
+            current = len(needed) - degree + deleted_neighbors[node]
+            if pq and current > pq[0][0]:
+                heapq.heappush(pq, (current, node))
+                continue
+            
+            for tail, head, weight, in_edge, out_edge in needed:
+                add_edge(tail, head, weight, left=in_edge, right=out_edge)
+            
+            contracted[node] = 1
+            rank[node] = order
+            order += 1
+            for neighbor in list(in_adj[node]) + list(out_adj[node]):
+                deleted_neighbors[neighbor] += 1
+        
+        up = [[] for _ in range(node_count)]
+        down = [[] for _ in range(node_count)]
+        for tail in range(node_count):
+            for head, edge_id in out_adj[tail].items():
+                if rank[tail] < rank[head]:
+                    up[tail].append(edge_id)
+                else:
+                    down[head].append(edge_id)
+        
+        def pack(lists):
+            offsets = np.zeros(node_count + 1, dtype=np.int32)
+            np.cumsum([len(items) for items in lists], out=offsets[1:])
+            flat = np.fromiter((item for items in lists for item in items), dtype=np.int32, count=int(offsets[-1]))
+            return offsets, flat
+        
+        up_offsets, up_edges = pack(up)
+        down_offsets, down_edges = pack(down)
+        
+        return cls(
+            metric, graph.fingerprint,
+            rank=rank, up_offsets=up_offsets, up_edges=up_edges,
+            down_offsets=down_offsets, down_edges=down_edges,
+            edge_source=np.array(edge_source, dtype=np.int32),
+            edge_target=np.array(edge_target, dtype=np.int32),
+            edge_weight=np.array(edge_weight, dtype=np.float64),
+            edge_left=np.array(edge_left, dtype=np.int32),
+            edge_right=np.array(edge_right, dtype=np.int32),
+            edge_original=np.array(edge_original, dtype=np.int32)
+        )
+    
+    def save(self, path):
+        """Write the hierarchy as a single .npz artifact"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(
+            temp_path, format_version=ARTIFACT_FORMAT_VERSION, metric=self.metric,
+            fingerprint=self.fingerprint, **{name: getattr(self, name) for name in self.ARRAYS}
+        )
+        os.replace(temp_path, path)
+    
+    @classmethod
+    def load(cls, path):
+        """Read an artifact written by save()"""
+        with np.load(path, allow_pickle=False) as data:
+            if int(data['format_version']) != ARTIFACT_FORMAT_VERSION:
+                raise ValueError(f"Unsupported hierarchy format in {path}")
+            return cls(str(data['metric']), str(data['fingerprint']),
+                       **{name: data[name] for name in cls.ARRAYS})
+    
+    @property
+    def shortcut_count(self):
+        return int((self.edge_left >= 0).sum())
+    
+    def _prepare(self):
+        """Python adjacency lists [(neighbor, weight, edge id), ...] for the query loop"""
+        if self._adjacency is None:
+            weights = self.edge_weight.tolist()
+            up_heads = self.edge_target[self.up_edges].tolist()
+            down_tails = self.edge_source[self.down_edges].tolist()
+            up_edges = self.up_edges.tolist()
+            down_edges = self.down_edges.tolist()
+            up_offsets = self.up_offsets.tolist()
+            down_offsets = self.down_offsets.tolist()
+            up = [
+                [(up_heads[k], weights[up_edges[k]], up_edges[k]) for k in range(up_offsets[n], up_offsets[n + 1])]
+                for n in range(len(up_offsets) - 1)
+            ]
+            down = [
+                [(down_tails[k], weights[down_edges[k]], down_edges[k]) for k in range(down_offsets[n], down_offsets[n + 1])]
+                for n in range(len(down_offsets) - 1)
+            ]
+            self._adjacency = (up, down)
+        return self._adjacency
+    
+    def query(self, source_id, target_id):
+        """
+        Bidirectional upward search from source_id and target_id
+        Returns: (cost, TransitGraph edge ids along the path, expanded) with edges None if unreachable
+        """
+        up, down = self._prepare()
+        inf = float('inf')
+        searches = [
+            (up, {source_id: 0.0}, {source_id: -1}, [(0.0, source_id)]),
+            (down, {target_id: 0.0}, {target_id: -1}, [(0.0, target_id)])
+        ]
+        best = 0.0 if source_id == target_id else inf
+        meeting = source_id if source_id == target_id else -1
+        expanded = 0
+        
+        active = True
+        while active:
+            active = False
+            for side in (0, 1):
+                adjacency, costs, parents, pq = searches[side]
+                other_costs = searches[1 - side][1]
+                if not pq or pq[0][0] >= best:
+                    continue
+                active = True
+                cost, node = heapq.heappop(pq)
+                if cost > costs[node]:
+                    continue
+                expanded += 1
+                for neighbor, weight, edge_id in adjacency[node]:
+                    new_cost = cost + weight
+                    if new_cost < costs.get(neighbor, inf):
+                        costs[neighbor] = new_cost
+                        parents[neighbor] = edge_id
+                        heapq.heappush(pq, (new_cost, neighbor))
+                        if neighbor in other_costs and new_cost + other_costs[neighbor] < best:
+                            best = new_cost + other_costs[neighbor]
+                            meeting = neighbor
+                if node in other_costs and cost + other_costs[node] < best:
+                    best = cost + other_costs[node]
+                    meeting = node
+        
+        if meeting == -1:
+            return None, None, expanded
+        
+        # Hierarchy edges from source up to the meeting node, then down to the target
+        forward_parents, backward_parents = searches[0][2], searches[1][2]
+        hierarchy_edges = []
+        node = meeting
+        while forward_parents[node] != -1:
+            edge_id = forward_parents[node]
+            hierarchy_edges.append(edge_id)
+            node = int(self.edge_source[edge_id])
+        hierarchy_edges.reverse()
+        node = meeting
+        while backward_parents[node] != -1:
+            edge_id = backward_parents[node]
+            hierarchy_edges.append(edge_id)
+            node = int(self.edge_target[edge_id])
+        
+        return best, self.unpack(hierarchy_edges), expanded
+    
+    def unpack(self, hierarchy_edges):
+        """Expand shortcuts into the original TransitGraph edge ids"""
+        left, right, original = self.edge_left, self.edge_right, self.edge_original
+        path_edges = []
+        stack = list(reversed(hierarchy_edges))
+        while stack:
+            edge_id = stack.pop()
+            if left[edge_id] < 0:
+                path_edges.append(int(original[edge_id]))
+            else:
+                stack.append(int(right[edge_id]))
+                stack.append(int(left[edge_id]))
+        return path_edges
+
+_hierarchies = {}          # {metric: ContractionHierarchy}
+_artifact_paths = {}       # {metric: path the hierarchy is loaded from}
+_artifact_mtimes = {}      # {metric: modification time of the artifact last read}
+_hierarchy_lock = threading.Lock()
+
+def hierarchy_artifact_path(template, metric):
+    """Artifact path for a metric from a CONTRACTION_HIERARCHY_PATH template containing {metric}"""
+    return template.format(metric=metric) if template else None
+
+def register_hierarchy(hierarchy):
+    """Make a hierarchy available to get_contraction_hierarchy()"""
+    with _hierarchy_lock:
+        _hierarchies[hierarchy.metric] = hierarchy
+
+def _read_artifact(path, metric):
+    """Load the metric's artifact, remembering its modification time"""
+    _artifact_mtimes[metric] = os.path.getmtime(path)
+    hierarchy = ContractionHierarchy.load(path)
+    if hierarchy.metric != metric:
+        raise ValueError(f"{path} holds a '{hierarchy.metric}' hierarchy, expected '{metric}'")
+    register_hierarchy(hierarchy)
+    return hierarchy
+
+def load_hierarchy_artifact(path, metric='distance'):
+    """
+    Remember where the metric's artifact lives and load it if present (app startup)
+    Returns: the hierarchy, or None if the file does not exist yet
+    """
+    with _hierarchy_lock:
+        _artifact_paths[metric] = path
+    if not path or not os.path.exists(path):
+        return None
+    return _read_artifact(path, metric)
+
+def get_contraction_hierarchy(graph, metric='distance'):
+    """
+    Hierarchy matching the current graph, or None while it is unavailable
+    Contraction is far too slow for a request process, so a stale hierarchy is
+    never rebuilt here: one builder process is started for all workers (see
+    request_artifact_rebuild), the artifact is re-read whenever it is
+    replaced, and callers fall back to another engine until its fingerprint
+    matches the graph
+    """
+    with _hierarchy_lock:
+        hierarchy = _hierarchies.get(metric)
+        if hierarchy is not None and hierarchy.fingerprint == graph.fingerprint:
+            return hierarchy
+        path = _artifact_paths.get(metric)
+        try:
+            unchanged = not path or os.path.getmtime(path) == _artifact_mtimes.get(metric)
+        except OSError:
+            unchanged = True
+    
+    if not unchanged:
+        try:
+            hierarchy = _read_artifact(path, metric)
+        except (OSError, ValueError) as e:
+            print(f"Contraction hierarchy load error: {e}")
+            hierarchy = None
+        if hierarchy is not None and hierarchy.fingerprint == graph.fingerprint:
+            return hierarchy
+    if path:
+        request_artifact_rebuild(graph.fingerprint)
+    return None
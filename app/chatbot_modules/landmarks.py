@@ -0,0 +1,173 @@
+"""
+Landmarks Module
+ALT (A*, landmarks, triangle inequality) lower bounds for the transit graph
+"""
+
+import os
+import threading
+import numpy as np
+from scipy.sparse.csgraph import dijkstra as sparse_dijkstra
+from .artifact_builder import request_artifact_rebuild
+
+DEFAULT_LANDMARK_COUNT = 12
+
+ARTIFACT_FORMAT_VERSION = 1
+
+class LandmarkSet:
+    """
+    Shortest-path costs between a few landmark stops and every stop, for one
+    edge metric of a TransitGraph: from_landmark[i, v] is the cost from
+    landmark i to v and to_landmark[i, v] the cost from v back to it (inf
+    where unreachable). By the triangle inequality
+        cost(v, t) >= from_landmark[i, t] - from_landmark[i, v]
+        cost(v, t) >= to_landmark[i, v] - to_landmark[i, t]
+    which bounds the remaining cost without any stop coordinates
+    """
+    
+    ARRAYS = ['landmarks', 'from_landmark', 'to_landmark']
+    
+    def __init__(self, metric, fingerprint, **arrays):
+        self.metric = metric
+        self.fingerprint = fingerprint
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+    
+    @classmethod
+    def build(cls, graph, metric='distance', count=DEFAULT_LANDMARK_COUNT):
+        """
+        Pick landmarks by farthest-point selection: each new landmark is the
+        stop farthest (out and back) from those chosen so far, so they spread
+        to the fringes of the network; stops no landmark reaches either way
+        count as infinitely far, so every component gets a landmark
+        """
+        matrix = graph.adjacency_matrix(metric)
+        reverse = matrix.T.tocsr()
+        count = min(count, graph.node_count)
+        
+        def spread(source):
+            from_row = sparse_dijkstra(matrix, indices=source)
+            to_row = sparse_dijkstra(reverse, indices=source)
+            reached = np.isfinite(from_row) | np.isfinite(to_row)
+            far = np.where(np.isfinite(from_row), from_row, 0.0) + np.where(np.isfinite(to_row), to_row, 0.0)
+            return from_row, to_row, np.where(reached, far, np.inf)
+        
+        landmarks, from_rows, to_rows = [], [], []
+        if count:
+            # Seed with the best connected stop; the first landmark is the stop farthest from it
+            _, _, nearest = spread(int(np.argmax(graph.out_degree())))
+        for _ in range(count):
+            nearest[landmarks] = -1.0
+            landmark = int(np.argmax(nearest))
+            from_row, to_row, far = spread(landmark)
+            landmarks.append(landmark)
+            from_rows.append(from_row)
+            to_rows.append(to_row)
+            nearest = np.minimum(nearest, far)
+        
+        size = (len(landmarks), graph.node_count)
+        return cls(
+            metric, graph.fingerprint,
+            landmarks=np.array(landmarks, dtype=np.int32),
+            from_landmark=np.array(from_rows, dtype=np.float64).reshape(size),
+            to_landmark=np.array(to_rows, dtype=np.float64).reshape(size)
+        )
+    
+    def save(self, path):
+        """Write the landmark arrays as a single .npz artifact"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(
+            temp_path, format_version=ARTIFACT_FORMAT_VERSION, metric=self.metric,
+            fingerprint=self.fingerprint, **{name: getattr(self, name) for name in self.ARRAYS}
+        )
+        os.replace(temp_path, path)
+    
+    @classmethod
+    def load(cls, path):
+        """Read an artifact written by save()"""
+        with np.load(path, allow_pickle=False) as data:
+            if int(data['format_version']) != ARTIFACT_FORMAT_VERSION:
+                raise ValueError(f"Unsupported landmark format in {path}")
+            return cls(str(data['metric']), str(data['fingerprint']),
+                       **{name: data[name] for name in cls.ARRAYS})
+    
+    def lower_bounds(self, target):
+        """
+        Admissible estimate of the remaining cost from every node to target,
+        the best triangle bound over all landmarks (terms involving an
+        unreachable landmark are skipped)
+        """
+        if not len(self.landmarks):
+            return [0.0] * self.from_landmark.shape[1]
+        with np.errstate(invalid='ignore'):
+            forward = self.from_landmark[:, target, None] - self.from_landmark
+            backward = self.to_landmark - self.to_landmark[:, target, None]
+        bounds = np.maximum(forward, backward)
+        bounds[~np.isfinite(bounds)] = 0.0
+        return np.maximum(bounds.max(axis=0), 0.0).tolist()
+
+_landmark_sets = {}       # {metric: LandmarkSet}
+_artifact_paths = {}      # {metric: path the landmarks are loaded from}
+_artifact_mtimes = {}     # {metric: modification time of the artifact last read}
+_landmark_lock = threading.Lock()
+
+def register_landmarks(landmark_set):
+    """Make a landmark set available to get_landmarks()"""
+    with _landmark_lock:
+        _landmark_sets[landmark_set.metric] = landmark_set
+
+def landmark_artifact_path(template, metric):
+    """Artifact path for a metric from a LANDMARKS_PATH template containing {metric}"""
+    return template.format(metric=metric) if template else None
+
+def _read_artifact(path, metric):
+    """Load the metric's artifact, remembering its modification time"""
+    _artifact_mtimes[metric] = os.path.getmtime(path)
+    landmark_set = LandmarkSet.load(path)
+    if landmark_set.metric != metric:
+        raise ValueError(f"{path} holds '{landmark_set.metric}' landmarks, expected '{metric}'")
+    register_landmarks(landmark_set)
+    return landmark_set
+
+def load_landmark_artifact(path, metric='distance'):
+    """
+    Remember where the metric's artifact lives and load it if present (app startup)
+    Returns: the landmark set, or None if the file does not exist yet
+    """
+    with _landmark_lock:
+        _artifact_paths[metric] = path
+    if not path or not os.path.exists(path):
+        return None
+    return _read_artifact(path, metric)
+
+def get_landmarks(graph, metric='distance'):
+    """
+    Landmarks matching the current graph, or None while they are unavailable
+    Like the contraction hierarchy, stale landmarks are not recomputed in the
+    request process: one builder process is started for all workers, the
+    artifact is re-read whenever it is replaced, and callers fall back to
+    another engine in the meantime
+    """
+    with _landmark_lock:
+        landmark_set = _landmark_sets.get(metric)
+        if landmark_set is not None and landmark_set.fingerprint == graph.fingerprint:
+            return landmark_set
+        path = _artifact_paths.get(metric)
+        try:
+            unchanged = not path or os.path.getmtime(path) == _artifact_mtimes.get(metric)
+        except OSError:
+            unchanged = True
+    
+    if not unchanged:
+        try:
+            landmark_set = _read_artifact(path, metric)
+        except (OSError, ValueError) as e:
+            print(f"Landmark load error: {e}")
+            landmark_set = None
+        if landmark_set is not None and landmark_set.fingerprint == graph.fingerprint:
+            return landmark_set
+    if path:
+        request_artifact_rebuild(graph.fingerprint)
+    return None
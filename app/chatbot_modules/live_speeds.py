@@ -0,0 +1,128 @@
+"""
+Live Speeds Module
+Per-route average bus speeds from live locations, refreshed in the background
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from flask import current_app
+from sqlalchemy import func
+from app import db
+from app.models.database_models import Route, LiveBusLocation
+from .transit_graph import MISSING_DISTANCE_KM, WALK_ROUTE, WALKING_SPEED_KMPH
+
+# Seconds between refreshes (LIVE_SPEED_REFRESH_SECONDS)
+DEFAULT_REFRESH_SECONDS = 5
+# Location reports older than this are ignored, and so is the whole table once
+# it has not been refreshed for this long (LIVE_SPEED_MAX_AGE_SECONDS)
+DEFAULT_MAX_AGE_SECONDS = 300
+# Buses standing at a stop report ~0 km/h; they say nothing about the road
+MIN_LIVE_SPEED_KMPH = 3.0
+
+class LiveSpeedTable:
+    """
+    {route_id: average km/h} of the buses currently reporting on each route
+    Readers never query the database: refresh() replaces the whole table and
+    edge_minutes() turns it into travel-time weights for a graph, falling back
+    to the scheduled duration for routes without live reports
+    """
+    
+    def __init__(self, max_age_seconds=DEFAULT_MAX_AGE_SECONDS, clock=time.monotonic):
+        self.max_age_seconds = max_age_seconds
+        self.speeds = {}
+        self.version = 0
+        self.refreshed_at = None
+        self._clock = clock
+        self._weights = None     # (graph, graph version, table version, minutes per edge, live routes)
+        self._lock = threading.Lock()
+    
+    def update(self, speeds):
+        """Replace the table with {route_id: km/h}"""
+        with self._lock:
+            self.speeds = dict(speeds)
+            self.version += 1
+            self.refreshed_at = self._clock()
+    
+    def refresh(self):
+        """Average the recent LiveBusLocation speeds per active route (needs an app context)"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.max_age_seconds)
+        rows = db.session.query(Route.id, func.avg(LiveBusLocation.speed)).join(
+            LiveBusLocation, LiveBusLocation.bus_id == Route.bus_id
+        ).filter(
+            Route.is_active == True,
+            LiveBusLocation.last_updated >= cutoff,
+            LiveBusLocation.speed >= MIN_LIVE_SPEED_KMPH
+        ).group_by(Route.id).all()
+        self.update({route_id: float(speed) for route_id, speed in rows})
+    
+    def current_speeds(self):
+        """
+        (table, version) as one consistent pair; ({}, None) when the table has
+        not been refreshed within max_age_seconds
+        """
+        with self._lock:
+            if self.refreshed_at is None or self._clock() - self.refreshed_at > self.max_age_seconds:
+                return {}, None
+            return self.speeds, self.version
+    
+    def edge_minutes(self, graph):
+        """
+        Minutes to ride each edge of graph right now: edge distance at the
+        route's live speed, else the edge's share of the scheduled duration
+        (walking transfers at WALKING_SPEED_KMPH)
+        Computed once per graph and table version
+        Returns: (minutes per edge, number of routes with a live speed)
+        """
+        speeds, version = self.current_speeds()
+        cached = self._weights
+        if cached is not None and cached[0] is graph and cached[1:3] == (graph.version, version):
+            return cached[3], cached[4]
+        
+        route_speed = np.array([speeds.get(route_id, np.nan) for route_id in graph.route_ids.tolist()])
+        route_distance = graph.route_distance[graph.edge_route]
+        scheduled = graph.route_travel_minutes[graph.edge_route] * (graph.distance / route_distance)
+        live_speed = route_speed[graph.edge_route]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            minutes = np.where(
+                ~np.isnan(live_speed) & (route_distance != MISSING_DISTANCE_KM),
+                graph.distance / live_speed * 60, scheduled
+            )
+        walking = graph.edge_route == WALK_ROUTE
+        minutes[walking] = graph.distance[walking] / WALKING_SPEED_KMPH * 60
+        live_routes = int((~np.isnan(route_speed)).sum())
+        self._weights = (graph, graph.version, version, minutes, live_routes)
+        return minutes, live_routes
+
+_table = None
+_table_lock = threading.Lock()
+
+def _refresh_forever(app, table, interval):
+    """Background loop keeping the table current"""
+    while True:
+        try:
+            with app.app_context():
+                table.refresh()
+        except Exception as e:
+            print(f"Live speed refresh error: {e}")
+        time.sleep(interval)
+
+def get_live_speed_table():
+    """
+    Shared live speed table; the first call starts the background refresher,
+    so until its first pass completes routes use their scheduled durations
+    """
+    global _table
+    if _table is not None:
+        return _table
+    with _table_lock:
+        if _table is None:
+            app = current_app._get_current_object()
+            table = LiveSpeedTable(app.config.get('LIVE_SPEED_MAX_AGE_SECONDS', DEFAULT_MAX_AGE_SECONDS))
+            interval = app.config.get('LIVE_SPEED_REFRESH_SECONDS', DEFAULT_REFRESH_SECONDS)
+            threading.Thread(
+                target=_refresh_forever, args=(app, table, interval), name='live-speed-refresh', daemon=True
+            ).start()
+            _table = table
+    return _table
@@ -0,0 +1,194 @@
+"""
+Location Catalog Module
+Process-wide catalogue of known location names, versioned with the route data
+"""
+
+import json
+import os
+import threading
+import time
+import numpy as np
+from flask import current_app
+from sqlalchemy import union
+from app import db
+from app.models.database_models import Route, Stop
+from .transit_graph import route_data_signature, DEFAULT_CHECK_SECONDS
+
+# Bumped whenever the file layout changes; older files are ignored
+CATALOG_FORMAT_VERSION = 1
+CATALOG_MAGIC = b'YSPLACE\0'
+
+class LocationCatalog:
+    """
+    Distinct location names (route ends and stop names) in sorted order,
+    with the route data signature they were read at
+    """
+    
+    def __init__(self, names, signature=None, version=0):
+        self.names = names
+        self.signature = signature
+        self.version = version
+    
+    def __len__(self):
+        return len(self.names)
+    
+    def save(self, path):
+        """
+        Write the catalogue as a magic tag, a JSON header and a UTF-8 string
+        table (offsets then bytes), replacing any existing file atomically
+        """
+        strings = [name.encode('utf-8') for name in self.names]
+        offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+        np.cumsum([len(s) for s in strings], out=offsets[1:])
+        header = json.dumps({
+            'format_version': CATALOG_FORMAT_VERSION,
+            'signature': self.signature,
+            'count': len(strings)
+        }).encode('utf-8')
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as catalog_file:
+            catalog_file.write(CATALOG_MAGIC)
+            catalog_file.write(np.uint64(len(header)).tobytes())
+            catalog_file.write(header)
+            catalog_file.write(offsets.tobytes())
+            catalog_file.write(b''.join(strings))
+        os.replace(temp_path, path)
+    
+    @staticmethod
+    def read_header(raw):
+        """(header, end of header) of the bytes of a catalogue file"""
+        if raw[:len(CATALOG_MAGIC)] != CATALOG_MAGIC:
+            raise ValueError("Not a location catalog file")
+        header_end = len(CATALOG_MAGIC) + 8
+        header_length = int(np.frombuffer(raw, dtype=np.uint64, count=1, offset=len(CATALOG_MAGIC))[0])
+        header = json.loads(raw[header_end:header_end + header_length].decode('utf-8'))
+        if header['format_version'] != CATALOG_FORMAT_VERSION:
+            raise ValueError("Unsupported location catalog format")
+        return header, header_end + header_length
+    
+    @classmethod
+    def load(cls, path, signature=None, version=0):
+        """
+        Catalogue from a file written by save(); each process decodes its own
+        copy of the names, the file only saves it the database queries
+        Returns: the catalogue, or None if signature is given and the file was
+        written at different route data
+        """
+        with open(path, 'rb') as catalog_file:
+            raw = catalog_file.read()
+        header, data_start = cls.read_header(raw)
+        stored = tuple(header['signature']) if header['signature'] is not None else None
+        if signature is not None and stored != signature:
+            return None
+        count = header['count']
+        offsets = np.frombuffer(raw, dtype=np.int64, count=count + 1, offset=data_start).tolist()
+        blob = raw[data_start + (count + 1) * 8:]
+        names = [blob[start:end].decode('utf-8') for start, end in zip(offsets, offsets[1:])]
+        return cls(names, stored, version)
+
+def load_location_names():
+    """Distinct route start/end locations and stop names with one UNION query"""
+    query = union(
+        db.select(Route.start_location), db.select(Route.end_location), db.select(Stop.stop_name)
+    )
+    return sorted(name for (name,) in db.session.execute(query) if name)
+
+_catalog = None
+_catalog_lock = threading.Lock()
+_catalog_path = None        # file shared with other processes, if configured
+_last_check = 0.0
+_refresh_thread = None      # background refresh in flight
+_version_counter = 0
+
+def read_location_catalog(signature, path=None):
+    """
+    Catalogue for the route data at signature: from the shared file when
+    another process already wrote it for that signature, else from the
+    database (then saved to the file for the others)
+    """
+    global _version_counter
+    _version_counter += 1
+    if path and os.path.exists(path):
+        try:
+            catalog = LocationCatalog.load(path, signature, _version_counter)
+            if catalog is not None:
+                return catalog
+        except (OSError, ValueError) as e:
+            print(f"Location catalog file error: {e}")
+    catalog = LocationCatalog(load_location_names(), signature, _version_counter)
+    if path:
+        try:
+            catalog.save(path)
+        except OSError as e:
+            print(f"Location catalog save error: {e}")
+    return catalog
+
+def load_location_catalog_file(path):
+    """
+    Remember the shared catalogue file and install it if present (app startup)
+    The first get_location_catalog() call still compares its signature with the tables
+    Returns: the catalogue, or None if the file does not exist yet
+    """
+    global _catalog, _catalog_path, _last_check, _version_counter
+    with _catalog_lock:
+        _catalog_path = path
+        if not path or not os.path.exists(path):
+            return None
+        _version_counter += 1
+        _catalog = LocationCatalog.load(path, version=_version_counter)
+        _last_check = 0.0
+    return _catalog
+
+def _refresh(app, signature):
+    """Background thread body: read the new catalogue and install it"""
+    global _catalog, _refresh_thread
+    try:
+        with app.app_context():
+            catalog = read_location_catalog(signature, _catalog_path)
+        with _catalog_lock:
+            _catalog = catalog
+    except Exception as e:
+        print(f"Location catalog refresh error: {e}")
+    finally:
+        with _catalog_lock:
+            _refresh_thread = None
+
+def get_location_catalog():
+    """
+    Return the shared location catalogue, reading it on first use
+    The tables are fingerprinted at most once every TRANSIT_GRAPH_CHECK_SECONDS;
+    when they changed, the new catalogue is read in the background and the
+    current one is served until it is ready
+    """
+    global _catalog, _last_check, _refresh_thread
+    
+    check_seconds = current_app.config.get('TRANSIT_GRAPH_CHECK_SECONDS', DEFAULT_CHECK_SECONDS)
+    if _catalog is not None and time.monotonic() - _last_check < check_seconds:
+        return _catalog
+    
+    with _catalog_lock:
+        if _catalog is not None and time.monotonic() - _last_check < check_seconds:
+            return _catalog
+        
+        signature = route_data_signature()
+        _last_check = time.monotonic()
+        if _catalog is None:
+            _catalog = read_location_catalog(signature, _catalog_path)
+        elif _catalog.signature != signature and _refresh_thread is None:
+            _refresh_thread = threading.Thread(
+                target=_refresh, args=(current_app._get_current_object(), signature),
+                name='location-catalog-refresh', daemon=True
+            )
+            _refresh_thread.start()
+    
+    return _catalog
+
+def invalidate_location_catalog():
+    """Compare the catalogue with the tables on the next get_location_catalog() call"""
+    global _last_check
+    with _catalog_lock:
+        _last_check = 0.0
@@ -3,15 +3,44 @@ Location Handler Module
 Handles location normalization, fuzzy matching, and aliases
 """
 
+import re
 from difflib import SequenceMatcher
-from app import db
-from app.models.database_models import Route, Stop
+from flask import current_app, has_app_context
+from .cache import LRUCache
+from .location_catalog import get_location_catalog
+from .location_index import TrigramIndex, BKTree, NgramVectorIndex, AhoCorasick, match_key, DEFAULT_SHORTLIST_SIZE
+
+# How find_best_location_match picks candidates (LOCATION_MATCH_STRATEGY)
+MATCH_TRIGRAM = 'trigram'   # score the trigram index's shortlist
+MATCH_BKTREE = 'bktree'     # nearest name within a length-dependent edit distance, else trigram
+MATCH_SCAN = 'scan'         # score every location
+MATCH_STRATEGIES = (MATCH_TRIGRAM, MATCH_BKTREE, MATCH_SCAN)
+
+# Resolved inputs kept by find_best_location_match (LOCATION_MATCH_CACHE_SIZE)
+DEFAULT_MATCH_CACHE_SIZE = 2048
+
+# Words that mark the location after them as where a trip starts or ends
+SOURCE_MARKERS = ('from',)
+DESTINATION_MARKERS = ('to', 'reach', 'till', 'until', 'towards')
+TRIP_MARKER_PATTERN = re.compile(r'\b(' + '|'.join(SOURCE_MARKERS + DESTINATION_MARKERS) + r')\b')
 
 class LocationHandler:
     """Handles all location-related operations"""
     
-    def __init__(self):
-        self.location_cache = None
+    def __init__(self, strategy=None):
+        """strategy: one of MATCH_STRATEGIES, or None for LOCATION_MATCH_STRATEGY from the app config"""
+        self.strategy = strategy
+        self.location_cache = None      # fixed location list in place of the shared catalogue
+        self.location_index = None
+        self.location_tree = None
+        self.location_vectors = None
+        self.alias_automaton = None
+        self.alias_fragments = None     # {substring of an alias: position of the first alias containing it}
+        self.alias_snapshot = None      # location_aliases as the alias automaton was built from it
+        self.mention_automaton = None
+        self.mention_sources = None     # (location_aliases copy, location list) the mention automaton covers
+        self.match_cache = None
+        self.match_cache_sources = None     # (location list, alias automaton, strategy) the cached matches came from
         self.location_aliases = {
             'cp': 'Connaught Place',
             'connaught': 'Connaught Place',
@@ -77,8 +106,26 @@ class LocationHandler:
         # Sequence matcher
         return SequenceMatcher(None, query_lower, target_lower).ratio()
     
+    def get_alias_automaton(self):
+        """Aho-Corasick automaton over location_aliases, rebuilt when the alias table changes"""
+        if self.alias_automaton is None or self.alias_snapshot != self.location_aliases:
+            self.alias_snapshot = dict(self.location_aliases)
+            aliases = list(self.alias_snapshot)
+            self.alias_automaton = AhoCorasick(aliases, [self.alias_snapshot[alias] for alias in aliases])
+            self.alias_fragments = {}
+            for position, alias in enumerate(aliases):
+                for start in range(len(alias) + 1):
+                    for end in range(start, len(alias) + 1):
+                        self.alias_fragments.setdefault(alias[start:end], position)
+        return self.alias_automaton
+    
     def normalize_location(self, location):
-        """Normalize location name using aliases"""
+        """
+        Normalize location name using aliases
+        The first alias (in table order) that occurs in the location, or that
+        the location is part of, gives the full name: one automaton pass finds
+        the former and a lookup of the alias substrings the latter
+        """
         location_lower = location.lower().strip()
         
         # Check aliases first
@@ -86,44 +133,159 @@ class LocationHandler:
             return self.location_aliases[location_lower]
         
         # Check partial matches in aliases
-        for alias, full_name in self.location_aliases.items():
-            if alias in location_lower or location_lower in alias:
-                return full_name
+        automaton = self.get_alias_automaton()
+        positions = [alias_id for _, _, alias_id in automaton.find_all(location_lower)]
+        if location_lower in self.alias_fragments:
+            positions.append(self.alias_fragments[location_lower])
+        if positions:
+            return automaton.values[min(positions)]
         
         # Return title case if no match
         return location.title()
     
     def get_all_locations(self):
-        """Get all unique locations from database with caching"""
-        if self.location_cache is None:
-            try:
-                start_locs = db.session.query(Route.start_location).distinct().all()
-                end_locs = db.session.query(Route.end_location).distinct().all()
-                stop_locs = db.session.query(Stop.stop_name).distinct().all()
-                
-                locations = set()
-                for loc in start_locs + end_locs:
-                    if loc[0]:
-                        locations.add(loc[0])
-                for loc in stop_locs:
-                    if loc[0]:
-                        locations.add(loc[0])
-                
-                self.location_cache = list(locations)
-            except:
-                self.location_cache = []
-        
-        return self.location_cache
+        """
+        All known location names: location_cache when it is set, else the
+        shared catalogue, which follows route and stop imports without a restart
+        """
+        if self.location_cache is not None:
+            return self.location_cache
+        try:
+            return get_location_catalog().names
+        except Exception as e:
+            print(f"Location catalog error: {e}")
+            return []
+    
+    def get_mention_automaton(self):
+        """
+        Aho-Corasick automaton over the aliases and every location's match key,
+        rebuilt when the alias table changes or the location list is reloaded
+        """
+        all_locations = self.get_all_locations()
+        if (self.mention_automaton is None or self.mention_sources[1] is not all_locations
+                or self.mention_sources[0] != self.location_aliases):
+            aliases = dict(self.location_aliases)
+            patterns = list(aliases)
+            names = [aliases[alias] for alias in patterns]
+            for location in all_locations:
+                key = match_key(location)
+                if key:
+                    patterns.append(key)
+                    names.append(location)
+            self.mention_automaton = AhoCorasick(patterns, names)
+            self.mention_sources = (aliases, all_locations)
+        return self.mention_automaton
+    
+    def find_location_mentions(self, message):
+        """
+        Every alias or known location named in a message, in one pass
+        Only whole-word occurrences count, so 'cp' is not found in 'cpu'
+        Returns: [(start, end, location name), ...] by start, longer spans first,
+        each span and name once even when an alias spells a location's name
+        """
+        text = message.lower()
+        automaton = self.get_mention_automaton()
+        mentions = set()
+        for start, end, pattern_id in automaton.find_all(text):
+            if start > 0 and text[start - 1].isalnum():
+                continue
+            if end < len(text) and text[end].isalnum():
+                continue
+            mentions.add((start, end, automaton.values[pattern_id]))
+        return sorted(mentions, key=lambda mention: (mention[0], -mention[1], mention[2]))
+    
+    def get_location_index(self):
+        """Trigram index over get_all_locations(), rebuilt when the location list is reloaded"""
+        all_locations = self.get_all_locations()
+        if self.location_index is None or self.location_index.locations is not all_locations:
+            self.location_index = TrigramIndex(all_locations)
+        return self.location_index
+    
+    def get_location_tree(self):
+        """BK-tree over get_all_locations(), rebuilt when the location list is reloaded"""
+        all_locations = self.get_all_locations()
+        if self.location_tree is None or self.location_tree.locations is not all_locations:
+            self.location_tree = BKTree(all_locations)
+        return self.location_tree
+    
+    def get_location_vectors(self):
+        """TF-IDF n-gram vectors of get_all_locations(), rebuilt when the location list is reloaded"""
+        all_locations = self.get_all_locations()
+        if self.location_vectors is None or self.location_vectors.locations is not all_locations:
+            self.location_vectors = NgramVectorIndex(all_locations)
+        return self.location_vectors
+    
+    def match_strategy(self):
+        """Candidate strategy for find_best_location_match"""
+        strategy = self.strategy
+        if strategy is None:
+            strategy = current_app.config.get('LOCATION_MATCH_STRATEGY', MATCH_TRIGRAM) if has_app_context() else MATCH_TRIGRAM
+        if strategy not in MATCH_STRATEGIES:
+            raise ValueError(f"Unknown location match strategy: {strategy}")
+        return strategy
+    
+    def get_match_cache(self):
+        """
+        LRU cache of find_best_location_match results by raw input, sized from
+        the app config on first use and emptied whenever the location list is
+        reloaded, the alias table changes or another strategy is configured
+        """
+        if self.match_cache is None:
+            config = current_app.config if has_app_context() else {}
+            self.match_cache = LRUCache(config.get('LOCATION_MATCH_CACHE_SIZE', DEFAULT_MATCH_CACHE_SIZE))
+        
+        sources = (self.get_all_locations(), self.get_alias_automaton(), self.match_strategy())
+        previous = self.match_cache_sources
+        if previous is None or sources[0] is not previous[0] or sources[1] is not previous[1] or sources[2] != previous[2]:
+            self.match_cache_sources = sources
+            self.match_cache.sync_version((self.match_cache.version or 0) + 1)
+        return self.match_cache
+    
+    def match_cache_stats(self):
+        """Hit/miss/eviction counters and occupancy of the match cache"""
+        return self.get_match_cache().stats()
     
     def find_best_location_match(self, query):
-        """Find best matching location using fuzzy matching"""
+        """
+        Find best matching location using fuzzy matching
+        Repeated inputs are answered from the match cache
+        Returns: (location, score)
+        """
+        cache = self.get_match_cache()
+        match = cache.get(query)
+        if match is None:
+            match = self.match_location(query)
+            cache.put(query, match)
+        return match
+    
+    def match_location(self, query):
+        """
+        find_best_location_match without the cache
+        Only the trigram index's shortlist is scored, in list order so ties
+        resolve as they would scanning every location. The bktree strategy
+        first takes the nearest name by edit distance (score 1 - distance / length)
+        """
         query_normalized = self.normalize_location(query)
-        all_locations = self.get_all_locations()
+        strategy = self.match_strategy()
+        
+        if strategy == MATCH_BKTREE:
+            tree = self.get_location_tree()
+            matches, _ = tree.search(query_normalized)
+            if matches:
+                distance, location_id = matches[0]
+                location = tree.locations[location_id]
+                return location, 1.0 - distance / max(len(query_normalized.strip()), len(location.strip()), 1)
+        
+        if strategy == MATCH_SCAN:
+            candidates = self.get_all_locations()
+        else:
+            index = self.get_location_index()
+            candidates = [index.locations[i] for i in index.shortlist(query_normalized, DEFAULT_SHORTLIST_SIZE)]
         
         best_match = None
         best_score = 0.0
         
-        for location in all_locations:
+        for location in candidates:
             score = self.fuzzy_match(query_normalized, location)
             if score > best_score:
                 best_score = score
@@ -136,6 +298,87 @@ class LocationHandler:
         # Try normalized version
         return query_normalized, 0.5
     
+    def find_best_location_matches(self, queries, threshold=0.6):
+        """
+        Match many location strings at once, for log replays and training data
+        All queries are scored in one sparse product by TF-IDF cosine similarity
+        of character n-grams, so scores are on that scale rather than
+        find_best_location_match's
+        Returns: [(match, score), ...] aligned with queries; below threshold the
+        normalized query with score 0.5, as find_best_location_match does
+        """
+        queries_normalized = [self.normalize_location(query) for query in queries]
+        vectors = self.get_location_vectors()
+        location_ids, scores = vectors.best_matches(queries_normalized)
+        
+        matches = []
+        for query_normalized, location_id, score in zip(queries_normalized, location_ids.tolist(), scores.tolist()):
+            if location_id >= 0 and score >= threshold:
+                matches.append((vectors.locations[location_id], score))
+            else:
+                matches.append((query_normalized, 0.5))
+        return matches
+    
+    def find_trip_locations(self, message):
+        """
+        Source and destination named in a message, in one pass over it
+        Known location and alias mentions are read longest first without
+        overlaps; each takes its role from a marker word ('from', 'to', 'reach'...)
+        before it with no other mention in between, and unmarked mentions fill
+        the roles still open in message order
+        Returns: [source, destination], [destination] or [] as resolved names
+        """
+        text = message.lower()
+        spans = []
+        for start, end, name in sorted(self.find_location_mentions(message), key=lambda m: (m[0] - m[1], m[0])):
+            if all(end <= taken[0] or start >= taken[1] for taken in spans):
+                spans.append((start, end, name))
+        spans.sort()
+        
+        markers = [(marker.start(), marker.group(1)) for marker in TRIP_MARKER_PATTERN.finditer(text)
+                   if not any(start <= marker.start() < end for start, end, _ in spans)]
+        source = destination = None
+        unmarked = []
+        previous_end = 0
+        for start, end, name in spans:
+            role = None
+            for position, marker in markers:
+                if previous_end <= position < start:
+                    role = marker
+            if role in SOURCE_MARKERS and source is None:
+                source = name
+            elif role in DESTINATION_MARKERS and destination is None:
+                destination = name
+            else:
+                unmarked.append(name)
+            previous_end = end
+        
+        # A lone unmarked mention is not enough to tell which end of the trip it is
+        if source is None and destination is None and len(unmarked) < 2:
+            return []
+        for name in unmarked:
+            if source is None:
+                source = name
+            elif destination is None:
+                destination = name
+        if source is not None and destination is not None:
+            return [source, destination]
+        if destination is not None and not any(marker in SOURCE_MARKERS for _, marker in markers):
+            return [destination]
+        return []
+    
+    def resolve_locations_from_message(self, message):
+        """
+        Resolved source and destination of a message with match scores
+        Gazetteer mentions (score 1.0) when they account for the whole trip, else
+        the regex chunks of extract_locations_from_message, fuzzy matched
+        Returns: [(location, score), ...] ordered like extract_locations_from_message
+        """
+        locations = self.find_trip_locations(message)
+        if locations:
+            return [(location, 1.0) for location in locations]
+        return [self.find_best_location_match(chunk) for chunk in self.extract_locations_from_message(message)]
+    
     def extract_location(self, message):
         """Extract a single location from message"""
         # Remove common words
@@ -0,0 +1,325 @@
+"""
+Location Index Module
+Candidate lookup structures for fuzzy location matching
+"""
+
+import numpy as np
+from scipy import sparse
+
+# Candidates ranked by trigram overlap that are handed to the full scorer
+DEFAULT_SHORTLIST_SIZE = 30
+
+def match_key(name):
+    """Form of a location name the indexes compare: lower case, outer whitespace stripped"""
+    return name.lower().strip()
+
+def trigrams(key):
+    """Distinct character trigrams of a key (empty for keys shorter than three characters)"""
+    return {key[i:i + 3] for i in range(len(key) - 2)}
+
+class TrigramIndex:
+    """
+    Character-trigram inverted index over location names
+    postings[g] lists the ids (positions in locations) of every name whose key
+    contains trigram g. Counting a query's trigrams over the postings gives
+    each name's overlap with it, which yields containment in either direction
+    exactly (all of the shorter key's trigrams are shared) and ranks the rest
+    by Dice similarity for the expensive scorer
+    """
+    
+    def __init__(self, locations):
+        """locations: list of names, kept by reference so owners can tell which list was indexed"""
+        self.locations = locations
+        self.keys = [match_key(name) for name in self.locations]
+        
+        # First id of every key, as a full scan would meet it
+        self.exact = {}
+        for location_id, key in enumerate(self.keys):
+            self.exact.setdefault(key, location_id)
+        
+        postings = {}
+        gram_counts = []
+        for location_id, key in enumerate(self.keys):
+            grams = trigrams(key)
+            gram_counts.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(location_id)
+        self.postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+        self.gram_counts = np.array(gram_counts, dtype=np.int32)
+        # Keys too short for trigrams are always offered to the scorer
+        self.short_ids = np.flatnonzero(self.gram_counts == 0)
+    
+    def __len__(self):
+        return len(self.locations)
+    
+    def shortlist(self, query, size=DEFAULT_SHORTLIST_SIZE):
+        """
+        Ids worth scoring against query, in list order: exact and containment
+        matches plus the size names with the highest trigram Dice similarity
+        Queries shorter than three characters have no trigrams and get every id
+        """
+        key = match_key(query)
+        query_grams = trigrams(key)
+        query_count = len(query_grams)
+        if query_count == 0:
+            return list(range(len(self.locations)))
+        
+        overlap = np.zeros(len(self.locations), dtype=np.int32)
+        postings = [self.postings[gram] for gram in query_grams if gram in self.postings]
+        if postings:
+            overlap = np.bincount(np.concatenate(postings),
+                                  minlength=len(self.locations))
+        
+        # Query inside a name, or a name inside the query: every trigram of the shorter one is shared
+        contained = (overlap == query_count) | ((overlap == self.gram_counts) & (self.gram_counts > 0))
+        candidates = set(np.flatnonzero(contained).tolist())
+        candidates.update(self.short_ids.tolist())
+        exact = self.exact.get(key)
+        if exact is not None:
+            candidates.add(exact)
+        
+        sharing = np.flatnonzero(overlap)
+        if len(sharing):
+            dice = 2.0 * overlap[sharing] / (query_count + self.gram_counts[sharing])
+            if len(sharing) > size:
+                top = np.argpartition(-dice, size - 1)[:size]
+            else:
+                top = np.arange(len(sharing))
+            candidates.update(sharing[top].tolist())
+        return sorted(candidates)
+
+def levenshtein(first, second):
+    """
+    Edit distance between two strings (insertions, deletions and substitutions)
+    Bit-parallel (Myers / Hyyrö): one column of the DP table is held in the
+    bits of two integers, so each character of second costs a few int operations
+    """
+    if not first or not second:
+        return len(first) + len(second)
+    matches = {}     # {character: bit i set where first[i] is that character}
+    for i, char in enumerate(first):
+        matches[char] = matches.get(char, 0) | (1 << i)
+    mask = (1 << len(first)) - 1
+    last = 1 << (len(first) - 1)
+    plus, minus, distance = mask, 0, len(first)     # vertical +1 / -1 deltas of the column
+    for char in second:
+        equal = matches.get(char, 0)
+        vertical = equal | minus
+        horizontal = (((equal & plus) + plus) ^ plus) | equal
+        up = minus | (~(horizontal | plus) & mask)
+        down = plus & horizontal
+        if up & last:
+            distance += 1
+        elif down & last:
+            distance -= 1
+        up = ((up << 1) | 1) & mask
+        down = (down << 1) & mask
+        plus = down | (~(vertical | up) & mask)
+        minus = up & vertical
+    return distance
+
+# Most edits a query may be from a name, however long it is
+MAX_EDIT_DISTANCE = 3
+
+def edit_bound(length):
+    """Edits a query of this length may be away from a name: none under 4 characters, then one per 4 up to MAX_EDIT_DISTANCE"""
+    return min(MAX_EDIT_DISTANCE, length // 4)
+
+class BKTree:
+    """
+    Burkhard-Keller tree over location keys under Levenshtein distance
+    Each node keeps its children by their distance to it, so by the triangle
+    inequality a search within k of a query at distance d from a node only
+    descends into children at distance d - k .. d + k
+    """
+    
+    def __init__(self, locations):
+        """locations: list of names, kept by reference like TrigramIndex"""
+        self.locations = locations
+        self.root = None    # [key, [location ids], {distance: child node}]
+        for location_id, name in enumerate(locations):
+            self._insert(match_key(name), location_id)
+    
+    def __len__(self):
+        return len(self.locations)
+    
+    def _insert(self, key, location_id):
+        if self.root is None:
+            self.root = [key, [location_id], {}]
+            return
+        node = self.root
+        while True:
+            distance = levenshtein(key, node[0])
+            if distance == 0:
+                node[1].append(location_id)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [key, [location_id], {}]
+                return
+            node = child
+    
+    def search(self, query, max_distance=None):
+        """
+        Names within max_distance edits of query (default edit_bound of its length)
+        Returns: ([(distance, location id), ...] nearest first then in list order, nodes visited)
+        """
+        key = match_key(query)
+        if max_distance is None:
+            max_distance = edit_bound(len(key))
+        matches, visited = [], 0
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            visited += 1
+            distance = levenshtein(key, node[0])
+            if distance <= max_distance:
+                matches.extend((distance, location_id) for location_id in node[1])
+            for edge, child in node[2].items():
+                if distance - max_distance <= edge <= distance + max_distance:
+                    stack.append(child)
+        return sorted(matches), visited
+
+# Character n-gram lengths the vector index weighs
+NGRAM_RANGE = (2, 3)
+
+# Queries multiplied against the location matrix at a time, bounding the similarity block held in memory
+QUERY_BATCH_SIZE = 2048
+
+def ngrams(key, ngram_range=NGRAM_RANGE):
+    """Character n-grams of a key padded with a space at each end, with repeats"""
+    padded = f' {key} '
+    return [padded[i:i + n] for n in range(ngram_range[0], ngram_range[1] + 1)
+            for i in range(len(padded) - n + 1)]
+
+class NgramVectorIndex:
+    """
+    TF-IDF weighted character n-gram vectors of location names
+    Rows are L2-normalised, so one sparse product of a batch of query vectors
+    with the location matrix gives every query's cosine similarity to every
+    name. N-grams no location contains carry no weight, as in a vectorizer
+    fitted on the gazetteer
+    """
+    
+    def __init__(self, locations, ngram_range=NGRAM_RANGE):
+        """locations: list of names, kept by reference like TrigramIndex"""
+        self.locations = locations
+        self.ngram_range = ngram_range
+        self.vocabulary = {}
+        for name in locations:
+            for gram in ngrams(match_key(name), ngram_range):
+                self.vocabulary.setdefault(gram, len(self.vocabulary))
+        
+        counts = self._counts(locations)
+        # Smoothed inverse document frequency: log((1 + n) / (1 + df)) + 1
+        document_frequency = np.bincount(counts.indices, minlength=len(self.vocabulary))
+        self.idf = np.log((1.0 + len(locations)) / (1.0 + document_frequency)) + 1.0
+        self.matrix = self._weigh(counts).T.tocsr()
+    
+    def __len__(self):
+        return len(self.locations)
+    
+    def _counts(self, names):
+        """Sparse n-gram count matrix, one row per name"""
+        indptr, indices = [0], []
+        for name in names:
+            indices.extend(self.vocabulary[gram] for gram in ngrams(match_key(name), self.ngram_range)
+                           if gram in self.vocabulary)
+            indptr.append(len(indices))
+        data = np.ones(len(indices), dtype=np.float64)
+        counts = sparse.csr_matrix((data, indices, indptr), shape=(len(names), len(self.vocabulary)))
+        counts.sum_duplicates()
+        return counts
+    
+    def _weigh(self, counts):
+        """TF-IDF rows scaled to unit length (rows without known n-grams stay zero)"""
+        weighted = counts.multiply(self.idf).tocsr()
+        norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return sparse.diags(1.0 / norms) @ weighted
+    
+    def best_matches(self, queries, batch_size=QUERY_BATCH_SIZE):
+        """
+        Most similar location of every query
+        Returns: (location ids, cosine scores) as arrays aligned with queries;
+        ties go to the first location in list order, and queries sharing no
+        n-gram with any location get score 0 and id -1
+        """
+        ids = np.full(len(queries), -1, dtype=np.int64)
+        scores = np.zeros(len(queries))
+        for start in range(0, len(queries), batch_size):
+            batch = self._weigh(self._counts(queries[start:start + batch_size]))
+            similarity = (batch @ self.matrix).tocsr()
+            row_lengths = np.diff(similarity.indptr)
+            rows = np.flatnonzero(row_lengths)
+            if len(rows) == 0:
+                continue
+            # Row maxima, then the first column reaching each row's maximum
+            best = np.maximum.reduceat(similarity.data, similarity.indptr[rows])
+            reaches = similarity.data >= np.repeat(best, row_lengths[rows]) - 1e-12
+            columns = np.where(reaches, similarity.indices, len(self.locations))
+            ids[start + rows] = np.minimum.reduceat(columns, similarity.indptr[rows])
+            scores[start + rows] = best
+        return ids, scores
+
+class AhoCorasick:
+    """
+    Aho-Corasick automaton over a list of patterns
+    One pass over a text reports every occurrence of every pattern: states are
+    the trie of the patterns, failure links jump to the longest proper suffix
+    that is also a trie path, and each state lists the patterns ending there
+    (its own plus those reached through failure links)
+    """
+    
+    def __init__(self, patterns, values=None):
+        """
+        patterns: list of non-empty strings, matched as given (callers pass match keys)
+        values: what each pattern stands for, parallel to patterns (default the patterns)
+        """
+        self.patterns = patterns
+        self.values = values if values is not None else patterns
+        self.goto = [{}]        # per state: {character: next state}
+        self.outputs = [[]]     # per state: pattern ids ending here, longest first
+        for pattern_id, pattern in enumerate(patterns):
+            state = 0
+            for char in pattern:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.outputs.append([])
+                state = next_state
+            self.outputs[state].append(pattern_id)
+        
+        # Breadth first, so a state's failure target is finished before its children need it
+        self.fail = [0] * len(self.goto)
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for char, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[child] = target if target != child else 0
+                self.outputs[child] = self.outputs[child] + self.outputs[self.fail[child]]
+    
+    def __len__(self):
+        return len(self.patterns)
+    
+    def find_all(self, text):
+        """Every (start, end, pattern id) occurrence in text, by end position"""
+        goto, fail, outputs, patterns = self.goto, self.fail, self.outputs, self.patterns
+        found = []
+        state = 0
+        for position, char in enumerate(text):
+            next_state = goto[state].get(char)
+            while next_state is None and state:
+                state = fail[state]
+                next_state = goto[state].get(char)
+            state = next_state or 0
+            if outputs[state]:
+                for pattern_id in outputs[state]:
+                    found.append((position + 1 - len(patterns[pattern_id]), position + 1, pattern_id))
+        return found
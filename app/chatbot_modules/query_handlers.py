@@ -4,8 +4,16 @@ Handles specific query types (fare, booking, AC bus, etc.)
 """
 
 import re
+from flask import current_app
 from app.models.database_models import Route, Bus, Booking
-from .algorithms import PathfindingAlgorithms
+from .algorithms import PathfindingAlgorithms, DISTANCE, FARE, ROUTE_FARE, DEFAULT_ALTERNATIVES, MAX_ALTERNATIVES, DEFAULT_REACH_KM
+from .timetable import get_timetable
+
+# 'leave at 08:30', 'departing 6 pm', 'at 7:15am'
+DEPARTURE_TIME_PATTERN = re.compile(
+    r'\b(?:(?:leave|leaving|depart|departing|departure|start|starting)\s+(?:at\s+)?|at\s+)'
+    r'(\d{1,2})(?:[:.](\d{2}))?\s*(am|pm)?\b'
+)
 
 class QueryHandlers:
     """Handles specific query types"""
@@ -16,13 +24,12 @@ class QueryHandlers:
     
     def handle_fare_query(self, user_id, message_lower, original_message):
         """Handle fare inquiry"""
-        locations = self.location_handler.extract_locations_from_message(original_message)
+        locations = self.location_handler.resolve_locations_from_message(original_message)
         
         if len(locations) >= 2:
-            source_match, _ = self.location_handler.find_best_location_match(locations[0])
-            dest_match, _ = self.location_handler.find_best_location_match(locations[1])
+            (source_match, _), (dest_match, _) = locations[:2]
             
-            routes = self.route_search.find_routes(locations[0], locations[1], self.location_handler)
+            routes = self.route_search.find_routes(source_match, dest_match, self.location_handler)
             if routes:
                 cheapest = min(routes, key=lambda r: float(r.fare))
                 most_expensive = max(routes, key=lambda r: float(r.fare))
@@ -60,7 +67,7 @@ class QueryHandlers:
                 }
         elif len(locations) == 1:
             # Only destination provided, ask for source
-            dest_match, _ = self.location_handler.find_best_location_match(locations[0])
+            dest_match, _ = locations[0]
             return {
                 'message': f"To check fare to {dest_match}\n\nWhere are you starting from?",
                 'type': 'text',
@@ -99,11 +106,10 @@ class QueryHandlers:
     
     def handle_cheapest_route_query(self, user_id, message_lower, original_message):
         """Handle cheapest route queries using Greedy algorithm"""
-        locations = self.location_handler.extract_locations_from_message(original_message)
+        locations = self.location_handler.resolve_locations_from_message(original_message)
         
         if len(locations) >= 2:
-            source_match, _ = self.location_handler.find_best_location_match(locations[0])
-            dest_match, _ = self.location_handler.find_best_location_match(locations[1])
+            (source_match, _), (dest_match, _) = locations[:2]
             
             # Use Greedy algorithm for minimum fare
             cheapest_route, total_fare, path = PathfindingAlgorithms.greedy_minimum_fare(source_match, dest_match)
@@ -126,7 +132,7 @@ class QueryHandlers:
                 }
             else:
                 # Fallback to simple search
-                routes = self.route_search.find_routes(locations[0], locations[1], self.location_handler)
+                routes = self.route_search.find_routes(source_match, dest_match, self.location_handler)
                 if routes:
                     cheapest = min(routes, key=lambda r: float(r.fare))
                     bus = Bus.query.get(cheapest.bus_id) if cheapest.bus_id else None
@@ -151,14 +157,18 @@ class QueryHandlers:
     
     def handle_fastest_route_query(self, user_id, message_lower, original_message):
         """Handle fastest route queries using Dijkstra's algorithm"""
-        locations = self.location_handler.extract_locations_from_message(original_message)
+        locations = self.location_handler.resolve_locations_from_message(original_message)
         
         if len(locations) >= 2:
-            source_match, _ = self.location_handler.find_best_location_match(locations[0])
-            dest_match, _ = self.location_handler.find_best_location_match(locations[1])
+            (source_match, _), (dest_match, _) = locations[:2]
+            
+            # "Fastest right now": weight by live bus speeds instead of distance
+            if re.search(r'\b(?:now|live|traffic|currently)\b', message_lower):
+                return self.live_fastest_response(source_match, dest_match)
             
-            # Use Dijkstra's algorithm for shortest distance
-            shortest_route, total_distance, path = PathfindingAlgorithms.dijkstra_shortest_path(source_match, dest_match)
+            # Use Dijkstra's algorithm for shortest distance (engine selected in config)
+            engine = current_app.config.get('ROUTING_ENGINE', 'dijkstra')
+            shortest_route, total_distance, path = PathfindingAlgorithms.dijkstra_shortest_path(source_match, dest_match, engine=engine)
             
             if shortest_route:
                 bus = Bus.query.get(shortest_route.bus_id) if shortest_route.bus_id else None
@@ -179,7 +189,7 @@ class QueryHandlers:
                 }
             else:
                 # Fallback to simple search
-                routes = self.route_search.find_routes(locations[0], locations[1], self.location_handler)
+                routes = self.route_search.find_routes(source_match, dest_match, self.location_handler)
                 if routes:
                     fastest = min(routes, key=lambda r: r.estimated_duration_minutes if r.estimated_duration_minutes else float(r.distance_km) if r.distance_km else 999)
                     bus = Bus.query.get(fastest.bus_id) if fastest.bus_id else None
@@ -203,15 +213,178 @@ class QueryHandlers:
             'suggestions': ['Find Route']
         }
     
+    def live_fastest_response(self, source, destination):
+        """Quickest itinerary by current travel times (live speeds, scheduled durations elsewhere)"""
+        itinerary = PathfindingAlgorithms.fastest_right_now(source, destination)
+        
+        if not itinerary:
+            return {
+                'message': f"No routes found\n\nFrom: {source}\nTo: {destination}",
+                'type': 'text',
+                'suggestions': self.location_handler.get_popular_destinations()[:4]
+            }
+        
+        msg = f"FASTEST RIGHT NOW: {source} → {destination}\n\n"
+        msg += f"Travel time: ~{itinerary['minutes']:g} min\n"
+        msg += f"Distance: {itinerary['distance_km']} km | Fare: ₹{itinerary['fare']:.0f}\n\n"
+        for leg in itinerary['legs']:
+            msg += f"• {leg['route_number']}: {leg['board']} → {leg['alight']}\n"
+        if not itinerary['live_routes']:
+            msg += "\nNo live bus data right now; times are scheduled estimates"
+        
+        return {
+            'message': msg.rstrip(),
+            'type': 'itinerary',
+            'itinerary': itinerary,
+            'suggestions': ['Book Ticket', 'Cheapest Route', 'New Search']
+        }
+    
+    def handle_alternative_routes_query(self, user_id, message_lower, original_message):
+        """Handle alternative route queries using Yen's k-shortest paths"""
+        locations = self.location_handler.resolve_locations_from_message(original_message)
+        
+        if len(locations) >= 2:
+            (source_match, _), (dest_match, _) = locations[:2]
+            return self.alternative_routes_response(source_match, dest_match, message_lower)
+        
+        return {
+            'message': "Find alternative routes\n\nExample: 'Show me 3 options from CP to Dwarka'",
+            'type': 'text',
+            'suggestions': ['Find Route']
+        }
+    
+    def alternative_routes_response(self, source, destination, message_lower=''):
+        """Top-k itineraries between two resolved locations, by fare if asked, else by distance"""
+        count_match = re.search(r'\b(\d+)\s+(?:options|alternatives|alternative routes|routes)', message_lower)
+        k = min(max(int(count_match.group(1)), 1), MAX_ALTERNATIVES) if count_match else DEFAULT_ALTERNATIVES
+        by_fare = any(word in message_lower for word in ['cheap', 'fare', 'price'])
+        
+        itineraries = PathfindingAlgorithms.k_shortest_paths(source, destination, k, FARE if by_fare else DISTANCE)
+        
+        if not itineraries:
+            return {
+                'message': f"No routes found\n\nFrom: {source}\nTo: {destination}",
+                'type': 'text',
+                'suggestions': self.location_handler.get_popular_destinations()[:4]
+            }
+        
+        msg = f"ALTERNATIVE ROUTES: {source} → {destination}\n"
+        msg += f"Ranked by {'fare' if by_fare else 'distance'}\n\n"
+        for idx, itinerary in enumerate(itineraries, 1):
+            rides = [leg['route_number'] for leg in itinerary['legs'] if leg['mode'] == 'bus']
+            transfers = max(len(rides) - 1, 0)
+            msg += f"{idx}. Bus {' → '.join(rides)}\n" if rides else f"{idx}. Walk\n"
+            msg += f"   ₹{itinerary['fare']:.0f} | {itinerary['distance_km']} km"
+            if transfers:
+                msg += f" | {transfers} transfer{'s' if transfers > 1 else ''}"
+            msg += "\n"
+            for leg in itinerary['legs']:
+                msg += f"   • {leg['route_number']}: {leg['board']} → {leg['alight']}\n"
+            msg += "\n"
+        
+        return {
+            'message': msg.rstrip(),
+            'type': 'itinerary_list',
+            'itineraries': itineraries,
+            'suggestions': ['Book Ticket', 'Cheapest Route', 'Fastest Route', 'New Search']
+        }
+    
+    def handle_reachability_query(self, user_id, message_lower, original_message):
+        """Handle 'where can I go from X within 10 km / ₹25' with one bounded search"""
+        match = re.search(r'from\s+(.+?)(?:\s+(?:within|under|in)\s+(.*))?(?:\?|$)', message_lower)
+        source = match.group(1).strip() if match else None
+        
+        if not source:
+            return {
+                'message': "Find where you can go\n\nExample: 'Where can I go from Kashmere Gate within 10 km'",
+                'type': 'text',
+                'suggestions': ['Find Route']
+            }
+        
+        budget_text = match.group(2) or ''
+        amount = re.search(r'(\d+(?:\.\d+)?)', budget_text)
+        by_fare = amount is not None and any(word in budget_text for word in ['₹', 'rs', 'rupee', 'inr'])
+        budget = float(amount.group(1)) if amount else DEFAULT_REACH_KM
+        
+        source_match, _ = self.location_handler.find_best_location_match(source)
+        stops = PathfindingAlgorithms.reachable_stops(source_match, budget, ROUTE_FARE if by_fare else DISTANCE)
+        budget_label = f"₹{budget:g}" if by_fare else f"{budget:g} km"
+        
+        if not stops:
+            return {
+                'message': f"No stops reachable within {budget_label}\n\nFrom: {source_match}",
+                'type': 'text',
+                'suggestions': self.location_handler.get_popular_destinations()[:4]
+            }
+        
+        msg = f"REACHABLE FROM {source_match.upper()}\n"
+        msg += f"Within {budget_label}: {len(stops)} stop(s)\n\n"
+        for stop in stops[:10]:
+            cost = f"₹{stop['cost']:g}" if by_fare else f"{stop['cost']:g} km"
+            msg += f"• {stop['stop']} ({cost})\n"
+        if len(stops) > 10:
+            msg += f"...and {len(stops) - 10} more"
+        
+        return {
+            'message': msg.rstrip(),
+            'type': 'reachability',
+            'source': source_match,
+            'metric': ROUTE_FARE if by_fare else DISTANCE,
+            'budget': budget,
+            'stops': stops,
+            'suggestions': ['Find Route', 'Popular Routes', 'New Search']
+        }
+    
+    def handle_departure_time_query(self, user_id, message_lower, original_message):
+        """Handle 'from X to Y leaving at 08:30' with one time-dependent search"""
+        time_match = DEPARTURE_TIME_PATTERN.search(message_lower)
+        # Drop the time clause so it is not read as part of a location
+        trip_text = original_message[:time_match.start()] + original_message[time_match.end():] if time_match else original_message
+        locations = self.location_handler.resolve_locations_from_message(trip_text)
+        
+        if not time_match or len(locations) < 2:
+            return {
+                'message': "Plan by departure time\n\nExample: 'From Azadpur to Saket leaving at 08:30'",
+                'type': 'text',
+                'suggestions': ['Find Route']
+            }
+        
+        hours, minutes, meridiem = int(time_match.group(1)), int(time_match.group(2) or 0), time_match.group(3)
+        if meridiem:
+            hours = hours % 12 + (12 if meridiem == 'pm' else 0)
+        departure = f"{hours % 24:02d}:{minutes:02d}"
+        
+        (source_match, _), (dest_match, _) = locations[:2]
+        journey = get_timetable().earliest_arrival(source_match, dest_match, departure)
+        
+        if not journey:
+            return {
+                'message': f"No bus gets there after {departure}\n\nFrom: {source_match}\nTo: {dest_match}",
+                'type': 'text',
+                'suggestions': ['Find Route', 'New Search']
+            }
+        
+        msg = f"JOURNEY PLAN: {source_match} → {dest_match}\n"
+        msg += f"Leave {journey['departure']}, arrive {journey['arrival']} ({journey['duration_minutes']:g} min, "
+        msg += f"{journey['waiting_minutes']:g} min waiting)\n\n"
+        for leg in journey['legs']:
+            msg += f"• {leg['route_number']}: {leg['board']} {leg['departure']} → {leg['alight']} {leg['arrival']}\n"
+        
+        return {
+            'message': msg.rstrip(),
+            'type': 'journey',
+            'journey': journey,
+            'suggestions': ['Book Ticket', 'Fastest Route', 'New Search']
+        }
+    
     def handle_ac_bus_query(self, user_id, message_lower, original_message):
         """Handle AC bus queries"""
-        locations = self.location_handler.extract_locations_from_message(original_message)
+        locations = self.location_handler.resolve_locations_from_message(original_message)
         
         if len(locations) >= 2:
-            source_match, _ = self.location_handler.find_best_location_match(locations[0])
-            dest_match, _ = self.location_handler.find_best_location_match(locations[1])
+            (source_match, _), (dest_match, _) = locations[:2]
             
-            routes = self.route_search.find_routes(locations[0], locations[1], self.location_handler)
+            routes = self.route_search.find_routes(source_match, dest_match, self.location_handler)
             if routes:
                 # Filter AC buses
                 ac_routes = []
@@ -0,0 +1,241 @@
+"""
+RAPTOR Journey Planner Module
+Round-based, transfer-aware journey planning over route patterns
+"""
+
+import math
+import threading
+from datetime import datetime
+import numpy as np
+from .transit_graph import get_transit_graph, WALKING_SPEED_KMPH
+
+# Service window of the frequency-based timetable, in minutes after midnight
+SERVICE_START_MINUTES = 5 * 60
+SERVICE_END_MINUTES = 23 * 60
+
+DEFAULT_MAX_TRANSFERS = 3
+
+def parse_clock(value=None):
+    """Minutes after midnight from 'HH:MM', a datetime/time, a number, or None (now)"""
+    if value is None:
+        value = datetime.now()
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        hours, minutes = value.strip().split(':')[:2]
+        return int(hours) * 60 + int(minutes)
+    return value.hour * 60 + value.minute + getattr(value, 'second', 0) / 60.0
+
+def format_clock(minutes):
+    """'HH:MM' for minutes after midnight"""
+    minutes = int(round(minutes))
+    return f"{(minutes // 60) % 24:02d}:{minutes % 60:02d}"
+
+class RaptorPlanner:
+    """
+    RAPTOR over a TransitGraph: round k finds the earliest arrival at every stop
+    using at most k vehicles. Routes run every route_headway minutes from their
+    first scheduled departure (SERVICE_START_MINUTES if unknown) until
+    SERVICE_END_MINUTES, reaching each stop at its scheduled offset; after each
+    round the walking transfers are relaxed from the stops it improved
+    """
+    
+    def __init__(self, graph, service_start=SERVICE_START_MINUTES, service_end=SERVICE_END_MINUTES):
+        self.graph = graph
+        self.version = graph.version
+        self.service_start = service_start
+        self.service_end = service_end
+        
+        route_count = len(graph.route_ids)
+        self.patterns = [graph.route_pattern(route).tolist() for route in range(route_count)]
+        self.headways = graph.route_headway.tolist()
+        self.schedules = [graph.route_schedule(route).tolist() for route in range(route_count)]
+        self.first_departures = np.where(
+            np.isnan(graph.route_first_departure), service_start, graph.route_first_departure
+        ).tolist()
+        
+        # Routes serving each stop: (route, position) pairs grouped by node id
+        lengths = np.diff(graph.pattern_offsets)
+        pattern_routes = np.repeat(np.arange(route_count, dtype=np.int32), lengths)
+        positions = np.arange(len(graph.pattern_nodes), dtype=np.int32) - np.repeat(graph.pattern_offsets[:-1], lengths)
+        order = np.argsort(graph.pattern_nodes, kind='stable')
+        counts = np.bincount(graph.pattern_nodes, minlength=graph.node_count)
+        self.stop_offsets = np.concatenate(([0], np.cumsum(counts))).tolist()
+        self.stop_routes = pattern_routes[order].tolist()
+        self.stop_positions = positions[order].tolist()
+        
+        # Walking transfers: already grouped by source node in the graph CSR
+        walks = graph.walking_edges()
+        walk_offsets = np.zeros(graph.node_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(graph.sources[walks], minlength=graph.node_count), out=walk_offsets[1:])
+        self.walk_offsets = walk_offsets.tolist()
+        self.walks = list(zip(
+            graph.targets[walks].tolist(), (graph.distance[walks] / WALKING_SPEED_KMPH * 60).tolist()
+        ))
+    
+    def _relax_walks(self, stops, arrivals, parent, best, target_id):
+        """
+        Footpath step: arrival[v] = min(arrival[v], arrival[u] + walk) for every
+        walking transfer u -> v out of stops, recording (None, u, leave, arrive) as v's parent
+        Returns: the stops improved on foot
+        """
+        walked = set()
+        for stop in stops:
+            for k in range(self.walk_offsets[stop], self.walk_offsets[stop + 1]):
+                neighbor, minutes = self.walks[k]
+                arrival = arrivals[stop] + minutes
+                if arrival < min(best[neighbor], best[target_id]):
+                    arrivals[neighbor] = arrival
+                    best[neighbor] = arrival
+                    parent[neighbor] = (None, stop, arrivals[stop], arrival)
+                    walked.add(neighbor)
+        return walked
+    
+    def _next_trip(self, route, position, ready):
+        """Origin departure time of the first trip reaching position at or after ready, or None"""
+        offset = self.schedules[route][position]
+        headway = self.headways[route]
+        first = self.first_departures[route]
+        trips = max(0, math.ceil((ready - first - offset) / headway - 1e-9))
+        departure = first + trips * headway
+        return departure if departure <= self.service_end else None
+    
+    def plan(self, source, destination, departure=None, max_transfers=DEFAULT_MAX_TRANSFERS):
+        """
+        Journeys from source to destination that are Pareto-optimal in arrival
+        time and number of transfers, fewest transfers first
+        departure: 'HH:MM', datetime/time, minutes after midnight, or None for now
+        Returns: list of journey dicts (empty if unreachable)
+        """
+        graph = self.graph
+        source_id = graph.node_ids.get(source)
+        target_id = graph.node_ids.get(destination)
+        if source_id is None or target_id is None or source_id == target_id:
+            return []
+        
+        start_time = parse_clock(departure)
+        inf = float('inf')
+        best = [inf] * graph.node_count
+        best[source_id] = start_time
+        # Earliest arrival using fewer trips than the current round, and the round that set it
+        reached = {source_id: (start_time, 0)}
+        labels = [{source_id: start_time}]
+        parents = [{}]
+        # Stops within walking distance of the source can board in round 1
+        marked = {source_id} | self._relax_walks([source_id], labels[0], parents[0], best, target_id)
+        for stop in marked:
+            reached[stop] = (labels[0][stop], 0)
+        
+        for round_number in range(1, max_transfers + 2):
+            current = {}
+            parent = {}
+            
+            # Earliest marked position on every route touching a marked stop
+            queue = {}
+            for stop in marked:
+                for k in range(self.stop_offsets[stop], self.stop_offsets[stop + 1]):
+                    route, position = self.stop_routes[k], self.stop_positions[k]
+                    if position < queue.get(route, inf):
+                        queue[route] = position
+            
+            marked = set()
+            for route, first_position in queue.items():
+                pattern = self.patterns[route]
+                schedule = self.schedules[route]
+                trip = None
+                board_stop = board_position = board_round = None
+                
+                for position in range(first_position, len(pattern)):
+                    stop = pattern[position]
+                    
+                    if trip is not None:
+                        arrival = trip + schedule[position]
+                        if arrival < min(best[stop], best[target_id]):
+                            current[stop] = arrival
+                            best[stop] = arrival
+                            parent[stop] = (route, board_stop, board_position, board_round, position, trip)
+                            marked.add(stop)
+                    
+                    # Catch an earlier trip if this stop was reached with fewer vehicles
+                    ready, ready_round = reached.get(stop, (None, None))
+                    if ready is not None and (trip is None or ready <= trip + schedule[position]):
+                        earlier = self._next_trip(route, position, ready)
+                        if earlier is not None and (trip is None or earlier < trip):
+                            trip = earlier
+                            board_stop, board_position, board_round = stop, position, ready_round
+            
+            marked |= self._relax_walks(list(marked), current, parent, best, target_id)
+            for stop, arrival in current.items():
+                reached[stop] = (arrival, round_number)
+            labels.append(current)
+            parents.append(parent)
+            if not marked:
+                break
+        
+        journeys = []
+        best_arrival = inf
+        for round_number in range(len(labels)):
+            arrival = labels[round_number].get(target_id)
+            if arrival is not None and arrival < best_arrival:
+                best_arrival = arrival
+                journeys.append(self._journey(parents, round_number, target_id, start_time, arrival))
+        return journeys
+    
+    def _journey(self, parents, round_number, target_id, start_time, arrival):
+        """Reconstruct the legs of the journey that reached target_id in round_number"""
+        graph = self.graph
+        legs = []
+        stop = target_id
+        k = round_number
+        while stop in parents[k]:
+            entry = parents[k][stop]
+            if entry[0] is None:
+                # Walked here from another stop reached in the same round
+                _, previous, leave, arrive = entry
+                legs.append({
+                    'mode': 'walk',
+                    'route_id': None,
+                    'route_number': 'Walk',
+                    'board': graph.node_names[previous],
+                    'alight': graph.node_names[stop],
+                    'departure': format_clock(leave),
+                    'arrival': format_clock(arrive),
+                    'stops': 0
+                })
+                stop = previous
+                continue
+            route, board_stop, board_position, board_round, alight_position, trip = entry
+            schedule = self.schedules[route]
+            legs.append({
+                'mode': 'bus',
+                'route_id': int(graph.route_ids[route]),
+                'route_number': graph.route_numbers[route],
+                'board': graph.node_names[board_stop],
+                'alight': graph.node_names[stop],
+                'departure': format_clock(trip + schedule[board_position]),
+                'arrival': format_clock(trip + schedule[alight_position]),
+                'stops': alight_position - board_position
+            })
+            stop, k = board_stop, board_round
+        legs.reverse()
+        
+        rides = sum(1 for leg in legs if leg['mode'] == 'bus')
+        return {
+            'departure': format_clock(start_time),
+            'arrival': format_clock(arrival),
+            'duration_minutes': round(arrival - start_time, 1),
+            'transfers': max(rides - 1, 0),
+            'legs': legs
+        }
+
+_planner = None
+_planner_lock = threading.Lock()
+
+def get_raptor_planner():
+    """Planner for the current transit graph, rebuilt when the graph version changes"""
+    global _planner
+    graph = get_transit_graph()
+    with _planner_lock:
+        if _planner is None or _planner.graph is not graph or _planner.version != graph.version:
+            _planner = RaptorPlanner(graph)
+        return _planner
@@ -0,0 +1,205 @@
+"""
+Timetable Module
+Departure-time-aware earliest-arrival routing over the frequency timetable
+"""
+
+import heapq
+import threading
+from bisect import bisect_left
+import numpy as np
+from .transit_graph import get_transit_graph, WALKING_SPEED_KMPH
+from .raptor import SERVICE_START_MINUTES, SERVICE_END_MINUTES, parse_clock, format_clock
+
+# Slack when comparing clock times computed from different sums of offsets
+TIME_EPSILON = 1e-6
+
+class Timetable:
+    """
+    Frequency timetable of a TransitGraph compiled into sorted arrays
+    Trips of route r leave its first stop at trip_departures[trip_offsets[r]:trip_offsets[r + 1]]
+    (ascending, every route_headway minutes from route_first_departure until the
+    end of service) and reach each stop at the route_schedule() offsets. Hops
+    between consecutive pattern stops are packed by boarding node like the
+    graph CSR, so a query is one time-dependent Dijkstra with no DB access.
+    The graph's walking transfers can be taken at any time
+    """
+    
+    def __init__(self, graph, service_start=SERVICE_START_MINUTES, service_end=SERVICE_END_MINUTES):
+        self.graph = graph
+        self.version = graph.version
+        
+        # Sorted departures of every trip from each route's first stop
+        first = np.where(np.isnan(graph.route_first_departure), service_start, graph.route_first_departure)
+        headway = graph.route_headway
+        trip_counts = np.maximum(np.floor((service_end - first) / headway + TIME_EPSILON) + 1, 0).astype(np.int64)
+        trip_counts[np.diff(graph.pattern_offsets) < 2] = 0
+        self.trip_offsets = np.zeros(len(trip_counts) + 1, dtype=np.int64)
+        np.cumsum(trip_counts, out=self.trip_offsets[1:])
+        trip_routes = np.repeat(np.arange(len(trip_counts)), trip_counts)
+        trip_numbers = np.arange(len(trip_routes)) - self.trip_offsets[trip_routes]
+        self.trip_departures = first[trip_routes] + trip_numbers * headway[trip_routes]
+        
+        # Hops between consecutive stops of each pattern (pattern slots followed by one of the same route)
+        slot_routes = np.repeat(np.arange(len(trip_counts)), np.diff(graph.pattern_offsets))
+        hops = np.flatnonzero(slot_routes[:-1] == slot_routes[1:])
+        hop_routes = slot_routes[hops]
+        hop_sources = graph.pattern_nodes[hops]
+        order = np.argsort(hop_sources, kind='stable')
+        self.hop_offsets = np.zeros(graph.node_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(hop_sources, minlength=graph.node_count), out=self.hop_offsets[1:])
+        self.hop_targets = graph.pattern_nodes[hops + 1][order]
+        self.hop_routes = hop_routes[order].astype(np.int32)
+        self.hop_positions = (hops - graph.pattern_offsets[hop_routes])[order].astype(np.int32)
+        self.hop_board = graph.pattern_minutes[hops][order]     # schedule offset at the boarding stop
+        self.hop_ride = (graph.pattern_minutes[hops + 1] - graph.pattern_minutes[hops])[order]
+        
+        # Python views for the query loop
+        self._departures = [
+            self.trip_departures[start:end].tolist()
+            for start, end in zip(self.trip_offsets[:-1].tolist(), self.trip_offsets[1:].tolist())
+        ]
+        self._offsets = self.hop_offsets.tolist()
+        self._hops = list(zip(
+            self.hop_targets.tolist(), self.hop_routes.tolist(), self.hop_positions.tolist(),
+            self.hop_board.tolist(), self.hop_ride.tolist()
+        ))
+        
+        # Walking transfers: already grouped by source node in the graph CSR
+        walks = graph.walking_edges()
+        self.walk_offsets = np.zeros(graph.node_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(graph.sources[walks], minlength=graph.node_count), out=self.walk_offsets[1:])
+        self._walk_offsets = self.walk_offsets.tolist()
+        self._walks = list(zip(
+            graph.targets[walks].tolist(), (graph.distance[walks] / WALKING_SPEED_KMPH * 60).tolist()
+        ))
+    
+    def earliest_arrival(self, source, destination, departure=None):
+        """
+        Earliest arrival at destination leaving source at departure, waiting at
+        each stop for the next scheduled trip
+        departure: 'HH:MM', datetime/time, minutes after midnight, or None for now
+        Returns: journey dict, or None if no trip gets there before service ends
+        """
+        graph = self.graph
+        source_id = graph.node_ids.get(source)
+        target_id = graph.node_ids.get(destination)
+        if source_id is None or target_id is None or source_id == target_id:
+            return None
+        
+        start_time = parse_clock(departure)
+        arrival = {source_id: start_time}
+        parent = {}      # {node: (previous node, route, trip departure, boarding position)}, route None on foot
+        settled = set()
+        heap = [(start_time, source_id)]
+        offsets, hops, departures = self._offsets, self._hops, self._departures
+        walk_offsets, walks = self._walk_offsets, self._walks
+        
+        while heap:
+            time, node = heapq.heappop(heap)
+            if node in settled:
+                continue
+            settled.add(node)
+            if node == target_id:
+                return self._journey(parent, arrival, source_id, target_id, start_time)
+            
+            current_trip = parent.get(node, (None, None, None))[1:3]
+            for k in range(offsets[node], offsets[node + 1]):
+                neighbor, route, position, board, ride = hops[k]
+                if neighbor in settled:
+                    continue
+                trips = departures[route]
+                trip = bisect_left(trips, time - board - TIME_EPSILON)
+                if trip == len(trips):
+                    continue
+                trip_departure = trips[trip]
+                reached = trip_departure + board + ride
+                best = arrival.get(neighbor)
+                # On ties prefer staying aboard the trip that brought us here
+                if best is None or reached < best - TIME_EPSILON or (
+                    reached <= best + TIME_EPSILON and (route, trip_departure) == current_trip
+                ):
+                    arrival[neighbor] = reached
+                    parent[neighbor] = (node, route, trip_departure, position)
+                    heapq.heappush(heap, (reached, neighbor))
+            
+            for k in range(walk_offsets[node], walk_offsets[node + 1]):
+                neighbor, minutes = walks[k]
+                reached = time + minutes
+                if neighbor not in settled and reached < arrival.get(neighbor, float('inf')) - TIME_EPSILON:
+                    arrival[neighbor] = reached
+                    parent[neighbor] = (node, None, None, None)
+                    heapq.heappush(heap, (reached, neighbor))
+        return None
+    
+    def _journey(self, parent, arrival, source_id, target_id, start_time):
+        """Merge the hop chain into one leg per trip ridden or walk taken"""
+        graph = self.graph
+        hops = []
+        node = target_id
+        while node != source_id:
+            previous, route, trip_departure, position = parent[node]
+            hops.append((previous, node, route, trip_departure, position))
+            node = previous
+        hops.reverse()
+        
+        legs = []   # [board stop, alight stop, route, trip departure, board position, alight position]
+        for previous, node, route, trip_departure, position in hops:
+            if route is None:
+                legs.append([previous, node, None, None, None, None])
+            elif legs and legs[-1][2] == route and legs[-1][3] == trip_departure and legs[-1][5] == position:
+                legs[-1][1] = node
+                legs[-1][5] = position + 1
+            else:
+                legs.append([previous, node, route, trip_departure, position, position + 1])
+        
+        moving = 0.0
+        journey_legs = []
+        for board_stop, alight_stop, route, trip_departure, board_position, alight_position in legs:
+            if route is None:
+                moving += arrival[alight_stop] - arrival[board_stop]
+                journey_legs.append({
+                    'mode': 'walk',
+                    'route_id': None,
+                    'route_number': 'Walk',
+                    'board': graph.node_names[board_stop],
+                    'alight': graph.node_names[alight_stop],
+                    'departure': format_clock(arrival[board_stop]),
+                    'arrival': format_clock(arrival[alight_stop]),
+                    'stops': 0
+                })
+                continue
+            schedule = graph.route_schedule(route).tolist()
+            moving += schedule[alight_position] - schedule[board_position]
+            journey_legs.append({
+                'mode': 'bus',
+                'route_id': int(graph.route_ids[route]),
+                'route_number': graph.route_numbers[route],
+                'board': graph.node_names[board_stop],
+                'alight': graph.node_names[alight_stop],
+                'departure': format_clock(trip_departure + schedule[board_position]),
+                'arrival': format_clock(trip_departure + schedule[alight_position]),
+                'stops': alight_position - board_position
+            })
+        
+        end_time = arrival[target_id]
+        rides = sum(1 for leg in journey_legs if leg['mode'] == 'bus')
+        return {
+            'departure': format_clock(start_time),
+            'arrival': format_clock(end_time),
+            'duration_minutes': round(end_time - start_time, 1),
+            'waiting_minutes': round(end_time - start_time - moving, 1),
+            'transfers': max(rides - 1, 0),
+            'legs': journey_legs
+        }
+
+_timetable = None
+_timetable_lock = threading.Lock()
+
+def get_timetable():
+    """Timetable for the current transit graph, recompiled when the graph version changes"""
+    global _timetable
+    graph = get_transit_graph()
+    with _timetable_lock:
+        if _timetable is None or _timetable.graph is not graph or _timetable.version != graph.version:
+            _timetable = Timetable(graph)
+        return _timetable
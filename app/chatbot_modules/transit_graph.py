@@ -0,0 +1,1051 @@
+"""
+Transit Graph Module
+Process-wide, versioned in-memory graph of the active route network
+"""
+
+import copy
+import csv
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+from datetime import date
+from decimal import Decimal
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra as sparse_dijkstra
+from scipy.spatial import cKDTree
+from flask import current_app
+from sqlalchemy import event, func, inspect, literal
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.orm import Session
+from app import db
+from app.models.database_models import Route, Stop
+
+# Weight used for routes without a recorded distance (matches the legacy graph)
+MISSING_DISTANCE_KM = 999999.0
+
+# Seconds between checks of the route/stop tables for changes
+DEFAULT_CHECK_SECONDS = 30
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Used for travel times when a route has no estimated_duration_minutes
+AVERAGE_BUS_SPEED_KMPH = 18.0
+
+# Headway assumed for routes without a frequency in the routes CSV
+DEFAULT_HEADWAY_MINUTES = 30.0
+
+# Walking transfers link located stops closer than the radius (WALKING_TRANSFER_RADIUS_KM)
+DEFAULT_WALK_RADIUS_KM = 0.4
+# Streets are longer than the straight line between two stops
+WALKING_DETOUR_FACTOR = 1.3
+WALKING_SPEED_KMPH = 4.5
+# edge_route of walking-transfer edges, which belong to no route
+WALK_ROUTE = -1
+
+# Separators of the text digest in route_data_signature
+TEXT_FIELD_SEPARATOR = '\x1f'
+TEXT_ROW_SEPARATOR = '\x1e'
+
+# Sources per Dijkstra block when calibrating the A* heuristic around unlocated stops
+DETOUR_SOURCES_PER_BLOCK = 64
+
+# Bumped whenever the snapshot layout changes; older files are rejected
+SNAPSHOT_FORMAT_VERSION = 3
+SNAPSHOT_MAGIC = b'YSGRAPH\0'
+SNAPSHOT_ALIGNMENT = 64
+
+ROUTES_CSV_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    'data', 'processed', 'routes_final.csv'
+)
+
+# Plain records the graph is built from (DB rows expose the same attributes)
+RouteRecord = namedtuple('RouteRecord', [
+    'id', 'route_number', 'start_location', 'end_location',
+    'distance_km', 'fare', 'estimated_duration_minutes'
+])
+StopRecord = namedtuple('StopRecord', [
+    'route_id', 'stop_name', 'stop_order', 'latitude', 'longitude',
+    'estimated_arrival_time'
+])
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km (works element-wise on NumPy arrays)"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+def parse_stop_time(value):
+    """Minutes after midnight from a stop time such as '08:35' or '8:35 PM', or None if unparsable"""
+    match = re.match(r'^\s*(\d{1,2})[:.](\d{2})\s*([ap]\.?m\.?)?\s*$', str(value or ''), re.IGNORECASE)
+    if not match:
+        return None
+    hours, minutes = int(match.group(1)), int(match.group(2))
+    if match.group(3):
+        hours = hours % 12 + (12 if match.group(3).lower().startswith('p') else 0)
+    if hours > 23 or minutes > 59:
+        return None
+    return float(hours * 60 + minutes)
+
+def _splice_ragged(offsets, arrays, row, values):
+    """
+    Replace row `row` of ragged arrays sharing offsets (row == number of rows
+    appends one) with values, one sequence per array
+    Returns: (new offsets, [new arrays])
+    """
+    start = offsets[row]
+    end = offsets[row + 1] if row + 1 < len(offsets) else start
+    lengths = np.diff(offsets)
+    if row == len(lengths):
+        lengths = np.append(lengths, 0)
+    lengths[row] = len(values[0])
+    
+    new_offsets = np.zeros(len(lengths) + 1, dtype=offsets.dtype)
+    np.cumsum(lengths, out=new_offsets[1:])
+    new_arrays = [
+        np.concatenate([array[:start], np.asarray(value, dtype=array.dtype), array[end:]])
+        for array, value in zip(arrays, values)
+    ]
+    return new_offsets, new_arrays
+
+def _take_ragged(offsets, rows):
+    """
+    Select rows of ragged arrays sharing offsets, in the given order
+    Returns: (new offsets, index into the value arrays)
+    """
+    lengths = np.diff(offsets)[rows]
+    new_offsets = np.zeros(len(rows) + 1, dtype=offsets.dtype)
+    np.cumsum(lengths, out=new_offsets[1:])
+    index = np.arange(new_offsets[-1]) - np.repeat(new_offsets[:-1] - offsets[rows], lengths)
+    return new_offsets, index
+
+class TransitGraph:
+    """
+    Directed graph of locations connected by route segments
+    Stop names are interned to integer node ids and the adjacency is stored
+    as CSR arrays: the out-edges of node n are offsets[n]:offsets[n + 1] in
+    sources / targets / distance / fare / edge_route. The reverse CSR lists
+    the in-edges of node n as forward edge ids rev_edges[rev_offsets[n]:rev_offsets[n + 1]]
+    Each node's out-edges are pre-sorted by boarding fare (the route's fare,
+    0 for walks) and then route, so the edges of one route are contiguous
+    Walking transfers between nearby stops are ordinary edges with zero fare
+    and edge_route WALK_ROUTE, so every engine can use them
+    """
+    
+    def __init__(self, routes, stops, version=0, signature=None, headways=None,
+                 walk_radius_km=DEFAULT_WALK_RADIUS_KM):
+        """
+        Build the graph from route and stop records
+        routes: records with the RouteRecord attributes (active routes only)
+        stops: records with the StopRecord attributes
+        headways: optional {route_number: minutes between departures}
+        walk_radius_km: longest walking transfer between located stops (0 disables them)
+        """
+        self.version = version
+        self.signature = signature
+        self.walk_radius_km = walk_radius_km
+        self._fingerprint = None
+        self.node_ids = {}     # {location: node id}
+        self.node_names = []   # [location, ...] indexed by node id
+        
+        stops_by_route = {}
+        for stop in stops:
+            stops_by_route.setdefault(stop.route_id, []).append(stop)
+        
+        routes = list(routes)
+        self.route_index = {route.id: idx for idx, route in enumerate(routes)}
+        self.route_ids = np.array([route.id for route in routes], dtype=np.int64)
+        self.route_numbers = [route.route_number for route in routes]
+        self.route_distance = np.array(
+            [float(r.distance_km) if r.distance_km else MISSING_DISTANCE_KM for r in routes], dtype=np.float64
+        )
+        self.route_fare = np.array([float(r.fare) for r in routes], dtype=np.float64)
+        self.route_duration = np.array(
+            [float(r.estimated_duration_minutes) if r.estimated_duration_minutes else np.nan for r in routes],
+            dtype=np.float64
+        )
+        self.route_travel_minutes = np.where(
+            np.isnan(self.route_duration), self.route_distance / AVERAGE_BUS_SPEED_KMPH * 60, self.route_duration
+        )
+        self.headways = headways or {}
+        self.route_headway = np.array(
+            [self.headways.get(r.route_number, DEFAULT_HEADWAY_MINUTES) for r in routes], dtype=np.float64
+        )
+        
+        sources, targets, distances, fares, edge_routes = [], [], [], [], []
+        patterns, timings, coordinates = [], [], []
+        for idx, route in enumerate(routes):
+            route_stops = sorted(stops_by_route.get(route.id, []), key=lambda s: s.stop_order)
+            sequence = self._intern_sequence(self.route_sequence(route, [s.stop_name for s in route_stops]))
+            patterns.append(sequence)
+            timings.append(self._route_timing(idx, route, route_stops, len(sequence)))
+            coordinates.append(self._stop_coordinates(route_stops) if sequence else ([], [], []))
+            
+            for current, neighbor, hop_distance, hop_fare in self._route_hops(idx, sequence):
+                sources.append(current)
+                targets.append(neighbor)
+                distances.append(hop_distance)
+                fares.append(hop_fare)
+                edge_routes.append(idx)
+        
+        self._build_patterns(patterns)
+        self.pattern_minutes = np.array([m for minutes, _ in timings for m in minutes], dtype=np.float64)
+        self.route_first_departure = np.array([first for _, first in timings], dtype=np.float64)
+        self._build_coordinates(coordinates)
+        
+        walk_sources, walk_targets, walk_distances = self._walking_edges()
+        self._build_csr(
+            np.concatenate([np.asarray(sources, dtype=np.int32), walk_sources]),
+            np.concatenate([np.asarray(targets, dtype=np.int32), walk_targets]),
+            np.concatenate([np.asarray(distances, dtype=np.float64), walk_distances]),
+            np.concatenate([np.asarray(fares, dtype=np.float64), np.zeros(len(walk_sources))]),
+            np.concatenate([np.asarray(edge_routes, dtype=np.int32),
+                            np.full(len(walk_sources), WALK_ROUTE, dtype=np.int32)])
+        )
+        self._heuristic_scale = None    # calibrated on first A* use
+        
+        # Incremental route updates applied since this graph was built from the database
+        self.base_version = version
+        self.history = []   # [(version, route_id, costlier_only), ...]
+    
+    def _route_hops(self, idx, sequence):
+        """Edges of the route at index idx over its node sequence as (source, target, distance, fare)"""
+        if len(sequence) < 2:
+            return []
+        distance = self.route_distance[idx]
+        fare = self.route_fare[idx]
+        
+        # Direct edge so a single-route trip reports the route's own figures
+        hops = [(sequence[0], sequence[-1], distance, fare)]
+        if len(sequence) > 2:
+            segments = len(sequence) - 1
+            hops.extend(
+                (current, neighbor, distance / segments, fare / segments)
+                for current, neighbor in zip(sequence, sequence[1:])
+            )
+        return hops
+    
+    def _route_timing(self, idx, route, route_stops, length):
+        """
+        Scheduled minutes from the route's first stop to each of its length
+        pattern stops, and the clock time its first trip leaves (NaN if unknown)
+        Stop estimated_arrival_time values anchor the schedule and are
+        interpolated between; elsewhere hops take an even share of the trip
+        """
+        if length < 2:
+            return [], np.nan
+        hop = self.route_travel_minutes[idx] / (length - 1)
+        
+        # Same collapsing of repeats as route_sequence(), carrying each stop's time along
+        names, clocks = [], []
+        for name, clock in zip(
+            [route.start_location] + [s.stop_name for s in route_stops] + [route.end_location],
+            [None] + [parse_stop_time(s.estimated_arrival_time) for s in route_stops] + [None]
+        ):
+            if not name:
+                continue
+            if not names or names[-1] != name:
+                names.append(name)
+                clocks.append(clock)
+            elif clocks[-1] is None:
+                clocks[-1] = clock
+        
+        known = [(position, clock) for position, clock in enumerate(clocks) if clock is not None]
+        positions = np.arange(length, dtype=np.float64)
+        if not known:
+            return (positions * hop).tolist(), np.nan
+        
+        anchors = np.array([position for position, _ in known], dtype=np.float64)
+        times = np.array([clock for _, clock in known], dtype=np.float64)
+        times += 24 * 60 * np.concatenate(([0], np.cumsum(np.diff(times) < -12 * 60)))   # past midnight
+        if (np.diff(times) < 0).any():
+            return (positions * hop).tolist(), np.nan    # inconsistent times: keep the even split
+        
+        clock = np.interp(positions, anchors, times)
+        clock = np.where(positions < anchors[0], times[0] - (anchors[0] - positions) * hop, clock)
+        clock = np.where(positions > anchors[-1], times[-1] + (positions - anchors[-1]) * hop, clock)
+        return (clock - clock[0]).tolist(), float(clock[0])
+    
+    def _intern(self, name):
+        node = self.node_ids.get(name)
+        if node is None:
+            node = len(self.node_names)
+            self.node_ids[name] = node
+            self.node_names.append(name)
+        return node
+    
+    def _intern_sequence(self, names):
+        """Node ids of a route's locations; routes serving fewer than two add no nodes"""
+        return [self._intern(name) for name in names] if len(names) >= 2 else []
+    
+    def _build_csr(self, sources, targets, distances, fares, edge_routes):
+        """Sort the edge list by source node, boarding fare and route and pack it into CSR arrays"""
+        sources = np.asarray(sources, dtype=np.int32)
+        edge_routes = np.asarray(edge_routes, dtype=np.int32)
+        boarding = np.where(edge_routes == WALK_ROUTE, 0.0, self.route_fare[edge_routes])
+        order = np.lexsort((edge_routes, boarding, sources))
+        
+        counts = np.bincount(sources, minlength=self.node_count)
+        self.offsets = np.zeros(self.node_count + 1, dtype=np.int32)
+        np.cumsum(counts, out=self.offsets[1:])
+        
+        self.sources = sources[order]
+        self.targets = np.asarray(targets, dtype=np.int32)[order]
+        self.distance = np.asarray(distances, dtype=np.float64)[order]
+        self.fare = np.asarray(fares, dtype=np.float64)[order]
+        self.edge_route = edge_routes[order]
+        
+        self.rev_edges = np.argsort(self.targets, kind='stable').astype(np.int32)
+        self.rev_offsets = np.zeros(self.node_count + 1, dtype=np.int32)
+        np.cumsum(np.bincount(self.targets, minlength=self.node_count), out=self.rev_offsets[1:])
+    
+    def _build_patterns(self, patterns):
+        """
+        Ordered stop sequence of every route: the nodes of route r are
+        pattern_nodes[pattern_offsets[r]:pattern_offsets[r + 1]]
+        """
+        self.pattern_offsets = np.zeros(len(patterns) + 1, dtype=np.int32)
+        np.cumsum([len(p) for p in patterns], out=self.pattern_offsets[1:])
+        self.pattern_nodes = np.fromiter(
+            (node for pattern in patterns for node in pattern), dtype=np.int32, count=int(self.pattern_offsets[-1])
+        )
+    
+    def route_pattern(self, route):
+        """Node ids served by the route at index route, in travel order"""
+        return self.pattern_nodes[self.pattern_offsets[route]:self.pattern_offsets[route + 1]]
+    
+    def route_schedule(self, route):
+        """Scheduled minutes from the first stop to each stop of route_pattern(route)"""
+        return self.pattern_minutes[self.pattern_offsets[route]:self.pattern_offsets[route + 1]]
+    
+    def _stop_coordinates(self, route_stops):
+        """(node ids, latitudes, longitudes) of a route's stops that have coordinates"""
+        located = [
+            s for s in route_stops
+            if s.latitude is not None and s.longitude is not None and s.stop_name in self.node_ids
+        ]
+        return (
+            [self.node_ids[s.stop_name] for s in located],
+            [float(s.latitude) for s in located],
+            [float(s.longitude) for s in located]
+        )
+    
+    def _build_coordinates(self, coordinates):
+        """
+        Pack per-route stop coordinates like the patterns: route r's located
+        stops are coord_nodes / coord_lat / coord_lon[coord_offsets[r]:coord_offsets[r + 1]]
+        """
+        self.coord_offsets = np.zeros(len(coordinates) + 1, dtype=np.int32)
+        np.cumsum([len(nodes) for nodes, _, _ in coordinates], out=self.coord_offsets[1:])
+        self.coord_nodes = np.array([node for nodes, _, _ in coordinates for node in nodes], dtype=np.int32)
+        self.coord_lat = np.array([lat for _, lats, _ in coordinates for lat in lats], dtype=np.float64)
+        self.coord_lon = np.array([lon for _, _, lons in coordinates for lon in lons], dtype=np.float64)
+        self._refresh_coordinates()
+    
+    def _refresh_coordinates(self):
+        """Average stop coordinates per node (NaN where unknown)"""
+        counts = np.bincount(self.coord_nodes, minlength=self.node_count).astype(np.float64)
+        lat_sum = np.bincount(self.coord_nodes, weights=self.coord_lat, minlength=self.node_count)
+        lon_sum = np.bincount(self.coord_nodes, weights=self.coord_lon, minlength=self.node_count)
+        
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.node_lat = np.where(counts > 0, lat_sum / counts, np.nan)
+            self.node_lon = np.where(counts > 0, lon_sum / counts, np.nan)
+    
+    def _walking_edges(self):
+        """
+        Walking transfers between every pair of located nodes within
+        walk_radius_km, found in one pass over a KD-tree of their positions on
+        the unit sphere (where the chord length orders pairs like great-circle distance)
+        Returns: (sources, targets, walking km) arrays holding both directions of each pair
+        """
+        located = np.flatnonzero(~np.isnan(self.node_lat))
+        if not self.walk_radius_km or len(located) < 2:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float64)
+        
+        lat, lon = np.radians(self.node_lat[located]), np.radians(self.node_lon[located])
+        points = np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+        chord = 2 * np.sin(self.walk_radius_km / (2 * EARTH_RADIUS_KM))
+        pairs = cKDTree(points).query_pairs(chord, output_type='ndarray')
+        
+        first, second = located[pairs[:, 0]].astype(np.int32), located[pairs[:, 1]].astype(np.int32)
+        km = haversine_km(
+            self.node_lat[first], self.node_lon[first], self.node_lat[second], self.node_lon[second]
+        ) * WALKING_DETOUR_FACTOR
+        return np.concatenate([first, second]), np.concatenate([second, first]), np.concatenate([km, km])
+    
+    def walking_edges(self):
+        """Edge ids of the walking transfers"""
+        return np.flatnonzero(self.edge_route == WALK_ROUTE)
+    
+    @property
+    def heuristic_scale(self):
+        """
+        A* heuristic scale, calibrated the first time it is needed and kept for
+        this graph (each version is its own graph), so builds and patches on
+        the request path never pay for it; racing first callers just compute
+        the same value twice
+        """
+        if self._heuristic_scale is None:
+            self._heuristic_scale = self._calibrate_heuristic()
+        return self._heuristic_scale
+    
+    def _calibrate_heuristic(self):
+        """
+        Scale for the A* heuristic so that scale * great-circle distance never
+        exceeds the distance between two located nodes, along an edge or along
+        a detour through unlocated nodes (whose estimate is zero). Every path
+        to a located target splits into such hops, so the bound stays admissible
+        """
+        scale = 1.0
+        located = ~np.isnan(self.node_lat)
+        direct = located[self.sources] & located[self.targets]
+        detour_sources, detour_targets, detour_km = self._detour_distances(located)
+        sources = np.concatenate([self.sources[direct], detour_sources])
+        targets = np.concatenate([self.targets[direct], detour_targets])
+        km = np.concatenate([self.distance[direct], detour_km])
+        if len(km):
+            straight = haversine_km(
+                self.node_lat[sources], self.node_lon[sources], self.node_lat[targets], self.node_lon[targets]
+            )
+            positive = straight > 0
+            if positive.any():
+                ratio = (km[positive] / straight[positive]).min()
+                scale = float(min(1.0, ratio))
+        return scale
+    
+    def _detour_distances(self, located, chunk=DETOUR_SOURCES_PER_BLOCK):
+        """
+        Shortest distances between located nodes along paths whose inner nodes
+        are all unlocated: one Dijkstra per located node with an edge to an
+        unlocated one, on a copy of the graph where every located node is split
+        into a source (its out-edges) and a sink (its in-edges)
+        Returns: (sources, targets, km) arrays, one entry per located pair joined that way
+        """
+        leaving = located[self.sources] & ~located[self.targets]
+        starts = np.unique(self.sources[leaving])
+        if not len(starts):
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float64)
+        
+        size = self.node_count
+        inner = leaving | ~located[self.sources]
+        rows = self.sources[inner]
+        cols = np.where(located[self.targets[inner]], self.targets[inner] + size, self.targets[inner])
+        weights = self.distance[inner]
+        # Parallel edges keep their shortest distance (a sparse matrix would sum them)
+        order = np.lexsort((weights, cols, rows))
+        rows, cols, weights = rows[order], cols[order], weights[order]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])
+        matrix = csr_matrix((weights[first], (rows[first], cols[first])), shape=(2 * size, 2 * size))
+        
+        sinks = np.flatnonzero(located)
+        found_sources, found_targets, found_km = [], [], []
+        for block in range(0, len(starts), chunk):
+            block_starts = starts[block:block + chunk]
+            km = sparse_dijkstra(matrix, indices=block_starts)[:, sinks + size]
+            row, col = np.nonzero(np.isfinite(km))
+            found_sources.append(block_starts[row])
+            found_targets.append(sinks[col])
+            found_km.append(km[row, col])
+        return np.concatenate(found_sources), np.concatenate(found_targets), np.concatenate(found_km)
+    
+    # Per-route arrays indexed like route_ids
+    ROUTE_ARRAYS = (
+        'route_distance', 'route_fare', 'route_duration', 'route_travel_minutes', 'route_headway',
+        'route_first_departure'
+    )
+    
+    def with_route(self, route_id, route=None, stops=(), version=None):
+        """
+        Copy of the graph with one route replaced: route None removes it,
+        otherwise the route is added or re-weighted from its record and stops.
+        Only that route's records are needed, but the arrays (walking transfers
+        and CSR included) are rebuilt in the layout a fresh build of the same
+        records has, so the copy's fingerprint matches that build and the
+        precomputed routing artifacts keep applying. Arrays are never modified
+        in place, so readers still holding this graph are unaffected
+        The copy keeps this graph's signature: it only accounts for this one
+        route, and the periodic table check must still see any other change
+        costlier_only is recorded in the history when the change can only make
+        paths more expensive (removal, or the same stops at a higher distance
+        and fare), so cached paths that avoid the route stay valid
+        """
+        graph = copy.copy(self)
+        graph.version = self.version + 1 if version is None else version
+        graph._fingerprint = None
+        graph.node_ids = dict(self.node_ids)
+        graph.node_names = list(self.node_names)
+        
+        idx = self.route_index.get(route_id)
+        old_sequence = self.route_pattern(idx).tolist() if idx is not None else []
+        if idx is None:
+            if route is None:
+                graph.history = self.history + [(graph.version, route_id, True)]
+                return graph
+            # New route: append a slot to every per-route array
+            idx = len(self.route_numbers)
+            graph.route_ids = np.append(self.route_ids, route_id)
+            graph.route_numbers = self.route_numbers + [route.route_number]
+            for name in self.ROUTE_ARRAYS:
+                setattr(graph, name, np.append(getattr(self, name), np.nan))
+        else:
+            graph.route_numbers = list(self.route_numbers)
+            for name in self.ROUTE_ARRAYS:
+                setattr(graph, name, getattr(self, name).copy())
+        
+        sequence, schedule, coordinates = [], [], ([], [], [])
+        graph.route_first_departure[idx] = np.nan
+        if route is not None:
+            route_stops = sorted(stops, key=lambda s: s.stop_order)
+            graph.route_numbers[idx] = route.route_number
+            graph.route_distance[idx] = float(route.distance_km) if route.distance_km else MISSING_DISTANCE_KM
+            graph.route_fare[idx] = float(route.fare)
+            graph.route_duration[idx] = (
+                float(route.estimated_duration_minutes) if route.estimated_duration_minutes else np.nan
+            )
+            graph.route_travel_minutes[idx] = (
+                graph.route_distance[idx] / AVERAGE_BUS_SPEED_KMPH * 60
+                if np.isnan(graph.route_duration[idx]) else graph.route_duration[idx]
+            )
+            graph.route_headway[idx] = self.headways.get(route.route_number, DEFAULT_HEADWAY_MINUTES)
+            sequence = graph._intern_sequence(self.route_sequence(route, [s.stop_name for s in route_stops]))
+            schedule, graph.route_first_departure[idx] = graph._route_timing(idx, route, route_stops, len(sequence))
+            if sequence:
+                coordinates = graph._stop_coordinates(route_stops)
+        
+        costlier_only = bool(route is None or (
+            idx < len(self.route_numbers) and sequence == old_sequence
+            and graph.route_distance[idx] >= self.route_distance[idx]
+            and graph.route_fare[idx] >= self.route_fare[idx]
+        ))
+        
+        graph.pattern_offsets, (graph.pattern_nodes, graph.pattern_minutes) = _splice_ragged(
+            self.pattern_offsets, [self.pattern_nodes, self.pattern_minutes], idx, [sequence, schedule]
+        )
+        graph.coord_offsets, (graph.coord_nodes, graph.coord_lat, graph.coord_lon) = _splice_ragged(
+            self.coord_offsets, [self.coord_nodes, self.coord_lat, self.coord_lon], idx, list(coordinates)
+        )
+        
+        # Every other route's edges plus this route's new ones; walks follow the coordinates
+        keep = (self.edge_route != idx) & (self.edge_route != WALK_ROUTE)
+        hops = graph._route_hops(idx, sequence)
+        routes = np.argsort(graph.route_ids, kind='stable')
+        graph._renumber(
+            routes if route is not None else routes[routes != idx],
+            np.concatenate([self.sources[keep], np.array([h[0] for h in hops], dtype=np.int32)]),
+            np.concatenate([self.targets[keep], np.array([h[1] for h in hops], dtype=np.int32)]),
+            np.concatenate([self.distance[keep], np.array([h[2] for h in hops], dtype=np.float64)]),
+            np.concatenate([self.fare[keep], np.array([h[3] for h in hops], dtype=np.float64)]),
+            np.concatenate([self.edge_route[keep], np.full(len(hops), idx, dtype=np.int32)])
+        )
+        graph._heuristic_scale = None
+        
+        # Paths that walked between stops whose coordinates moved are not tied to the route
+        if costlier_only:
+            old_ids = np.array([self.node_ids[name] for name in graph.node_names], dtype=np.int32)
+            old_walks, new_walks = self.walking_edges(), graph.walking_edges()
+            old_order = np.lexsort((self.targets[old_walks], self.sources[old_walks]))
+            new_order = np.lexsort((old_ids[graph.targets[new_walks]], old_ids[graph.sources[new_walks]]))
+            costlier_only = (
+                np.array_equal(self.sources[old_walks][old_order], old_ids[graph.sources[new_walks]][new_order])
+                and np.array_equal(self.targets[old_walks][old_order], old_ids[graph.targets[new_walks]][new_order])
+                and np.array_equal(self.distance[old_walks][old_order], graph.distance[new_walks][new_order])
+            )
+        
+        graph.history = self.history + [(graph.version, route_id, costlier_only)]
+        return graph
+    
+    def _renumber(self, routes, sources, targets, distances, fares, edge_routes):
+        """
+        Lay the graph out like a fresh build of its records: keep the route
+        slots listed in routes (in route id order), number the nodes in the
+        order the route patterns first visit them, dropping nodes no route
+        serves, and rebuild coordinates, walking transfers and the CSR arrays
+        from the given route edges (in the current route and node ids)
+        """
+        route_map = np.full(len(self.route_numbers), WALK_ROUTE, dtype=np.int32)
+        route_map[routes] = np.arange(len(routes), dtype=np.int32)
+        self.route_ids = self.route_ids[routes]
+        self.route_numbers = [self.route_numbers[r] for r in routes.tolist()]
+        self.route_index = {route_id: idx for idx, route_id in enumerate(self.route_ids.tolist())}
+        for name in self.ROUTE_ARRAYS:
+            setattr(self, name, getattr(self, name)[routes])
+        
+        self.pattern_offsets, rows = _take_ragged(self.pattern_offsets, routes)
+        visits = self.pattern_nodes[rows]
+        _, first = np.unique(visits, return_index=True)
+        nodes = visits[np.sort(first)]
+        node_map = np.full(len(self.node_names), -1, dtype=np.int32)
+        node_map[nodes] = np.arange(len(nodes), dtype=np.int32)
+        self.node_names = [self.node_names[node] for node in nodes.tolist()]
+        self.node_ids = {name: node for node, name in enumerate(self.node_names)}
+        self.pattern_nodes = node_map[visits]
+        self.pattern_minutes = self.pattern_minutes[rows]
+        
+        self.coord_offsets, rows = _take_ragged(self.coord_offsets, routes)
+        self.coord_nodes = node_map[self.coord_nodes[rows]]
+        self.coord_lat, self.coord_lon = self.coord_lat[rows], self.coord_lon[rows]
+        self._refresh_coordinates()
+        
+        # _build_csr sorts stably, so each route's edges out of a node keep their hop order
+        walk_sources, walk_targets, walk_distances = self._walking_edges()
+        self._build_csr(
+            np.concatenate([node_map[sources], walk_sources]),
+            np.concatenate([node_map[targets], walk_targets]),
+            np.concatenate([distances, walk_distances]),
+            np.concatenate([fares, np.zeros(len(walk_sources))]),
+            np.concatenate([route_map[edge_routes], np.full(len(walk_sources), WALK_ROUTE, dtype=np.int32)])
+        )
+    
+    def changes_since(self, version):
+        """
+        Route updates applied after version as [(route_id, costlier_only), ...],
+        or None if this graph was not derived from that version incrementally
+        """
+        if version is None or version < self.base_version or version > self.version:
+            return None
+        return [(route_id, costlier_only) for changed, route_id, costlier_only in self.history if changed > version]
+    
+    def distance_lower_bounds(self, target):
+        """
+        Admissible estimate of the remaining distance from every node to target
+        Nodes without coordinates (or an uncoordinated target) get zero
+        """
+        if np.isnan(self.node_lat[target]):
+            return [0.0] * self.node_count
+        bounds = haversine_km(self.node_lat, self.node_lon, self.node_lat[target], self.node_lon[target])
+        return np.nan_to_num(bounds * self.heuristic_scale, nan=0.0).tolist()
+    
+    @staticmethod
+    def route_sequence(route, stop_names):
+        """Ordered locations served by a route, without consecutive repeats"""
+        sequence = []
+        for name in [route.start_location] + list(stop_names) + [route.end_location]:
+            if name and (not sequence or sequence[-1] != name):
+                sequence.append(name)
+        return sequence
+    
+    def weights(self, metric):
+        """Edge weight array for a metric name ('distance' or 'fare')"""
+        return getattr(self, metric)
+    
+    def adjacency_matrix(self, metric):
+        """
+        The graph as a scipy CSR matrix of one metric; parallel edges between
+        the same stops keep their cheapest weight (a sparse matrix would sum them)
+        """
+        weights = self.weights(metric)
+        order = np.lexsort((weights, self.targets, self.sources))
+        sources, targets = self.sources[order], self.targets[order]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = (sources[1:] != sources[:-1]) | (targets[1:] != targets[:-1])
+        size = self.node_count
+        return csr_matrix((weights[order][first], (sources[first], targets[first])), shape=(size, size))
+    
+    def route_fare_matrix(self):
+        """
+        The route fare model (each boarding pays the route fare once) as a plain
+        shortest-path graph for scipy: besides the stops there is one node per
+        (stop, route) served, entered by boarding for the route fare, ridden
+        along the route's edges and left by alighting for free; walking
+        transfers join the stops directly
+        Returns: CSR matrix whose first node_count rows and columns are the stops
+        """
+        riding = self.edge_route != WALK_ROUTE
+        route_count = len(self.route_ids)
+        ends = np.concatenate([self.sources[riding], self.targets[riding]]).astype(np.int64)
+        routes = np.tile(self.edge_route[riding], 2).astype(np.int64)
+        pairs, ride_nodes = np.unique(ends * route_count + routes, return_inverse=True)
+        ride_nodes = ride_nodes.reshape(-1) + self.node_count
+        pair_stops, pair_routes = pairs // route_count, pairs % route_count
+        pair_nodes = np.arange(len(pairs), dtype=np.int64) + self.node_count
+        ridden = riding.sum()
+        walks = ~riding
+        
+        rows = np.concatenate([pair_stops, pair_nodes, ride_nodes[:ridden], self.sources[walks]])
+        cols = np.concatenate([pair_nodes, pair_stops, ride_nodes[ridden:], self.targets[walks]])
+        weights = np.concatenate([self.route_fare[pair_routes], np.zeros(len(pairs) + ridden + walks.sum())])
+        size = self.node_count + len(pairs)
+        # Parallel edges between the same nodes all cost nothing, so summing them is harmless
+        return csr_matrix((weights, (rows, cols)), shape=(size, size))
+    
+    def neighbors(self, location):
+        """Out-edges of a location as [(neighbor, distance, fare, route_id), ...] (route_id None for walks)"""
+        node = self.node_ids.get(location)
+        if node is None:
+            return []
+        start, end = self.offsets[node], self.offsets[node + 1]
+        return [
+            (self.node_names[target], distance, fare, int(self.route_ids[route]) if route != WALK_ROUTE else None)
+            for target, distance, fare, route in zip(
+                self.targets[start:end].tolist(), self.distance[start:end].tolist(),
+                self.fare[start:end].tolist(), self.edge_route[start:end].tolist()
+            )
+        ]
+    
+    def out_degree(self):
+        """Number of out-edges per node id"""
+        return np.diff(self.offsets)
+    
+    @property
+    def fingerprint(self):
+        """
+        Hash of the node and edge arrays, which the routing artifacts index
+        into; stable across processes (unlike version), and the same for a
+        patched graph and a fresh build of the same records
+        """
+        if self._fingerprint is None:
+            digest = hashlib.sha1('\n'.join(self.node_names).encode('utf-8'))
+            for array in (self.offsets, self.targets, self.distance, self.fare, self.edge_route):
+                digest.update(np.ascontiguousarray(array).tobytes())
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+    
+    @property
+    def node_count(self):
+        return len(self.node_names)
+    
+    @property
+    def edge_count(self):
+        return len(self.targets)
+    
+    @property
+    def nbytes(self):
+        """Memory held by the adjacency and route arrays"""
+        arrays = [self.offsets, self.sources, self.targets, self.distance, self.fare, self.edge_route,
+                  self.rev_offsets, self.rev_edges,
+                  self.route_ids, self.route_distance, self.route_fare, self.route_duration,
+                  self.route_travel_minutes, self.route_headway, self.route_first_departure,
+                  self.pattern_offsets, self.pattern_nodes, self.pattern_minutes,
+                  self.coord_offsets, self.coord_nodes, self.coord_lat, self.coord_lon,
+                  self.node_lat, self.node_lon]
+        return sum(array.nbytes for array in arrays)
+    
+    # Fixed-width arrays written to a snapshot, in file order
+    SNAPSHOT_ARRAYS = (
+        'offsets', 'sources', 'targets', 'distance', 'fare', 'edge_route', 'rev_offsets', 'rev_edges',
+        'route_ids', 'route_distance', 'route_fare', 'route_duration', 'route_travel_minutes', 'route_headway',
+        'route_first_departure', 'pattern_offsets', 'pattern_nodes', 'pattern_minutes',
+        'coord_offsets', 'coord_nodes', 'coord_lat', 'coord_lon', 'node_lat', 'node_lon'
+    )
+    
+    def save_snapshot(self, path):
+        """
+        Write the graph as a single binary snapshot: a magic tag, a JSON header
+        and the SNAPSHOT_ARRAYS plus a UTF-8 string table (stop names, route
+        numbers, headway keys), each aligned so load_snapshot() can map it in place
+        """
+        headway_routes = sorted(self.headways)
+        strings = [name.encode('utf-8') for name in self.node_names]
+        strings += [str(number).encode('utf-8') for number in self.route_numbers]
+        strings += [number.encode('utf-8') for number in headway_routes]
+        string_offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+        np.cumsum([len(s) for s in strings], out=string_offsets[1:])
+        
+        arrays = [(name, np.ascontiguousarray(getattr(self, name))) for name in self.SNAPSHOT_ARRAYS]
+        arrays += [
+            ('headway_minutes', np.array([self.headways[r] for r in headway_routes], dtype=np.float64)),
+            ('string_offsets', string_offsets),
+            ('strings', np.frombuffer(b''.join(strings), dtype=np.uint8)),
+        ]
+        
+        # Lay the arrays out after the header before writing anything
+        layout, position = {}, 0
+        for name, array in arrays:
+            layout[name] = [array.dtype.str, len(array), position]
+            position += -(-array.nbytes // SNAPSHOT_ALIGNMENT) * SNAPSHOT_ALIGNMENT
+        header = json.dumps({
+            'format_version': SNAPSHOT_FORMAT_VERSION,
+            'signature': self.signature,
+            'fingerprint': self.fingerprint,
+            'heuristic_scale': self._heuristic_scale,
+            'walk_radius_km': self.walk_radius_km,
+            'counts': [self.node_count, len(self.route_numbers), len(headway_routes)],
+            'arrays': layout
+        }).encode('utf-8')
+        data_start = -(-(len(SNAPSHOT_MAGIC) + 8 + len(header)) // SNAPSHOT_ALIGNMENT) * SNAPSHOT_ALIGNMENT
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as snapshot:
+            snapshot.write(SNAPSHOT_MAGIC)
+            snapshot.write(np.uint64(len(header)).tobytes())
+            snapshot.write(header)
+            for name, array in arrays:
+                snapshot.seek(data_start + layout[name][2])
+                snapshot.write(array.tobytes())
+            snapshot.truncate(data_start + position)
+        # Processes still mapping the old file keep reading its (unlinked) pages
+        os.replace(temp_path, path)
+    
+    @classmethod
+    def load_snapshot(cls, path, version=0):
+        """
+        Graph backed by a snapshot written by save_snapshot(). The arrays are
+        read-only views of one shared memory map, so every process loading the
+        same file shares its pages; only the name lookups are built per process
+        """
+        raw = np.memmap(path, dtype=np.uint8, mode='r')
+        if bytes(raw[:len(SNAPSHOT_MAGIC)]) != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not a transit graph snapshot")
+        header_end = len(SNAPSHOT_MAGIC) + 8
+        header_length = int(raw[len(SNAPSHOT_MAGIC):header_end].view(np.uint64)[0])
+        header = json.loads(bytes(raw[header_end:header_end + header_length]).decode('utf-8'))
+        if header['format_version'] != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format in {path}")
+        data_start = -(-(header_end + header_length) // SNAPSHOT_ALIGNMENT) * SNAPSHOT_ALIGNMENT
+        
+        arrays = {
+            name: np.frombuffer(raw, dtype=np.dtype(dtype), count=count, offset=data_start + position)
+            for name, (dtype, count, position) in header['arrays'].items()
+        }
+        blob = arrays['strings'].tobytes()
+        bounds = arrays['string_offsets'].tolist()
+        strings = [blob[start:end].decode('utf-8') for start, end in zip(bounds, bounds[1:])]
+        node_count, route_count, _ = header['counts']
+        
+        graph = cls.__new__(cls)
+        for name in cls.SNAPSHOT_ARRAYS:
+            setattr(graph, name, arrays[name])
+        graph.version = graph.base_version = version
+        graph.signature = tuple(header['signature']) if header['signature'] is not None else None
+        graph._fingerprint = header['fingerprint']
+        graph._heuristic_scale = header['heuristic_scale']
+        graph.walk_radius_km = header['walk_radius_km']
+        graph.node_names = strings[:node_count]
+        graph.node_ids = {name: node for node, name in enumerate(graph.node_names)}
+        graph.route_numbers = strings[node_count:node_count + route_count]
+        graph.route_index = {route_id: idx for idx, route_id in enumerate(graph.route_ids.tolist())}
+        graph.headways = dict(zip(strings[node_count + route_count:], arrays['headway_minutes'].tolist()))
+        graph.history = []
+        return graph
+    
+    def __contains__(self, location):
+        return location in self.node_ids
+
+_graph = None
+_graph_lock = threading.Lock()
+_last_check = 0.0
+_stale = False
+_version_counter = 0
+_pending_routes = set()     # route ids edited since the graph was last patched
+_listeners_registered = False
+
+# Route columns the graph is built from; edits to anything else are ignored
+GRAPH_ROUTE_COLUMNS = (
+    'is_active', 'route_number', 'start_location', 'end_location',
+    'distance_km', 'fare', 'estimated_duration_minutes'
+)
+
+def load_route_headways(path=None):
+    """Read {route_number: headway minutes} from the frequency column of the routes CSV"""
+    path = path or ROUTES_CSV_PATH
+    headways = {}
+    try:
+        with open(path, newline='', encoding='utf-8') as csv_file:
+            for row in csv.DictReader(csv_file):
+                try:
+                    frequency = float(row.get('frequency') or 0)
+                except ValueError:
+                    continue
+                if row.get('route_number') and frequency > 0:
+                    headways[row['route_number'].strip()] = frequency
+    except OSError as e:
+        print(f"Headway load error: {e}")
+    return headways
+
+def _text_digest(columns, order_by, *criteria):
+    """
+    MD5 of text columns over every matching row in order_by order: computed by
+    the database on PostgreSQL (one short row back), streamed and hashed here
+    on other databases
+    """
+    if db.session.get_bind().dialect.name == 'postgresql':
+        row_text = func.concat_ws(TEXT_FIELD_SEPARATOR, *columns)
+        return db.session.query(
+            func.md5(func.string_agg(row_text, aggregate_order_by(literal(TEXT_ROW_SEPARATOR), order_by)))
+        ).filter(*criteria).scalar()
+    digest = hashlib.md5()
+    for row in db.session.query(*columns).filter(*criteria).order_by(order_by).yield_per(1000):
+        digest.update(TEXT_FIELD_SEPARATOR.join('' if v is None else str(v) for v in row).encode('utf-8'))
+        digest.update(TEXT_ROW_SEPARATOR.encode('utf-8'))
+    return digest.hexdigest()
+
+def route_data_signature():
+    """
+    Fingerprint of the route and stop tables used to detect changes: row
+    counts and ids, sums of the numeric columns the graph reads weighted by
+    row id, and a digest of its text columns (route numbers and ends, stop
+    names and arrival times). In-place edits (fare scripts, raw SQL updates,
+    stop renames, reorders and coordinate fixes) change it even when no
+    updated_at is touched
+    """
+    route_sig = db.session.query(
+        func.count(Route.id), func.max(Route.id), func.max(Route.updated_at),
+        func.sum(Route.fare * Route.id), func.sum(Route.distance_km * Route.id),
+        func.sum(Route.estimated_duration_minutes * Route.id)
+    ).filter(Route.is_active == True).one()
+    stop_sig = db.session.query(
+        func.count(Stop.id), func.max(Stop.id), func.sum(Stop.route_id * Stop.id),
+        func.sum(Stop.stop_order * Stop.id), func.sum(Stop.latitude * Stop.id), func.sum(Stop.longitude * Stop.id)
+    ).one()
+    text_sig = (
+        _text_digest((Route.route_number, Route.start_location, Route.end_location), Route.id, Route.is_active == True),
+        _text_digest((Stop.stop_name, Stop.estimated_arrival_time), Stop.id)
+    )
+    # Plain values so the signature survives a round trip through a snapshot header
+    return tuple(
+        v.isoformat() if isinstance(v, date) else str(v) if isinstance(v, Decimal) else v
+        for v in tuple(route_sig) + tuple(stop_sig) + text_sig
+    )
+
+def load_transit_graph(signature=None):
+    """Build a new graph from the database with two bulk queries"""
+    global _version_counter
+    
+    routes = db.session.query(
+        Route.id, Route.route_number, Route.start_location, Route.end_location,
+        Route.distance_km, Route.fare, Route.estimated_duration_minutes
+    ).filter(Route.is_active == True).order_by(Route.id).all()
+    
+    stops = db.session.query(
+        Stop.route_id, Stop.stop_name, Stop.stop_order, Stop.latitude,
+        Stop.longitude, Stop.estimated_arrival_time
+    ).join(Route, Stop.route_id == Route.id).filter(
+        Route.is_active == True
+    ).order_by(Stop.route_id, Stop.stop_order).all()
+    
+    headways = load_route_headways(current_app.config.get('ROUTE_FREQUENCY_CSV'))
+    
+    walk_radius_km = current_app.config.get('WALKING_TRANSFER_RADIUS_KM', DEFAULT_WALK_RADIUS_KM)
+    
+    _version_counter += 1
+    return TransitGraph(routes, stops, version=_version_counter, signature=signature, headways=headways,
+                        walk_radius_km=walk_radius_km)
+
+def load_graph_snapshot(path):
+    """
+    Install a snapshot written by TransitGraph.save_snapshot() as the shared
+    graph (app startup), so workers skip the database build. The first
+    get_transit_graph() call still compares its signature with the tables
+    Returns: the graph, or None if the file does not exist
+    """
+    global _graph, _version_counter, _last_check
+    if not path or not os.path.exists(path):
+        return None
+    with _graph_lock:
+        _version_counter += 1
+        _graph = TransitGraph.load_snapshot(path, version=_version_counter)
+        _last_check = 0.0
+    return _graph
+
+def load_route_records(route_id):
+    """(route record or None if inactive/deleted, its stops) for one route"""
+    route = db.session.query(
+        Route.id, Route.route_number, Route.start_location, Route.end_location,
+        Route.distance_km, Route.fare, Route.estimated_duration_minutes
+    ).filter(Route.id == route_id, Route.is_active == True).first()
+    if route is None:
+        return None, []
+    
+    stops = db.session.query(
+        Stop.route_id, Stop.stop_name, Stop.stop_order, Stop.latitude,
+        Stop.longitude, Stop.estimated_arrival_time
+    ).filter(Stop.route_id == route_id).order_by(Stop.stop_order).all()
+    return route, stops
+
+def apply_route_changes(graph, route_ids):
+    """Patch the edges of each changed route into graph, one version per route"""
+    global _version_counter
+    for route_id in sorted(route_ids):
+        route, stops = load_route_records(route_id)
+        _version_counter += 1
+        graph = graph.with_route(route_id, route, stops, version=_version_counter)
+    return graph
+
+def get_transit_graph():
+    """
+    Return the shared graph, rebuilding it only when routes or stops changed
+    Routes edited through the ORM are patched in right away; the tables are
+    fingerprinted at most once every TRANSIT_GRAPH_CHECK_SECONDS. A patched
+    graph keeps the signature of the tables it was built from, so the next
+    check rebuilds it in full and picks up edits made outside this process
+    """
+    global _graph, _last_check, _stale
+    
+    check_seconds = current_app.config.get('TRANSIT_GRAPH_CHECK_SECONDS', DEFAULT_CHECK_SECONDS)
+    if _graph is not None and not _pending_routes and time.monotonic() - _last_check < check_seconds:
+        return _graph
+    
+    with _graph_lock:
+        if _graph is not None and not _pending_routes and time.monotonic() - _last_check < check_seconds:
+            return _graph
+        
+        signature = route_data_signature()
+        if _graph is not None and not _stale and _pending_routes:
+            changed = set(_pending_routes)
+            _pending_routes.difference_update(changed)
+            _graph = apply_route_changes(_graph, changed)
+        elif _graph is None or _stale or _graph.signature != signature:
+            _pending_routes.clear()
+            _graph = load_transit_graph(signature)
+            _stale = False
+        _last_check = time.monotonic()
+    
+    return _graph
+
+def invalidate_transit_graph():
+    """Force a rebuild on the next get_transit_graph() call (e.g. after editing stops)"""
+    global _last_check, _stale
+    with _graph_lock:
+        _last_check = 0.0
+        _stale = True
+
+def mark_route_changed(route_id):
+    """Patch one route's edges into the shared graph on the next get_transit_graph() call"""
+    if route_id is not None:
+        _pending_routes.add(route_id)
+
+def _collect_route_changes(session, flush_context):
+    """after_flush: remember which routes the flushed Route/Stop rows belong to"""
+    changed = session.info.setdefault('changed_route_ids', set())
+    for obj in session.new | session.dirty | session.deleted:
+        if isinstance(obj, Route):
+            state = inspect(obj)
+            if obj in session.dirty and not any(
+                state.attrs[column].history.has_changes() for column in GRAPH_ROUTE_COLUMNS
+            ):
+                continue
+            changed.add(obj.id)
+        elif isinstance(obj, Stop):
+            # A stop moved to another route changes both routes
+            history = inspect(obj).attrs.route_id.history
+            changed.update(route_id for route_id in history.deleted if route_id is not None)
+            changed.add(obj.route_id)
+
+def _publish_route_changes(session):
+    """after_commit: hand the committed route ids to the shared graph"""
+    for route_id in session.info.pop('changed_route_ids', ()):
+        mark_route_changed(route_id)
+
+def _discard_route_changes(session):
+    """after_rollback: nothing was committed"""
+    session.info.pop('changed_route_ids', None)
+
+def register_route_listeners():
+    """Patch the shared graph whenever routes or stops are committed through the ORM"""
+    global _listeners_registered
+    if _listeners_registered:
+        return
+    event.listen(Session, 'after_flush', _collect_route_changes)
+    event.listen(Session, 'after_commit', _publish_route_changes)
+    event.listen(Session, 'after_rollback', _discard_route_changes)
+    _listeners_registered = True
@@ -14,7 +14,15 @@ from datetime import datetime
 from app.chatbot_modules.location_handler import LocationHandler
 from app.chatbot_modules.route_search import RouteSearchHandler
 from app.chatbot_modules.algorithms import PathfindingAlgorithms
-from app.chatbot_modules.query_handlers import QueryHandlers
+from app.chatbot_modules.query_handlers import QueryHandlers, DEPARTURE_TIME_PATTERN
+
+# A whole message asking for N alternatives to the last search, e.g. 'show me 3 options'
+ALTERNATIVES_COUNT_PATTERN = re.compile(
+    r'^(?:(?:show|give|list|find)(?: me)?\s+)?\d+\s+(?:more\s+|other\s+)?'
+    r'(?:alternatives|alternative routes|route options|options)(?:\s+please)?\??$'
+)
+# Follow-ups like 'alternatives' refer to a route search at most this old
+SEARCH_CONTEXT_SECONDS = 15 * 60
 
 class SamparkChatbot:
     """Sampark - AI-powered chatbot for YatriSetu with modular architecture"""
@@ -30,6 +38,15 @@ class SamparkChatbot:
         # Store last search results for filtering
         self.last_search_results = {}
     
+    def has_recent_search(self, user_id):
+        """Whether the user's last route search is recent enough for follow-up questions"""
+        last = self.last_search_results.get(user_id) or {}
+        searched_at = last.get('searched_at')
+        return bool(
+            last.get('source') and last.get('destination') and searched_at
+            and (datetime.now() - searched_at).total_seconds() <= SEARCH_CONTEXT_SECONDS
+        )
+    
     def greeting_response(self):
         """Greeting with real statistics"""
         try:
@@ -140,7 +157,8 @@ class SamparkChatbot:
             self.last_search_results[user_id] = {
                 'routes': [],
                 'source': None,
-                'destination': None
+                'destination': None,
+                'searched_at': None
             }
         
         context = self.user_context[user_id]
@@ -230,7 +248,8 @@ class SamparkChatbot:
             self.last_search_results[user_id] = {
                 'routes': routes,
                 'source': source,
-                'destination': dest_match
+                'destination': dest_match,
+                'searched_at': datetime.now()
             }
             
             # Reset state
@@ -366,6 +385,20 @@ class SamparkChatbot:
                     'suggestions': ['Find Route', 'Route 001', 'Help']
                 }
         
+        # Alternative routes (after search results), e.g. 'show me 3 options'
+        if message_lower in ['alternative routes', 'alternatives', 'other routes', 'more options'] or \
+                ALTERNATIVES_COUNT_PATTERN.match(message_lower):
+            if self.has_recent_search(user_id):
+                source = self.last_search_results[user_id]['source']
+                destination = self.last_search_results[user_id]['destination']
+                return self.query_handlers.alternative_routes_response(source, destination, message_lower)
+            else:
+                return {
+                    'message': "Please search for routes first.\n\nTry: 'Find Route' or 'Route from [source] to [destination]'",
+                    'type': 'text',
+                    'suggestions': ['Find Route', 'Route 001', 'Help']
+                }
+        
         # Show all routes again
         if message_lower in ['all routes', 'show all', 'all']:
             if self.last_search_results[user_id]['routes']:
@@ -401,6 +434,18 @@ class SamparkChatbot:
         if 'track' in message_lower:
             return self.handle_live_tracking(message_lower)
         
+        # Special queries - Departure time, e.g. 'from X to Y leaving at 08:30'
+        if 'from' in message_lower and ' to ' in message_lower and DEPARTURE_TIME_PATTERN.search(message_lower):
+            return self.query_handlers.handle_departure_time_query(user_id, message_lower, message)
+        
+        # Special queries - Reachability, e.g. 'where can I go from X within 10 km'
+        if 'from' in message_lower and ('within' in message_lower or 'where can i go' in message_lower):
+            return self.query_handlers.handle_reachability_query(user_id, message_lower, message)
+        
+        # Special queries - Alternative routes (must have from/to)
+        if any(word in message_lower for word in ['alternative', 'options']) and ('from' in message_lower or 'to' in message_lower):
+            return self.query_handlers.handle_alternative_routes_query(user_id, message_lower, message)
+        
         # Special queries - Cheapest route (must have from/to)
         if any(word in message_lower for word in ['cheapest', 'cheap', 'lowest fare']) and ('from' in message_lower or 'to' in message_lower):
             return self.query_handlers.handle_cheapest_route_query(user_id, message_lower, message)
@@ -644,12 +689,11 @@ class SamparkChatbot:
     
     def handle_route_query(self, user_id, message_lower, original_message):
         """Handle route search with real data and fuzzy matching"""
-        locations = self.location_handler.extract_locations_from_message(original_message)
+        locations = self.location_handler.resolve_locations_from_message(original_message)
         
         # Check if only destination is provided
         if len(locations) == 1:
-            destination = locations[0]
-            dest_match, dest_score = self.location_handler.find_best_location_match(destination)
+            dest_match, dest_score = locations[0]
             
             # Find all routes TO this destination
             all_routes_to_dest = self.route_search.find_all_routes_to_destination(dest_match)
@@ -664,22 +708,19 @@ class SamparkChatbot:
                 }
         
         elif len(locations) >= 2:
-            source, destination = locations[0], locations[1]
-            
-            # Normalize locations
-            source_match, source_score = self.location_handler.find_best_location_match(source)
-            dest_match, dest_score = self.location_handler.find_best_location_match(destination)
+            (source_match, source_score), (dest_match, dest_score) = locations[:2]
             
             self.user_context[user_id]['source'] = source_match
             self.user_context[user_id]['destination'] = dest_match
             
-            routes = self.route_search.find_routes(source, destination, self.location_handler)
+            routes = self.route_search.find_routes(source_match, dest_match, self.location_handler)
             
             # Store results for filtering
             self.last_search_results[user_id] = {
                 'routes': routes,
                 'source': source_match,
-                'destination': dest_match
+                'destination': dest_match,
+                'searched_at': datetime.now()
             }
             
             if routes:
@@ -1,4 +1,4 @@
-from flask import Blueprint, render_template, jsonify
+from flask import Blueprint, render_template, jsonify, request
 from app import db
 from app.models.database_models import User, Bus, Route, Booking, Payment, LiveBusLocation, Driver, Conductor
 from sqlalchemy import func, extract
@@ -340,6 +340,59 @@ def get_all_routes():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@bp.route('/api/routes/<int:route_id>/toggle', methods=['POST'])
+def toggle_route(route_id):
+    """
+    Activate or deactivate a route (the routing graph is patched on commit and
+    the routing artifacts are rebuilt by a separate builder process)
+    """
+    try:
+        route = Route.query.get(route_id)
+        if route:
+            route.is_active = not route.is_active
+            route.updated_at = datetime.utcnow()
+            db.session.commit()
+            
+            from app.chatbot_modules.artifact_builder import request_artifact_rebuild
+            request_artifact_rebuild()
+            return jsonify({
+                'success': True,
+                'message': 'Route activated' if route.is_active else 'Route deactivated',
+                'is_active': route.is_active
+            })
+        return jsonify({'success': False, 'error': 'Route not found'}), 404
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@bp.route('/api/routes/coverage')
+def get_route_coverage():
+    """Get stops reachable from a source within a km (max_km) or fare (max_fare) budget"""
+    try:
+        from app.chatbot_modules.algorithms import PathfindingAlgorithms, DISTANCE, ROUTE_FARE, DEFAULT_REACH_KM
+        
+        source = request.args.get('source', '').strip()
+        if not source:
+            return jsonify({'success': False, 'error': 'source is required'}), 400
+        
+        if request.args.get('max_fare'):
+            metric, budget = ROUTE_FARE, float(request.args['max_fare'])
+        else:
+            metric, budget = DISTANCE, float(request.args.get('max_km', DEFAULT_REACH_KM))
+        
+        stops = PathfindingAlgorithms.reachable_stops(source, budget, metric)
+        return jsonify({
+            'success': True,
+            'data': {
+                'source': source,
+                'metric': metric,
+                'budget': budget,
+                'stops': stops
+            }
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @bp.route('/api/users/all')
 def get_all_users():
     """Get all users"""
@@ -1,5 +1,6 @@
 from flask import Blueprint, render_template, request, jsonify, session
 from app.models.chatbot import chatbot
+from app.chatbot_modules.algorithms import PathfindingAlgorithms
 import uuid
 
 bp = Blueprint('chatbot', __name__, url_prefix='/chatbot')
@@ -60,6 +61,24 @@ def reset_conversation():
             'error': str(e)
         }), 500
 
+@bp.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Get cache counters for the routing engine and location matching"""
+    try:
+        return jsonify({
+            'success': True,
+            'metrics': {
+                'path_cache': PathfindingAlgorithms.cache_stats(),
+                'location_cache': chatbot.location_handler.match_cache_stats()
+            }
+        })
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @bp.route('/api/suggestions', methods=['POST'])
 def get_suggestions():
     """Get context-aware suggestions"""
@@ -42,3 +42,36 @@ class Config:
     # Application Settings
     ITEMS_PER_PAGE = 20
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+    
+    # Routing Settings
+    TRANSIT_GRAPH_CHECK_SECONDS = int(os.getenv('TRANSIT_GRAPH_CHECK_SECONDS', '30'))
+    ROUTING_ENGINE = os.getenv('ROUTING_ENGINE', 'bidirectional')  # dijkstra, astar, alt, bidirectional, ch
+    # Contraction hierarchy artifacts, one per metric ({metric} is 'distance' or 'fare'), built outside
+    # the workers by database/build_routing_artifacts.py; 'ch' answers with bidirectional search until they match
+    CONTRACTION_HIERARCHY_PATH = os.getenv(
+        'CONTRACTION_HIERARCHY_PATH', str(basedir / 'data' / 'processed' / 'contraction_hierarchy_{metric}.npz')
+    )
+    # ALT landmark artifacts, one per metric ({metric} is 'distance' or 'fare')
+    LANDMARKS_PATH = os.getenv(
+        'LANDMARKS_PATH', str(basedir / 'data' / 'processed' / 'landmarks_{metric}.npz')
+    )
+    # Start one `build_routing_artifacts.py refresh` process when the artifacts fall behind the route
+    # data (the lock file keeps it to one builder); disabled, run that command after editing routes
+    ROUTING_ARTIFACT_REBUILD = os.getenv('ROUTING_ARTIFACT_REBUILD', 'true').lower() == 'true'
+    ROUTING_ARTIFACT_LOCK_PATH = os.getenv(
+        'ROUTING_ARTIFACT_LOCK_PATH', str(basedir / 'data' / 'processed' / 'routing_artifacts.lock')
+    )
+    NETWORK_SNAPSHOT_PATH = os.getenv(
+        'NETWORK_SNAPSHOT_PATH', str(basedir / 'data' / 'processed' / 'transit_graph.snapshot')
+    )
+    WALKING_TRANSFER_RADIUS_KM = float(os.getenv('WALKING_TRANSFER_RADIUS_KM', '0.4'))
+    LIVE_SPEED_REFRESH_SECONDS = int(os.getenv('LIVE_SPEED_REFRESH_SECONDS', '5'))
+    LIVE_SPEED_MAX_AGE_SECONDS = int(os.getenv('LIVE_SPEED_MAX_AGE_SECONDS', '300'))
+    PATH_CACHE_SIZE = int(os.getenv('PATH_CACHE_SIZE', '4096'))
+    PATH_CACHE_TTL_SECONDS = int(os.getenv('PATH_CACHE_TTL_SECONDS', '600'))
+    
+    # Location Matching
+    LOCATION_MATCH_STRATEGY = os.getenv('LOCATION_MATCH_STRATEGY', 'trigram')  # trigram, bktree, scan
+    LOCATION_MATCH_CACHE_SIZE = int(os.getenv('LOCATION_MATCH_CACHE_SIZE', '2048'))
+    # Location catalogue file shared by worker processes (unset: each process reads the tables itself)
+    LOCATION_CATALOG_PATH = os.getenv('LOCATION_CATALOG_PATH') or None
@@ -0,0 +1,150 @@
+"""
+Script to precompute routing artifacts from the current route data
+The app serves contraction hierarchies and landmarks only from these
+artifacts, falling back to other engines until they match the route data.
+When a worker finds them stale it starts `refresh` in its own process; with
+ROUTING_ARTIFACT_REBUILD off (or on Windows), run `refresh` after importing
+or editing routes
+Fare artifacts weigh each edge by its share of the route fare (FARE): the
+ticket price (ROUTE_FARE) depends on where a route was boarded, so it has
+no fixed edge weight to contract or to bound with landmarks
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import time
+from app import create_app, db
+from app.chatbot_modules.transit_graph import get_transit_graph, load_transit_graph, route_data_signature
+from app.chatbot_modules.contraction import ContractionHierarchy, hierarchy_artifact_path
+from app.chatbot_modules.landmarks import LandmarkSet, DEFAULT_LANDMARK_COUNT, landmark_artifact_path
+from app.chatbot_modules.artifact_builder import fcntl, try_lock
+
+app = create_app()
+
+def build_contraction_hierarchy(metric, output):
+    """Contract the current transit graph and save the hierarchy artifact"""
+    with app.app_context():
+        output = output or hierarchy_artifact_path(app.config['CONTRACTION_HIERARCHY_PATH'], metric)
+        graph = get_transit_graph()
+        print(f"Transit graph: {graph.node_count} stops, {graph.edge_count} edges")
+        
+        started = time.time()
+        hierarchy = ContractionHierarchy.build(graph, metric)
+        print(f"✅ Contracted in {time.time() - started:.1f}s "
+              f"({hierarchy.shortcut_count} shortcuts, metric: {metric})")
+        
+        hierarchy.save(output)
+        print(f"✅ Saved to {output}")
+
+def build_landmarks(metric, count, output):
+    """Pick ALT landmarks on the current transit graph and save their cost tables"""
+    with app.app_context():
+        output = output or landmark_artifact_path(app.config['LANDMARKS_PATH'], metric)
+        graph = get_transit_graph()
+        print(f"Transit graph: {graph.node_count} stops, {graph.edge_count} edges")
+        
+        started = time.time()
+        landmark_set = LandmarkSet.build(graph, metric, count)
+        print(f"✅ Selected {len(landmark_set.landmarks)} landmarks in {time.time() - started:.1f}s (metric: {metric})")
+        
+        landmark_set.save(output)
+        print(f"✅ Saved to {output}")
+
+def refresh_artifact(artifact_class, path, graph, metric, build):
+    """Rebuild one artifact with build() unless it already matches the graph"""
+    if not path:
+        return
+    try:
+        current = artifact_class.load(path) if os.path.exists(path) else None
+    except (OSError, ValueError, KeyError):
+        current = None
+    if current is not None and current.metric == metric and current.fingerprint == graph.fingerprint:
+        print(f"{path} is up to date")
+        return
+    
+    started = time.time()
+    build().save(path)
+    print(f"✅ Rebuilt {path} in {time.time() - started:.1f}s")
+
+def refresh_artifacts(count):
+    """
+    Rebuild every stale artifact under ROUTING_ARTIFACT_LOCK_PATH, so only one
+    builder runs at a time: a second one exits at once, and the running one
+    checks the tables again after releasing the lock and repeats if they
+    changed meanwhile
+    """
+    if fcntl is None:
+        print("❌ refresh needs file locks (fcntl); run the contraction and landmarks commands instead")
+        return
+    with app.app_context():
+        lock_path = app.config['ROUTING_ARTIFACT_LOCK_PATH']
+        os.makedirs(os.path.dirname(lock_path) or '.', exist_ok=True)
+        while True:
+            with open(lock_path, 'a') as lock_file:
+                if not try_lock(lock_file):
+                    print("Another builder is refreshing the artifacts")
+                    return
+                signature = route_data_signature()
+                graph = load_transit_graph(signature)
+                print(f"Transit graph: {graph.node_count} stops, {graph.edge_count} edges")
+                for metric in ('distance', 'fare'):
+                    refresh_artifact(
+                        ContractionHierarchy,
+                        hierarchy_artifact_path(app.config.get('CONTRACTION_HIERARCHY_PATH'), metric),
+                        graph, metric, lambda: ContractionHierarchy.build(graph, metric)
+                    )
+                    refresh_artifact(
+                        LandmarkSet, landmark_artifact_path(app.config.get('LANDMARKS_PATH'), metric),
+                        graph, metric, lambda: LandmarkSet.build(graph, metric, count)
+                    )
+            db.session.rollback()   # end the read transaction so the check sees newer commits
+            if route_data_signature() == signature:
+                return
+
+def export_network_snapshot(output):
+    """Build the transit graph from the database and write the binary snapshot workers map at startup"""
+    with app.app_context():
+        output = output or app.config['NETWORK_SNAPSHOT_PATH']
+        started = time.time()
+        graph = load_transit_graph(route_data_signature())
+        print(f"Transit graph: {graph.node_count} stops, {graph.edge_count} edges "
+              f"({len(graph.route_numbers)} routes) built in {time.time() - started:.1f}s")
+        
+        graph.save_snapshot(output)
+        print(f"✅ Saved snapshot ({os.path.getsize(output) / 1024:.0f} KB) to {output}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Build YatriSetu routing artifacts')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    ch_parser = subparsers.add_parser('contraction', help='Build the contraction hierarchy')
+    ch_parser.add_argument('--metric', choices=['distance', 'fare'], default='distance')
+    ch_parser.add_argument('--output', help='Artifact path (default: CONTRACTION_HIERARCHY_PATH for the metric)')
+    
+    landmark_parser = subparsers.add_parser('landmarks', help='Build the ALT landmark tables')
+    landmark_parser.add_argument('--metric', choices=['distance', 'fare'], default='distance')
+    landmark_parser.add_argument('--count', type=int, default=DEFAULT_LANDMARK_COUNT)
+    landmark_parser.add_argument('--output', help='Artifact path (default: LANDMARKS_PATH for the metric)')
+    
+    refresh_parser = subparsers.add_parser(
+        'refresh', help='Rebuild every stale artifact (one builder at a time; what the app starts)'
+    )
+    refresh_parser.add_argument('--count', type=int, default=DEFAULT_LANDMARK_COUNT, help='Landmarks per metric')
+    
+    snapshot_parser = subparsers.add_parser('snapshot', help='Export the network snapshot')
+    snapshot_parser.add_argument('--output', help='Snapshot path (default: NETWORK_SNAPSHOT_PATH)')
+    
+    args = parser.parse_args()
+    if args.command == 'contraction':
+        build_contraction_hierarchy(args.metric, args.output)
+    elif args.command == 'landmarks':
+        build_landmarks(args.metric, args.count, args.output)
+    elif args.command == 'refresh':
+        refresh_artifacts(args.count)
+    elif args.command == 'snapshot':
+        export_network_snapshot(args.output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,298 @@
+"""
+Pathfinding Benchmark
+Times every routing engine on synthetic city networks of several sizes,
+without PostgreSQL, and writes a JSON report to diff between releases
+
+Usage:
+    python tests/benchmark_pathfinding.py
+    python tests/benchmark_pathfinding.py --sizes small medium --queries 100 --output report.json
+    python tests/benchmark_pathfinding.py --engines dijkstra_distance alt_distance raptor
+    python tests/benchmark_pathfinding.py --baseline last_release.json
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import gc
+import json
+import platform
+import random
+import time
+import tracemalloc
+from datetime import datetime, timezone
+import numpy as np
+import scipy
+from scipy.spatial import cKDTree
+
+# Load the models package first so the chatbot modules import cleanly
+import app.models  # noqa: F401
+from app.chatbot_modules.transit_graph import TransitGraph, RouteRecord, StopRecord, WALK_ROUTE
+from app.chatbot_modules.algorithms import (
+    PathfindingAlgorithms, DISTANCE, FARE, ROUTE_FARE, DIJKSTRA, ASTAR, BIDIRECTIONAL, CONTRACTION, ALT
+)
+from app.chatbot_modules.contraction import ContractionHierarchy, register_hierarchy
+from app.chatbot_modules.landmarks import LandmarkSet, register_landmarks
+from app.chatbot_modules.raptor import RaptorPlanner
+from app.chatbot_modules.timetable import Timetable
+
+REPORT_FORMAT_VERSION = 1
+
+# (stops, routes, stops per route) of each synthetic city
+NETWORK_SIZES = {
+    'small': (500, 60, 10),
+    'medium': (4000, 500, 14),
+    'large': (10000, 1500, 16),
+}
+
+# Every engine the report covers: point-to-point searches per metric, then the journey planners
+POINT_TO_POINT = [
+    f'{engine}_{metric}'
+    for metric in (DISTANCE, FARE) for engine in (DIJKSTRA, ASTAR, BIDIRECTIONAL, CONTRACTION, ALT)
+]
+ENGINE_NAMES = POINT_TO_POINT + ['route_fare', 'raptor', 'timetable', 'yen_distance', 'isochrone_distance', 'od_matrix']
+
+# Around central Delhi, where a stop sits every ~300 m on the medium network
+CITY_BOUNDS = ((28.45, 28.80), (76.95, 77.35))
+FARE_SLABS = [10, 15, 20, 25]
+HEADWAYS = [10, 15, 20, 30]
+AVERAGE_SPEED_KMPH = 18
+
+# Expensive engines run on a sample of the queries
+SLOW_ENGINE_SHARE = 0.2
+YEN_ALTERNATIVES = 3
+ISOCHRONE_BUDGET_KM = 5
+DEPARTURE = '08:15'
+
+def synthetic_network(stops, routes, stops_per_route, seed=1):
+    """
+    A random city: stops scattered over CITY_BOUNDS and routes that wander
+    between nearby stops, with slab fares and headways
+    Returns: (route records, stop records, {route_number: headway})
+    """
+    rng = random.Random(seed)
+    names = [f'Stop {i}' for i in range(stops)]
+    (lat_min, lat_max), (lon_min, lon_max) = CITY_BOUNDS
+    points = np.array([(rng.uniform(lat_min, lat_max), rng.uniform(lon_min, lon_max)) for _ in names])
+    tree = cKDTree(points)
+    
+    route_records, stop_records, headways = [], [], {}
+    for route_id in range(1, routes + 1):
+        sequence = [rng.randrange(stops)]
+        heading = rng.uniform(0, 2 * np.pi)
+        while len(sequence) < stops_per_route:
+            # Next stop: a near one roughly ahead, so routes run across town instead of circling
+            ahead = points[sequence[-1]] + 0.01 * np.array([np.sin(heading), np.cos(heading)])
+            _, candidates = tree.query(ahead, k=6)
+            fresh = [int(c) for c in candidates if int(c) not in sequence]
+            if not fresh:
+                break
+            sequence.append(rng.choice(fresh))
+            heading += rng.uniform(-0.4, 0.4)
+        if len(sequence) < 2:
+            continue
+        
+        hops = np.radians(points[sequence])
+        distance = float(np.sum(np.hypot(
+            np.diff(hops[:, 0]), np.diff(hops[:, 1]) * np.cos(hops[:-1, 0])
+        )) * 6371.0)
+        route_number = f'SYN-{route_id}'
+        route_records.append(RouteRecord(
+            route_id, route_number, names[sequence[0]], names[sequence[-1]],
+            round(distance, 2), rng.choice(FARE_SLABS), round(distance / AVERAGE_SPEED_KMPH * 60)
+        ))
+        for order, stop in enumerate(sequence, 1):
+            stop_records.append(StopRecord(
+                route_id, names[stop], order, float(points[stop][0]), float(points[stop][1]), None
+            ))
+        headways[route_number] = rng.choice(HEADWAYS)
+    return route_records, stop_records, headways
+
+def percentiles(samples):
+    """Latency summary in milliseconds"""
+    if not samples:
+        return None
+    values = np.array(samples) * 1000
+    return {
+        'p50': round(float(np.percentile(values, 50)), 3),
+        'p90': round(float(np.percentile(values, 90)), 3),
+        'p99': round(float(np.percentile(values, 99)), 3),
+        'mean': round(float(values.mean()), 3),
+        'max': round(float(values.max()), 3),
+    }
+
+def timed(function):
+    """(result, seconds) of one call"""
+    started = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - started
+
+def peak_memory_mb(function):
+    """Peak Python and NumPy allocation while function runs, in MB"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        return round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+    finally:
+        tracemalloc.stop()
+
+def run_engine(query, pairs, memory_queries):
+    """
+    Latency of query over every pair (timed without tracing), then peak memory
+    over the first memory_queries pairs under tracemalloc
+    """
+    latencies, found = [], 0
+    for source, destination in pairs:
+        result, seconds = timed(lambda: query(source, destination))
+        latencies.append(seconds)
+        found += result is not None
+    return {
+        'queries': len(pairs),
+        'found': found,
+        'latency_ms': percentiles(latencies),
+        'peak_memory_mb': peak_memory_mb(lambda: [query(s, d) for s, d in pairs[:memory_queries]]),
+    }
+
+def point_to_point(graph, metric, engine):
+    """Query for PathfindingAlgorithms.search; None when there is no path"""
+    def query(source, destination):
+        result = PathfindingAlgorithms.search(graph, source, destination, metric, engine=engine)
+        return result if result.path is not None else None
+    return query
+
+def benchmark_network(name, stops, routes, stops_per_route, query_count, seed, selected=ENGINE_NAMES):
+    """
+    Build one synthetic network, preprocess the selected engines and time their
+    queries; contraction preprocessing dominates the run on larger networks
+    """
+    route_records, stop_records, headways = synthetic_network(stops, routes, stops_per_route, seed)
+    build = lambda: TransitGraph(route_records, stop_records, headways=headways)
+    graph, build_seconds = timed(build)
+    report = {
+        'stops': graph.node_count,
+        'routes': len(graph.route_numbers),
+        'edges': graph.edge_count,
+        'walking_edges': int((graph.edge_route == WALK_ROUTE).sum()),
+        'build_seconds': round(build_seconds, 3),
+        'build_peak_memory_mb': peak_memory_mb(build),
+        'preprocessing': {},
+        'engines': {},
+    }
+    print(f"\n{name}: {report['stops']} stops, {report['routes']} routes, {report['edges']} edges "
+          f"(built in {build_seconds:.2f}s)")
+    
+    # Precomputed artifacts, registered so the engines use them instead of rebuilding in the background
+    for metric in (DISTANCE, FARE):
+        if f'{CONTRACTION}_{metric}' in selected:
+            hierarchy, seconds = timed(lambda: ContractionHierarchy.build(graph, metric))
+            register_hierarchy(hierarchy)
+            report['preprocessing'][f'contraction_{metric}'] = {
+                'seconds': round(seconds, 3), 'shortcuts': hierarchy.shortcut_count
+            }
+        if f'{ALT}_{metric}' in selected:
+            landmarks, seconds = timed(lambda: LandmarkSet.build(graph, metric))
+            register_landmarks(landmarks)
+            report['preprocessing'][f'landmarks_{metric}'] = {
+                'seconds': round(seconds, 3), 'landmarks': len(landmarks.landmarks)
+            }
+    if 'raptor' in selected:
+        planner, seconds = timed(lambda: RaptorPlanner(graph))
+        report['preprocessing']['raptor'] = {'seconds': round(seconds, 3)}
+    if 'timetable' in selected:
+        timetable, seconds = timed(lambda: Timetable(graph))
+        report['preprocessing']['timetable'] = {'seconds': round(seconds, 3)}
+    
+    rng = random.Random(seed)
+    pairs = [tuple(graph.node_names[node] for node in rng.sample(range(graph.node_count), 2))
+             for _ in range(query_count)]
+    sample = pairs[:max(1, int(query_count * SLOW_ENGINE_SHARE))]
+    memory_queries = min(20, len(sample))
+    
+    # {engine name: (query returning None when nothing is found, pairs to run)}
+    engines = {}
+    for metric in (DISTANCE, FARE):
+        for engine in (DIJKSTRA, ASTAR, BIDIRECTIONAL, CONTRACTION, ALT):
+            engines[f'{engine}_{metric}'] = (point_to_point(graph, metric, engine), pairs)
+    engines['route_fare'] = (point_to_point(graph, ROUTE_FARE, DIJKSTRA), pairs)
+    engines['raptor'] = (lambda s, d: planner.plan(s, d, DEPARTURE) or None, sample)
+    engines['timetable'] = (lambda s, d: timetable.earliest_arrival(s, d, DEPARTURE), pairs)
+    engines['yen_distance'] = (
+        lambda s, d: PathfindingAlgorithms.yen_k_shortest(graph, s, d, DISTANCE, YEN_ALTERNATIVES) or None, sample
+    )
+    engines['isochrone_distance'] = (
+        lambda s, d: PathfindingAlgorithms.reachable_within(graph, s, ISOCHRONE_BUDGET_KM, DISTANCE) or None, sample
+    )
+    
+    for engine_name, (query, engine_pairs) in engines.items():
+        if engine_name not in selected:
+            continue
+        report['engines'][engine_name] = run_engine(query, engine_pairs, memory_queries)
+        latency = report['engines'][engine_name]['latency_ms']
+        print(f"  {engine_name:<24} p50 {latency['p50']:>9.3f} ms   p99 {latency['p99']:>9.3f} ms   "
+              f"peak {report['engines'][engine_name]['peak_memory_mb']:>7.2f} MB")
+    
+    if 'od_matrix' not in selected:
+        return report
+    
+    # All pairs at once through the batch OD matrix (inline, so the timing is not pool start-up)
+    _, seconds = timed(lambda: PathfindingAlgorithms.od_matrix_for_graph(graph, pairs, processes=1))
+    report['engines']['od_matrix'] = {
+        'queries': len(pairs),
+        'seconds': round(seconds, 3),
+        'peak_memory_mb': peak_memory_mb(lambda: PathfindingAlgorithms.od_matrix_for_graph(graph, pairs, processes=1)),
+    }
+    print(f"  {'od_matrix':<24} {len(pairs)} pairs in {seconds * 1000:.1f} ms")
+    return report
+
+def compare(report, baseline):
+    """Print p50 latency changes against an earlier report"""
+    print("\nChange in p50 latency against the baseline:")
+    for name, network in report['networks'].items():
+        previous = baseline.get('networks', {}).get(name)
+        if not previous:
+            continue
+        for engine, result in network['engines'].items():
+            before = previous['engines'].get(engine, {}).get('latency_ms')
+            after = result.get('latency_ms')
+            if before and after and before['p50']:
+                change = (after['p50'] - before['p50']) / before['p50'] * 100
+                print(f"  {name:<8} {engine:<24} {before['p50']:>9.3f} → {after['p50']:>9.3f} ms ({change:+.1f}%)")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the YatriSetu routing engines on synthetic networks')
+    parser.add_argument('--sizes', nargs='+', choices=list(NETWORK_SIZES), default=list(NETWORK_SIZES))
+    parser.add_argument('--engines', nargs='+', choices=ENGINE_NAMES, default=ENGINE_NAMES)
+    parser.add_argument('--queries', type=int, default=200, help='Random stop pairs per network')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default='pathfinding_benchmark.json', help='JSON report path')
+    parser.add_argument('--baseline', help='Earlier report to compare p50 latencies against')
+    args = parser.parse_args()
+    
+    report = {
+        'format_version': REPORT_FORMAT_VERSION,
+        'generated_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'scipy': scipy.__version__,
+            'machine': platform.machine(),
+        },
+        'queries': args.queries,
+        'seed': args.seed,
+        'networks': {},
+    }
+    for name in args.sizes:
+        report['networks'][name] = benchmark_network(name, *NETWORK_SIZES[name], args.queries, args.seed, args.engines)
+    
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"\n✅ Report written to {args.output}")
+    
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            compare(report, json.load(f))
+
+if __name__ == '__main__':
+    main()
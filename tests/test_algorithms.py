@@ -9,7 +9,8 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 from app import create_app
 from app.chatbot_modules.algorithms import PathfindingAlgorithms
-from app.models.database_models import Route, Stop, Bus
+from app.chatbot_modules.transit_graph import get_transit_graph
+from app.models.database_models import Route, Bus
 
 app = create_app()
 
@@ -134,42 +135,17 @@ def test_graph_structure():
         print(f"\n📊 Database Statistics:")
         print(f"   Total Active Routes: {len(all_routes)}")
         
-        # Build graph
-        graph = {}
-        total_edges = 0
+        # Build the shared graph (two bulk queries)
+        graph = get_transit_graph()
+        total_edges = graph.edge_count
         
-        for route in all_routes:
-            start = route.start_location
-            end = route.end_location
-            
-            if start not in graph:
-                graph[start] = []
-            graph[start].append(end)
-            total_edges += 1
-            
-            # Add stops
-            stops = Stop.query.filter_by(route_id=route.id).order_by(Stop.stop_order).all()
-            prev_stop = start
-            for stop in stops:
-                stop_name = stop.stop_name
-                if prev_stop not in graph:
-                    graph[prev_stop] = []
-                graph[prev_stop].append(stop_name)
-                total_edges += 1
-                prev_stop = stop_name
-            
-            if stops and prev_stop != end:
-                if prev_stop not in graph:
-                    graph[prev_stop] = []
-                graph[prev_stop].append(end)
-                total_edges += 1
-        
-        print(f"   Total Nodes (Locations): {len(graph)}")
+        print(f"   Graph Version: {graph.version}")
+        print(f"   Total Nodes (Locations): {graph.node_count}")
         print(f"   Total Edges (Connections): {total_edges}")
-        print(f"   Average Degree: {total_edges / len(graph):.2f}")
+        print(f"   Average Degree: {total_edges / graph.node_count:.2f}")
         
         # Find most connected nodes
-        node_degrees = [(node, len(neighbors)) for node, neighbors in graph.items()]
+        node_degrees = list(zip(graph.node_names, graph.out_degree().tolist()))
         node_degrees.sort(key=lambda x: x[1], reverse=True)
         
         print(f"\n   Top 5 Most Connected Locations:")
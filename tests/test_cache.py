@@ -0,0 +1,79 @@
+"""
+Tests for the LRU cache used in front of routing and location lookups
+"""
+
+import sys
+import os
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Load the models package first so the chatbot modules import cleanly
+import app.models  # noqa: F401
+from app.chatbot_modules.cache import LRUCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+class TestLRUCache:
+    """Eviction, expiry and counters"""
+    
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        assert cache.get('a') == 1
+        cache.put('c', 3)
+        assert cache.get('b') is None
+        assert cache.get('a') == 1 and cache.get('c') == 3
+        assert cache.stats()['evictions'] == 1
+    
+    def test_entries_expire(self):
+        clock = FakeClock()
+        cache = LRUCache(maxsize=4, ttl=10, clock=clock)
+        cache.put('a', 1)
+        clock.now = 9.9
+        assert cache.get('a') == 1
+        clock.now = 10.0
+        assert cache.get('a') is None
+        assert len(cache) == 0
+    
+    def test_counters(self):
+        cache = LRUCache()
+        cache.put('a', 1)
+        cache.get('a')
+        cache.get('b')
+        stats = cache.stats()
+        assert (stats['hits'], stats['misses'], stats['hit_rate']) == (1, 1, 0.5)
+    
+    def test_version_change_clears(self):
+        cache = LRUCache()
+        cache.sync_version(1)
+        cache.put('a', 1)
+        cache.sync_version(1)
+        assert cache.get('a') == 1
+        cache.sync_version(2)
+        assert cache.get('a') is None
+        assert cache.version == 2
+    
+    def test_selective_version_change(self):
+        cache = LRUCache()
+        cache.sync_version(1)
+        for key in range(5):
+            cache.put(key, key * 10)
+        cache.sync_version(2, lambda key, value: value >= 30)
+        assert len(cache) == 3 and cache.get(4) is None and cache.get(2) == 20
+    
+    def test_put_for_an_older_version_is_dropped(self):
+        cache = LRUCache()
+        cache.sync_version(1)
+        assert cache.put('a', 1, version=1)
+        cache.sync_version(2)
+        assert not cache.put('b', 2, version=1)
+        assert cache.get('b') is None and len(cache) == 0
@@ -0,0 +1,178 @@
+"""
+Tests for the contraction hierarchy engine
+Runs on hand-built records, no database required
+"""
+
+import pytest
+import random
+import sys
+import os
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Load the models package first so the chatbot modules import cleanly
+import app.models  # noqa: F401
+from app.chatbot_modules.transit_graph import TransitGraph, RouteRecord, StopRecord
+from app.chatbot_modules import contraction
+from app.chatbot_modules.contraction import (
+    ContractionHierarchy, register_hierarchy, get_contraction_hierarchy, load_hierarchy_artifact, hierarchy_artifact_path
+)
+from app.chatbot_modules.algorithms import PathfindingAlgorithms, DISTANCE, FARE, CONTRACTION
+from app.chatbot_modules import artifact_builder
+from flask import Flask, current_app
+
+
+def random_network(stop_count=120, route_count=40, seed=7):
+    """Random routes over a pool of stops, with varied distances and fares"""
+    rng = random.Random(seed)
+    names = [f'Stop {i}' for i in range(stop_count)]
+    routes, stops = [], []
+    for route_id in range(1, route_count + 1):
+        served = rng.sample(names, rng.randint(3, 9))
+        routes.append(RouteRecord(route_id, f'R{route_id}', served[0], served[-1],
+                                  rng.uniform(5, 30), rng.choice([10, 15, 20, 25]), None))
+        for order, name in enumerate(served[1:-1], 1):
+            stops.append(StopRecord(route_id, name, order, None, None, None))
+    return TransitGraph(routes, stops)
+
+
+@pytest.fixture(scope='module')
+def graph():
+    return random_network()
+
+
+@pytest.fixture(scope='module')
+def hierarchy(graph):
+    return ContractionHierarchy.build(graph)
+
+
+class TestContractionHierarchy:
+    """Preprocessing and queries"""
+    
+    def test_matches_dijkstra(self, graph, hierarchy):
+        rng = random.Random(1)
+        for _ in range(150):
+            source, target = rng.sample(range(graph.node_count), 2)
+            expected = PathfindingAlgorithms.search(graph, graph.node_names[source], graph.node_names[target], DISTANCE)
+            cost, edges, _ = hierarchy.query(source, target)
+            if expected.cost is None:
+                assert edges is None
+            else:
+                assert cost == pytest.approx(expected.cost)
+    
+    def test_unpacked_path_is_connected(self, graph, hierarchy):
+        cost, edges, _ = hierarchy.query(0, graph.node_count - 1)
+        if edges is None:
+            pytest.skip('pair not connected in this network')
+        assert graph.sources[edges[0]] == 0
+        assert graph.targets[edges[-1]] == graph.node_count - 1
+        for first, second in zip(edges, edges[1:]):
+            assert graph.targets[first] == graph.sources[second]
+        assert sum(graph.distance[edge] for edge in edges) == pytest.approx(cost)
+    
+    def test_save_and_load(self, hierarchy, tmp_path):
+        path = str(tmp_path / 'hierarchy.npz')
+        hierarchy.save(path)
+        loaded = ContractionHierarchy.load(path)
+        assert loaded.fingerprint == hierarchy.fingerprint
+        assert loaded.metric == 'distance'
+        assert loaded.query(3, 40)[0] == hierarchy.query(3, 40)[0]
+    
+    def test_fingerprint_ties_hierarchy_to_graph(self, graph, hierarchy):
+        register_hierarchy(hierarchy)
+        assert get_contraction_hierarchy(graph) is hierarchy
+        assert hierarchy.fingerprint != random_network(seed=8).fingerprint
+    
+    def test_stale_hierarchy_is_not_rebuilt(self, graph, hierarchy, tmp_path, monkeypatch):
+        monkeypatch.setattr(contraction, '_hierarchies', {})
+        monkeypatch.setattr(contraction, '_artifact_paths', {})
+        monkeypatch.setattr(contraction, '_artifact_mtimes', {})
+        monkeypatch.setattr(ContractionHierarchy, 'build', lambda *args: pytest.fail('contracted in process'))
+        requested = []
+        monkeypatch.setattr(contraction, 'request_artifact_rebuild', requested.append)
+        path = hierarchy_artifact_path(str(tmp_path / 'ch_{metric}.npz'), 'distance')
+        assert path.endswith('ch_distance.npz')
+        
+        # No artifact yet: callers fall back to bidirectional search while the builder runs
+        assert load_hierarchy_artifact(path) is None
+        assert get_contraction_hierarchy(graph) is None
+        assert requested == [graph.fingerprint]
+        source, target = graph.node_names[5], graph.node_names[60]
+        expected = PathfindingAlgorithms.search(graph, source, target, DISTANCE)
+        assert PathfindingAlgorithms.search(graph, source, target, DISTANCE, engine=CONTRACTION).cost == expected.cost
+        
+        # The offline build writes the artifact: it is picked up without a restart
+        hierarchy.save(path)
+        assert get_contraction_hierarchy(graph).fingerprint == graph.fingerprint
+        assert get_contraction_hierarchy(random_network(seed=8)) is None
+    
+    def test_artifacts_per_metric(self, graph, tmp_path, monkeypatch):
+        monkeypatch.setattr(contraction, '_hierarchies', {})
+        monkeypatch.setattr(contraction, '_artifact_paths', {})
+        monkeypatch.setattr(contraction, '_artifact_mtimes', {})
+        template = str(tmp_path / 'ch_{metric}.npz')
+        ContractionHierarchy.build(graph, FARE).save(hierarchy_artifact_path(template, FARE))
+        assert load_hierarchy_artifact(hierarchy_artifact_path(template, DISTANCE), DISTANCE) is None
+        assert load_hierarchy_artifact(hierarchy_artifact_path(template, FARE), FARE).metric == FARE
+        assert sorted(os.listdir(tmp_path)) == ['ch_fare.npz']
+    
+    def test_search_engine(self, graph, hierarchy):
+        register_hierarchy(hierarchy)
+        source, target = graph.node_names[5], graph.node_names[60]
+        expected = PathfindingAlgorithms.search(graph, source, target, DISTANCE)
+        result = PathfindingAlgorithms.search(graph, source, target, DISTANCE, engine=CONTRACTION)
+        assert (result.cost is None and expected.cost is None) or result.cost == pytest.approx(expected.cost)
+    
+    def test_fare_metric(self, graph):
+        fares = ContractionHierarchy.build(graph, FARE)
+        expected = PathfindingAlgorithms.search(graph, graph.node_names[2], graph.node_names[90], FARE)
+        cost, _, _ = fares.query(2, 90)
+        assert (cost is None and expected.cost is None) or cost == pytest.approx(expected.cost)
+
+
+class TestArtifactRebuild:
+    """One builder process per stale graph, and none while another holds the lock"""
+    
+    @pytest.fixture
+    def started(self, tmp_path, monkeypatch):
+        if artifact_builder.fcntl is None:
+            pytest.skip('file locks unavailable')
+        started = []
+        
+        class FakeBuilder:
+            def __init__(self, args, **kwargs):
+                started.append(args)
+            
+            def wait(self):
+                return 0
+        
+        monkeypatch.setattr(artifact_builder.subprocess, 'Popen', FakeBuilder)
+        monkeypatch.setattr(artifact_builder, '_requested', set())
+        flask_app = Flask(__name__)
+        flask_app.config.update(
+            ROUTING_ARTIFACT_REBUILD=True, ROUTING_ARTIFACT_LOCK_PATH=str(tmp_path / 'artifacts.lock')
+        )
+        with flask_app.app_context():
+            yield started
+    
+    def test_once_per_graph(self, started):
+        assert artifact_builder.request_artifact_rebuild('graph-a') is True
+        assert artifact_builder.request_artifact_rebuild('graph-a') is False
+        assert artifact_builder.request_artifact_rebuild('graph-b') is True
+        assert [args[-1] for args in started] == ['refresh', 'refresh']
+    
+    def test_not_while_a_builder_runs(self, started, tmp_path):
+        with open(tmp_path / 'artifacts.lock', 'a') as lock_file:
+            assert artifact_builder.try_lock(lock_file)
+            assert artifact_builder.request_artifact_rebuild() is False
+        assert artifact_builder.request_artifact_rebuild() is True
+        assert len(started) == 1
+    
+    def test_disabled(self, started):
+        current_app.config['ROUTING_ARTIFACT_REBUILD'] = False
+        assert artifact_builder.request_artifact_rebuild('graph-a') is False
+        assert started == []
+    
+    def test_needs_an_app(self):
+        assert artifact_builder.request_artifact_rebuild('graph-a') is False
@@ -0,0 +1,345 @@
+"""
+Tests for incremental route updates of the shared transit graph
+Graph tests use hand-built records; the listener tests run on in-memory SQLite
+"""
+
+import pytest
+import numpy as np
+import sys
+import os
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Load the models package first so the chatbot modules import cleanly
+import app.models  # noqa: F401
+from sqlalchemy import text
+from app import create_app, db
+from app.models.database_models import Route, Stop
+from app.chatbot_modules import algorithms, transit_graph
+from app.chatbot_modules.transit_graph import TransitGraph
+from app.chatbot_modules.algorithms import PathfindingAlgorithms, DISTANCE, FARE
+from config import Config
+from tests.test_transit_graph import make_route, make_stop, grid_network
+
+
+def network_records():
+    routes = [
+        make_route(1, 'Connaught Place', 'Kashmere Gate', 6, 20),
+        make_route(2, 'Kashmere Gate', 'Azadpur', 9, 15),
+        make_route(3, 'Connaught Place', 'Azadpur', 20, 50),
+    ]
+    stops = [
+        make_stop(1, 'Connaught Place', 1, 28.63, 77.21),
+        make_stop(1, 'Chandni Chowk', 2, 28.65, 77.23),
+        make_stop(1, 'Kashmere Gate', 3, 28.66, 77.22),
+        make_stop(2, 'Model Town', 1, 28.70, 77.19),
+    ]
+    return routes, stops
+
+
+def all_costs(graph, metric=DISTANCE):
+    names = sorted(graph.node_names)
+    return {(a, b): PathfindingAlgorithms.search(graph, a, b, metric).cost for a in names for b in names}
+
+
+class TestWithRoute:
+    """Copy-on-write route patches"""
+    
+    def test_remove_matches_rebuild(self):
+        routes, stops = network_records()
+        graph = TransitGraph(routes, stops, version=1)
+        patched = graph.with_route(2)
+        rebuilt = TransitGraph(routes[:1] + routes[2:], stops)
+        assert patched.edge_count == rebuilt.edge_count
+        for pair, cost in all_costs(rebuilt).items():
+            assert all_costs(patched)[pair] == cost
+    
+    def test_add_matches_rebuild(self):
+        routes, stops = network_records()
+        graph = TransitGraph(routes[:2], stops[:3])
+        patched = graph.with_route(3, routes[2], [])
+        patched = patched.with_route(2, routes[1], stops[3:])
+        rebuilt = TransitGraph(routes, stops)
+        for metric in (DISTANCE, FARE):
+            assert all_costs(patched, metric) == all_costs(rebuilt, metric)
+        assert patched.route_pattern(patched.route_index[3]).tolist() == [
+            patched.node_ids['Connaught Place'], patched.node_ids['Azadpur']
+        ]
+    
+    def test_original_graph_untouched(self):
+        routes, stops = network_records()
+        graph = TransitGraph(routes, stops, version=1)
+        before = all_costs(graph)
+        graph.with_route(1)
+        graph.with_route(4, make_route(4, 'Connaught Place', 'Rohini', 5, 5), [])
+        assert all_costs(graph) == before
+        assert 'Rohini' not in graph
+    
+    def test_reweight_with_same_stops(self):
+        graph = grid_network(size=6)
+        route = make_route(1, 'G0-0', 'G0-5', 30, 10)
+        stops = [make_stop(1, f'G0-{col}', col + 1, 28.5, 77.1 + col * 0.01) for col in range(6)]
+        patched = graph.with_route(1, route, stops)
+        assert patched.history[-1][2] is True   # same stops, longer: only costlier
+        # Row 0 now costs 6 km a hop, so detour through row 1
+        assert PathfindingAlgorithms.search(patched, 'G0-0', 'G0-5', DISTANCE).cost == pytest.approx(7 * 1.2)
+        assert PathfindingAlgorithms.search(patched, 'G0-0', 'G5-0', DISTANCE).cost == pytest.approx(6)
+    
+    def test_coordinates_follow_stops(self):
+        routes, stops = network_records()
+        graph = TransitGraph(routes, stops)
+        patched = graph.with_route(1)
+        assert 'Chandni Chowk' not in patched
+        assert patched.node_lat[patched.node_ids['Model Town']] == pytest.approx(28.70)
+    
+    def test_history(self):
+        routes, stops = network_records()
+        graph = TransitGraph(routes, stops, version=1)
+        removed = graph.with_route(3)
+        cheaper = removed.with_route(1, make_route(1, 'Connaught Place', 'Kashmere Gate', 5, 20), stops[:3])
+        assert (removed.version, cheaper.version) == (2, 3)
+        assert cheaper.changes_since(1) == [(3, True), (1, False)]
+        assert cheaper.changes_since(2) == [(1, False)]
+        assert cheaper.changes_since(0) is None
+        assert graph.fingerprint != removed.fingerprint
+    
+    def test_layout_matches_rebuild(self):
+        routes, stops = network_records()
+        graph = TransitGraph(routes, stops)
+        patched = graph.with_route(2).with_route(4, make_route(4, 'Azadpur', 'Rohini', 5, 5), [])
+        patched = patched.with_route(2, routes[1], stops[3:])
+        rebuilt = TransitGraph(routes + [make_route(4, 'Azadpur', 'Rohini', 5, 5)], stops)
+        assert patched.node_names == rebuilt.node_names
+        assert patched.route_ids.tolist() == rebuilt.route_ids.tolist()
+        assert patched.fingerprint == rebuilt.fingerprint
+        assert TransitGraph(routes[:1], stops).fingerprint == graph.with_route(3).with_route(2).fingerprint
+    
+    def test_patch_keeps_signature(self):
+        routes, stops = network_records()
+        graph = TransitGraph(routes, stops, signature=('tables', 1))
+        assert graph.with_route(2).signature == ('tables', 1)
+
+
+class TestCacheInvalidation:
+    """Only cache entries that ride a changed route are dropped"""
+    
+    @pytest.fixture(autouse=True)
+    def fresh_cache(self, monkeypatch):
+        monkeypatch.setattr(algorithms, '_path_cache', None)
+    
+    def test_removal_drops_dependent_entries(self):
+        routes, stops = network_records()
+        graph = TransitGraph(routes, stops, version=1)
+        PathfindingAlgorithms.cached_search(graph, 'Connaught Place', 'Azadpur', DISTANCE)     # rides 1 and 2
+        PathfindingAlgorithms.cached_search(graph, 'Connaught Place', 'Chandni Chowk', DISTANCE)  # rides 1
+        PathfindingAlgorithms.cached_search(graph, 'Kashmere Gate', 'Azadpur', DISTANCE)       # rides 2
+        
+        patched = graph.with_route(1)
+        result = PathfindingAlgorithms.cached_search(patched, 'Connaught Place', 'Azadpur', DISTANCE)
+        assert result.cost == pytest.approx(20)
+        stats = PathfindingAlgorithms.cache_stats()
+        assert stats['version'] == 2 and stats['size'] == 2
+        assert PathfindingAlgorithms.cached_search(patched, 'Kashmere Gate', 'Azadpur', DISTANCE).cost == pytest.approx(9)
+        assert PathfindingAlgorithms.cache_stats()['hits'] == 1
+    
+    def test_new_route_drops_everything(self):
+        routes, stops = network_records()
+        graph = TransitGraph(routes, stops, version=1)
+        PathfindingAlgorithms.cached_search(graph, 'Connaught Place', 'Azadpur', DISTANCE)
+        patched = graph.with_route(4, make_route(4, 'Connaught Place', 'Azadpur', 3, 5), [])
+        assert PathfindingAlgorithms.cached_search(patched, 'Connaught Place', 'Azadpur', DISTANCE).cost == pytest.approx(3)
+    
+    def test_older_graph_bypasses_cache(self):
+        routes, stops = network_records()
+        graph = TransitGraph(routes, stops, version=1)
+        patched = graph.with_route(1)
+        PathfindingAlgorithms.cached_search(patched, 'Connaught Place', 'Azadpur', DISTANCE)
+        assert PathfindingAlgorithms.cached_search(graph, 'Connaught Place', 'Azadpur', DISTANCE).cost == pytest.approx(15)
+        assert PathfindingAlgorithms.cache_stats()['size'] == 1
+    
+    def test_patch_during_search_is_not_cached(self, monkeypatch):
+        routes, stops = network_records()
+        graph = TransitGraph(routes, stops, version=1)
+        patched = graph.with_route(2)
+        search = PathfindingAlgorithms._search
+        
+        def search_then_patch(*args):
+            # Another request moves the cache to the patched graph meanwhile
+            found = search(*args)
+            algorithms._sync_path_cache(algorithms.get_path_cache(), patched)
+            return found
+        
+        monkeypatch.setattr(PathfindingAlgorithms, '_search', search_then_patch)
+        assert PathfindingAlgorithms.cached_search(graph, 'Connaught Place', 'Azadpur', DISTANCE).cost == pytest.approx(15)
+        monkeypatch.setattr(PathfindingAlgorithms, '_search', search)
+        assert PathfindingAlgorithms.cached_search(patched, 'Connaught Place', 'Azadpur', DISTANCE).cost == pytest.approx(20)
+
+
+class TestSnapshot:
+    """Binary snapshots mapped back into a graph"""
+    
+    def test_round_trip(self, tmp_path):
+        graph = grid_network(size=5)
+        graph.headways = {'R1': 12.0}
+        path = str(tmp_path / 'graph.snapshot')
+        graph.save_snapshot(path)
+        loaded = TransitGraph.load_snapshot(path, version=4)
+        
+        for name in TransitGraph.SNAPSHOT_ARRAYS:
+            assert np.array_equal(getattr(loaded, name), getattr(graph, name), equal_nan=True)
+        assert loaded.node_names == graph.node_names and loaded.route_numbers == graph.route_numbers
+        assert loaded.headways == {'R1': 12.0} and loaded.version == 4
+        assert loaded.fingerprint == graph.fingerprint
+        assert all_costs(loaded) == all_costs(graph)
+    
+    def test_arrays_are_shared_read_only(self, tmp_path):
+        path = str(tmp_path / 'graph.snapshot')
+        grid_network(size=4).save_snapshot(path)
+        loaded = TransitGraph.load_snapshot(path)
+        assert not loaded.distance.flags.writeable
+        assert isinstance(loaded.distance.base, np.memmap)
+    
+    def test_loaded_graph_accepts_patches(self, tmp_path):
+        routes, stops = network_records()
+        path = str(tmp_path / 'graph.snapshot')
+        TransitGraph(routes, stops).save_snapshot(path)
+        patched = TransitGraph.load_snapshot(path, version=1).with_route(2)
+        patched_costs = all_costs(patched)
+        for pair, cost in all_costs(TransitGraph(routes[:1] + routes[2:], stops)).items():
+            assert patched_costs[pair] == cost
+    
+    def test_rejects_other_files(self, tmp_path):
+        path = tmp_path / 'graph.snapshot'
+        path.write_bytes(b'not a snapshot at all')
+        with pytest.raises(ValueError):
+            TransitGraph.load_snapshot(str(path))
+    
+    def test_create_app_maps_snapshot(self, tmp_path, monkeypatch):
+        routes, stops = network_records()
+        path = str(tmp_path / 'graph.snapshot')
+        TransitGraph(routes, stops).save_snapshot(path)
+        monkeypatch.setattr(transit_graph, '_graph', None)
+        
+        class SnapshotConfig(SQLiteConfig):
+            NETWORK_SNAPSHOT_PATH = path
+        create_app(SnapshotConfig)
+        assert 'Model Town' in transit_graph._graph
+
+
+class SQLiteConfig(Config):
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    SQLALCHEMY_ECHO = False
+    TESTING = True
+    NETWORK_SNAPSHOT_PATH = None
+    LANDMARKS_PATH = None
+    CONTRACTION_HIERARCHY_PATH = None
+    ROUTING_ARTIFACT_REBUILD = False
+
+
+@pytest.fixture
+def flask_app(monkeypatch):
+    monkeypatch.setattr(transit_graph, '_graph', None)
+    monkeypatch.setattr(transit_graph, '_pending_routes', set())
+    flask_app = create_app(SQLiteConfig)
+    with flask_app.app_context():
+        db.create_all()
+        db.session.add_all([
+            Route(id=1, route_number='101', route_name='CP - KG', start_location='Connaught Place',
+                  end_location='Kashmere Gate', distance_km=6, fare=20, is_active=True),
+            Route(id=2, route_number='102', route_name='KG - AZ', start_location='Kashmere Gate',
+                  end_location='Azadpur', distance_km=9, fare=15, is_active=True),
+            Stop(route_id=1, stop_name='Chandni Chowk', stop_order=1),
+        ])
+        db.session.commit()
+        yield flask_app
+        db.session.remove()
+        db.drop_all()
+
+
+class TestRouteListeners:
+    """ORM edits patch the shared graph instead of rebuilding it"""
+    
+    def test_deactivating_a_route_patches_graph(self, flask_app):
+        graph = transit_graph.get_transit_graph()
+        assert PathfindingAlgorithms.search(graph, 'Connaught Place', 'Azadpur', DISTANCE).cost == pytest.approx(15)
+        
+        db.session.get(Route, 2).is_active = False
+        db.session.commit()
+        patched = transit_graph.get_transit_graph()
+        assert patched.version == graph.version + 1
+        assert patched.changes_since(graph.version) == [(2, True)]
+        assert PathfindingAlgorithms.search(patched, 'Connaught Place', 'Azadpur', DISTANCE).path is None
+    
+    def test_next_check_rebuilds_patched_graph(self, flask_app, monkeypatch):
+        transit_graph.get_transit_graph()
+        db.session.get(Route, 2).is_active = False
+        db.session.commit()
+        patched = transit_graph.get_transit_graph()
+        monkeypatch.setattr(transit_graph, '_last_check', 0.0)
+        rebuilt = transit_graph.get_transit_graph()
+        assert rebuilt is not patched
+        assert rebuilt.fingerprint == patched.fingerprint
+    
+    def test_stop_edit_patches_its_route(self, flask_app):
+        graph = transit_graph.get_transit_graph()
+        db.session.add(Stop(route_id=2, stop_name='Model Town', stop_order=1))
+        db.session.commit()
+        patched = transit_graph.get_transit_graph()
+        assert patched.changes_since(graph.version) == [(2, False)]
+        assert 'Model Town' in patched
+    
+    def test_unrelated_edit_is_ignored(self, flask_app):
+        graph = transit_graph.get_transit_graph()
+        db.session.get(Route, 1).route_name = 'Renamed'
+        db.session.commit()
+        assert transit_graph.get_transit_graph() is graph
+    
+    def test_rollback_discards_changes(self, flask_app):
+        graph = transit_graph.get_transit_graph()
+        db.session.get(Route, 1).fare = 99
+        db.session.flush()
+        db.session.rollback()
+        assert transit_graph.get_transit_graph() is graph
+    
+    def test_in_place_table_edits_rebuild(self, flask_app, monkeypatch):
+        # Raw SQL (database/fix_fares.sql, stop fixes) bypasses the ORM listeners
+        statements = [
+            "UPDATE routes SET fare = 30 WHERE id = 1",
+            "UPDATE stops SET stop_order = 2 WHERE stop_name = 'Chandni Chowk'",
+            "UPDATE stops SET latitude = 28.65, longitude = 77.23",
+            "UPDATE stops SET stop_name = 'Chandni Chowk Metro'",
+            "UPDATE stops SET stop_name = 'Chandni Chowk Metra'",
+            "UPDATE stops SET estimated_arrival_time = '08:15'",
+            "UPDATE routes SET end_location = 'Azadpur Depot' WHERE id = 2",
+            "UPDATE routes SET route_number = '102A' WHERE id = 2",
+        ]
+        signature = transit_graph.route_data_signature()
+        for statement in statements:
+            graph = transit_graph.get_transit_graph()
+            db.session.execute(text(statement))
+            db.session.commit()
+            assert transit_graph.route_data_signature() != signature
+            signature = transit_graph.route_data_signature()
+            monkeypatch.setattr(transit_graph, '_last_check', 0.0)
+            assert transit_graph.get_transit_graph() is not graph
+        assert 'Chandni Chowk Metra' in transit_graph.get_transit_graph()
+    
+    def test_current_snapshot_skips_rebuild(self, flask_app, tmp_path):
+        path = str(tmp_path / 'graph.snapshot')
+        transit_graph.get_transit_graph().save_snapshot(path)
+        loaded = transit_graph.load_graph_snapshot(path)
+        assert transit_graph.get_transit_graph() is loaded
+        
+        db.session.add(Route(id=3, route_number='103', route_name='New', start_location='Azadpur',
+                             end_location='Rohini', distance_km=4, fare=10, is_active=True))
+        db.session.commit()
+        transit_graph.load_graph_snapshot(path)   # now older than the tables
+        transit_graph._pending_routes.clear()     # as in a freshly started worker
+        assert 'Rohini' in transit_graph.get_transit_graph()
+    
+    def test_admin_toggle_patches_graph(self, flask_app):
+        graph = transit_graph.get_transit_graph()
+        response = flask_app.test_client().post('/admin/api/routes/1/toggle')
+        assert response.get_json()['is_active'] is False
+        assert transit_graph.get_transit_graph().changes_since(graph.version) == [(1, True)]
@@ -0,0 +1,93 @@
+"""
+Tests for the ALT landmark engine
+Runs on hand-built records, no database required
+"""
+
+import pytest
+import random
+import sys
+import os
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Load the models package first so the chatbot modules import cleanly
+import app.models  # noqa: F401
+from app.chatbot_modules import landmarks
+from app.chatbot_modules.landmarks import (
+    LandmarkSet, register_landmarks, get_landmarks, load_landmark_artifact, landmark_artifact_path
+)
+from app.chatbot_modules.algorithms import PathfindingAlgorithms, DISTANCE, FARE, ALT
+from tests.test_contraction import random_network
+
+
+@pytest.fixture(scope='module')
+def graph():
+    return random_network()
+
+
+@pytest.fixture(scope='module')
+def distance_landmarks(graph):
+    return LandmarkSet.build(graph, DISTANCE, count=6)
+
+
+class TestLandmarks:
+    """Landmark selection, bounds and queries"""
+    
+    def test_landmarks_are_distinct(self, distance_landmarks):
+        assert len(set(distance_landmarks.landmarks.tolist())) == 6
+    
+    def test_bounds_are_admissible(self, graph, distance_landmarks):
+        rng = random.Random(2)
+        for target in rng.sample(range(graph.node_count), 10):
+            bounds = distance_landmarks.lower_bounds(target)
+            assert bounds[target] == 0
+            for source in rng.sample(range(graph.node_count), 20):
+                result = PathfindingAlgorithms.search(
+                    graph, graph.node_names[source], graph.node_names[target], DISTANCE
+                )
+                if result.cost is not None:
+                    assert bounds[source] <= result.cost + 1e-9
+    
+    @pytest.mark.parametrize('metric', [DISTANCE, FARE])
+    def test_matches_dijkstra(self, graph, metric):
+        register_landmarks(LandmarkSet.build(graph, metric))
+        rng = random.Random(1)
+        for _ in range(100):
+            source, target = (graph.node_names[node] for node in rng.sample(range(graph.node_count), 2))
+            expected = PathfindingAlgorithms.search(graph, source, target, metric)
+            result = PathfindingAlgorithms.search(graph, source, target, metric, engine=ALT)
+            if expected.cost is None:
+                assert result.cost is None
+            else:
+                assert result.cost == pytest.approx(expected.cost)
+                assert result.expanded <= expected.expanded
+    
+    def test_save_and_load(self, distance_landmarks, tmp_path):
+        path = str(tmp_path / 'landmarks.npz')
+        distance_landmarks.save(path)
+        loaded = LandmarkSet.load(path)
+        assert loaded.metric == DISTANCE and loaded.fingerprint == distance_landmarks.fingerprint
+        assert loaded.lower_bounds(7) == distance_landmarks.lower_bounds(7)
+    
+    def test_stale_landmarks_are_not_rebuilt(self, graph, distance_landmarks, tmp_path, monkeypatch):
+        monkeypatch.setattr(landmarks, '_landmark_sets', {})
+        monkeypatch.setattr(landmarks, '_artifact_paths', {})
+        monkeypatch.setattr(landmarks, '_artifact_mtimes', {})
+        monkeypatch.setattr(LandmarkSet, 'build', lambda *args: pytest.fail('rebuilt in process'))
+        requested = []
+        monkeypatch.setattr(landmarks, 'request_artifact_rebuild', requested.append)
+        path = landmark_artifact_path(str(tmp_path / 'landmarks_{metric}.npz'), DISTANCE)
+        assert load_landmark_artifact(path) is None
+        
+        # The search still answers, on great-circle bounds, while the builder runs
+        assert get_landmarks(graph) is None
+        assert requested == [graph.fingerprint]
+        source, target = graph.node_names[3], graph.node_names[50]
+        expected = PathfindingAlgorithms.search(graph, source, target, DISTANCE)
+        assert PathfindingAlgorithms.search(graph, source, target, DISTANCE, engine=ALT).cost == expected.cost
+        
+        # The builder's artifact is picked up without a restart
+        distance_landmarks.save(path)
+        assert get_landmarks(graph).fingerprint == graph.fingerprint
+        assert get_landmarks(random_network(seed=8)) is None
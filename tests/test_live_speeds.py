@@ -0,0 +1,102 @@
+"""
+Tests for live-speed travel times and the fastest-right-now search
+Graph tests use hand-built records; the refresh test runs on in-memory SQLite
+"""
+
+import pytest
+import sys
+import os
+from datetime import datetime, timedelta
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Load the models package first so the chatbot modules import cleanly
+import app.models  # noqa: F401
+from app import db
+from app.models.database_models import Bus, Route, LiveBusLocation
+from app.chatbot_modules.transit_graph import TransitGraph, RouteRecord
+from app.chatbot_modules.live_speeds import LiveSpeedTable
+from app.chatbot_modules.algorithms import PathfindingAlgorithms
+from tests.test_graph_updates import flask_app  # noqa: F401
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def graph():
+    """A short route scheduled slow and a longer one scheduled quick"""
+    routes = [
+        RouteRecord(1, 'SHORT', 'Azadpur', 'Saket', 10, 20, 60),
+        RouteRecord(2, 'LONG', 'Azadpur', 'Saket', 15, 20, 30),
+    ]
+    return TransitGraph(routes, [])
+
+
+class TestLiveSpeedTable:
+    """Edge weights from live speeds"""
+    
+    def test_scheduled_without_live_data(self, graph):
+        minutes, live_routes = LiveSpeedTable().edge_minutes(graph)
+        assert sorted(minutes.tolist()) == [30, 60] and live_routes == 0
+    
+    def test_live_speed_overrides_schedule(self, graph):
+        table = LiveSpeedTable()
+        table.update({1: 30.0})
+        minutes, live_routes = table.edge_minutes(graph)
+        assert minutes[graph.edge_route == 0].tolist() == [pytest.approx(20)]
+        assert live_routes == 1
+    
+    def test_stale_table_is_ignored(self, graph):
+        clock = FakeClock()
+        table = LiveSpeedTable(max_age_seconds=60, clock=clock)
+        table.update({1: 30.0})
+        clock.now = 61
+        assert table.edge_minutes(graph)[1] == 0
+    
+    def test_weights_reused_until_update(self, graph):
+        table = LiveSpeedTable()
+        table.update({1: 30.0})
+        first, _ = table.edge_minutes(graph)
+        assert table.edge_minutes(graph)[0] is first
+        table.update({1: 10.0})
+        assert table.edge_minutes(graph)[0] is not first
+    
+    def test_fastest_follows_traffic(self, graph):
+        table = LiveSpeedTable()
+        itinerary = PathfindingAlgorithms.timed_path(graph, 'Azadpur', 'Saket', table.edge_minutes(graph)[0])
+        assert itinerary['legs'][0]['route_number'] == 'LONG'
+        table.update({1: 40.0, 2: 10.0})
+        itinerary = PathfindingAlgorithms.timed_path(graph, 'Azadpur', 'Saket', table.edge_minutes(graph)[0])
+        assert itinerary['legs'][0]['route_number'] == 'SHORT' and itinerary['minutes'] == 15
+
+
+class TestRefresh:
+    """Aggregating LiveBusLocation rows"""
+    
+    def test_averages_recent_moving_buses(self, flask_app):
+        now = datetime.utcnow()
+        db.session.add_all([
+            Bus(id=1, bus_number='DL1', registration_number='R1', capacity=40),
+            Bus(id=2, bus_number='DL2', registration_number='R2', capacity=40),
+        ])
+        db.session.get(Route, 1).bus_id = 1
+        db.session.get(Route, 2).bus_id = 2
+        db.session.add_all([
+            LiveBusLocation(bus_id=1, latitude=28.6, longitude=77.2, speed=20, last_updated=now),
+            LiveBusLocation(bus_id=1, latitude=28.6, longitude=77.2, speed=30, last_updated=now),
+            LiveBusLocation(bus_id=1, latitude=28.6, longitude=77.2, speed=0, last_updated=now),   # at a stop
+            LiveBusLocation(bus_id=2, latitude=28.7, longitude=77.1, speed=50,
+                            last_updated=now - timedelta(hours=1)),                               # stale
+        ])
+        db.session.commit()
+        
+        table = LiveSpeedTable()
+        table.refresh()
+        assert table.current_speeds() == ({1: pytest.approx(25)}, 1)
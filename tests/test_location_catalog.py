@@ -0,0 +1,103 @@
+"""
+Tests for the shared location catalogue
+Runs on in-memory SQLite; the shared file goes to a temporary directory
+"""
+
+import pytest
+import sys
+import os
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Load the models package first so the chatbot modules import cleanly
+import app.models  # noqa: F401
+from app import create_app, db
+from app.models.database_models import Route, Stop
+from app.chatbot_modules import location_catalog
+from app.chatbot_modules.location_catalog import LocationCatalog, get_location_catalog
+from app.chatbot_modules.location_handler import LocationHandler
+from tests.test_graph_updates import SQLiteConfig
+
+
+@pytest.fixture
+def catalog_app(monkeypatch):
+    monkeypatch.setattr(location_catalog, '_catalog', None)
+    monkeypatch.setattr(location_catalog, '_catalog_path', None)
+    monkeypatch.setattr(location_catalog, '_refresh_thread', None)
+    flask_app = create_app(SQLiteConfig)
+    with flask_app.app_context():
+        db.create_all()
+        db.session.add_all([
+            Route(id=1, route_number='101', route_name='CP - KG', start_location='Connaught Place',
+                  end_location='Kashmere Gate', distance_km=6, fare=20, is_active=True),
+            Stop(route_id=1, stop_name='Chandni Chowk', stop_order=1),
+            Stop(route_id=1, stop_name='Kashmere Gate', stop_order=2),
+        ])
+        db.session.commit()
+        yield flask_app
+        db.session.remove()
+        db.drop_all()
+
+
+def add_stop(name):
+    db.session.add(Stop(route_id=1, stop_name=name, stop_order=3))
+    db.session.commit()
+
+
+def wait_for_refresh():
+    thread = location_catalog._refresh_thread
+    if thread is not None:
+        thread.join(timeout=10)
+
+
+class TestLocationCatalog:
+    """Lazy load, background refresh and the shared file"""
+    
+    def test_loaded_lazily_with_distinct_names(self, catalog_app):
+        assert location_catalog._catalog is None
+        catalog = get_location_catalog()
+        assert catalog.names == ['Chandni Chowk', 'Connaught Place', 'Kashmere Gate']
+        assert get_location_catalog() is catalog
+    
+    def test_refreshed_in_background(self, catalog_app):
+        catalog = get_location_catalog()
+        add_stop('Red Fort')
+        # Within the check interval the loaded catalogue is served as is
+        assert get_location_catalog() is catalog
+        
+        location_catalog.invalidate_location_catalog()
+        served = get_location_catalog()
+        wait_for_refresh()
+        refreshed = get_location_catalog()
+        assert served is catalog or served is refreshed
+        assert 'Red Fort' in refreshed.names and refreshed.version > catalog.version
+    
+    def test_handler_follows_catalog(self, catalog_app):
+        handler = LocationHandler()
+        assert handler.find_best_location_match('chandni chowk')[0] == 'Chandni Chowk'
+        add_stop('Jama Masjid')
+        location_catalog.invalidate_location_catalog()
+        get_location_catalog()
+        wait_for_refresh()
+        assert handler.find_best_location_match('jama masjid') == ('Jama Masjid', 1.0)
+    
+    def test_file_round_trip(self, tmp_path):
+        path = str(tmp_path / 'locations.catalog')
+        LocationCatalog(['Azadpur', 'Model Town', 'Sarai Kāle Khān'], (3, 7)).save(path)
+        assert LocationCatalog.load(path).names == ['Azadpur', 'Model Town', 'Sarai Kāle Khān']
+        assert LocationCatalog.load(path, (3, 7)).signature == (3, 7)
+        assert LocationCatalog.load(path, (3, 8)) is None
+    
+    def test_shared_file(self, catalog_app, tmp_path, monkeypatch):
+        path = str(tmp_path / 'locations.catalog')
+        assert location_catalog.load_location_catalog_file(path) is None
+        written = get_location_catalog()
+        assert LocationCatalog.load(path).names == written.names
+        
+        # Another worker starting up reads the file and skips the name queries
+        monkeypatch.setattr(location_catalog, '_catalog', None)
+        monkeypatch.setattr(location_catalog, 'load_location_names', lambda: pytest.fail('queried the tables'))
+        installed = location_catalog.load_location_catalog_file(path)
+        assert get_location_catalog() is installed
+        assert installed.names == written.names
@@ -0,0 +1,302 @@
+"""
+Tests for the location matching indexes
+Locations are set directly on the handler, no database required
+"""
+
+import pytest
+import random
+import sys
+import os
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Load the models package first so the chatbot modules import cleanly
+import app.models  # noqa: F401
+from app.chatbot_modules.cache import LRUCache
+from app.chatbot_modules.location_handler import LocationHandler, MATCH_BKTREE, MATCH_SCAN
+from app.chatbot_modules.location_index import (
+    TrigramIndex, BKTree, NgramVectorIndex, AhoCorasick, levenshtein, edit_bound, ngrams, match_key
+)
+
+
+LOCATIONS = [
+    'Rohini Sector 18', 'Rohini Sector 3', 'Rohini East', 'Dwarka Sector 21', 'Dwarka Mor',
+    'Connaught Place', 'Kashmere Gate', 'ISBT Kashmere Gate', 'Lajpat Nagar', 'Laxmi Nagar',
+    'Nehru Place', 'Nehru Place Terminal', 'Mayur Vihar', 'Okhla Industrial Area', 'Saket District Centre',
+    'Karol Bagh', 'Shalimar Bagh', 'Pitampura', 'Azadpur', 'Model Town', 'IGI Airport', 'GK',
+]
+
+
+def handler_for(locations):
+    handler = LocationHandler()
+    handler.location_cache = locations
+    return handler
+
+
+def full_scan(handler, query):
+    """find_best_location_match as it was before the index: score every location"""
+    query_normalized = handler.normalize_location(query)
+    best_match, best_score = None, 0.0
+    for location in handler.get_all_locations():
+        score = handler.fuzzy_match(query_normalized, location)
+        if score > best_score:
+            best_match, best_score = location, score
+    return (best_match, best_score) if best_score >= 0.6 else (query_normalized, 0.5)
+
+
+class TestTrigramIndex:
+    """Shortlisting by trigram overlap"""
+    
+    def test_containment_is_shortlisted(self):
+        index = TrigramIndex(LOCATIONS)
+        shortlisted = [LOCATIONS[i] for i in index.shortlist('Kashmere Gate', size=1)]
+        assert 'Kashmere Gate' in shortlisted and 'ISBT Kashmere Gate' in shortlisted
+    
+    def test_ranks_by_overlap(self):
+        index = TrigramIndex(LOCATIONS)
+        assert LOCATIONS[index.shortlist('Shalimr Bagh', size=1)[0]] == 'Shalimar Bagh'
+    
+    def test_short_keys_always_offered(self):
+        index = TrigramIndex(LOCATIONS)
+        assert LOCATIONS.index('GK') in index.shortlist('Pitampura')
+        assert index.shortlist('gk') == list(range(len(LOCATIONS)))
+    
+    def test_unknown_trigrams(self):
+        assert TrigramIndex(LOCATIONS).shortlist('zzzz') == [LOCATIONS.index('GK')]
+
+
+class TestBKTree:
+    """Bounded edit-distance lookup"""
+    
+    def test_levenshtein(self):
+        assert levenshtein('kashmiri gte', 'kashmere gate') == 3
+        assert levenshtein('', 'abc') == 3 and levenshtein('same', 'same') == 0
+        rng = random.Random(9)
+        for _ in range(200):
+            first = ''.join(rng.choice('ab c') for _ in range(rng.randint(0, 12)))
+            second = ''.join(rng.choice('ab c') for _ in range(rng.randint(0, 12)))
+            assert levenshtein(first, second) == levenshtein(second, first)
+            assert abs(len(first) - len(second)) <= levenshtein(first, second) <= max(len(first), len(second))
+    
+    def test_bound_grows_with_length(self):
+        assert [edit_bound(n) for n in (3, 4, 8, 12, 40)] == [0, 1, 2, 3, 3]
+    
+    def test_finds_typos(self):
+        tree = BKTree(LOCATIONS)
+        matches, _ = tree.search('kashmiri gte')
+        assert LOCATIONS[matches[0][1]] == 'Kashmere Gate' and matches[0][0] == 3
+        assert tree.search('GK')[0] == [(0, LOCATIONS.index('GK'))]
+    
+    def test_visits_part_of_the_tree(self):
+        names = [f'{area} Sector {number}' for area in ['Rohini', 'Dwarka', 'Noida', 'Gurgaon'] for number in range(1, 60)]
+        tree = BKTree(names)
+        matches, visited = tree.search('Dwarak Sector 14')
+        assert names[matches[0][1]] == 'Dwarka Sector 14'
+        assert visited < len(names) / 2
+    
+    def test_strategy_switch(self):
+        handler = LocationHandler(strategy=MATCH_BKTREE)
+        handler.location_cache = LOCATIONS
+        match, score = handler.find_best_location_match('Shalimr Bag')
+        assert match == 'Shalimar Bagh' and score == pytest.approx(1 - 2 / 13)
+        # Too far for the edit bound: falls back to the trigram scorer
+        assert handler.find_best_location_match('Okhla')[0] == 'Okhla Industrial Area'
+    
+    def test_unknown_strategy(self):
+        with pytest.raises(ValueError):
+            LocationHandler(strategy='soundex').find_best_location_match('Azadpur')
+
+
+class TestNgramVectorIndex:
+    """Batch TF-IDF cosine matching"""
+    
+    def test_exact_names_score_one(self):
+        ids, scores = NgramVectorIndex(LOCATIONS).best_matches(['nehru place', 'Azadpur '])
+        assert ids.tolist() == [LOCATIONS.index('Nehru Place'), LOCATIONS.index('Azadpur')]
+        assert scores == pytest.approx([1.0, 1.0])
+    
+    def test_typos_and_unknown(self):
+        ids, scores = NgramVectorIndex(LOCATIONS).best_matches(['Shalimr Bagh', 'qqq'])
+        assert LOCATIONS[ids[0]] == 'Shalimar Bagh' and 0.6 < scores[0] < 1.0
+        assert ids[1] == -1 and scores[1] == 0.0
+    
+    def test_ties_go_to_list_order(self):
+        ids, _ = NgramVectorIndex(['Model Town', 'model town']).best_matches(['Model Town'])
+        assert ids.tolist() == [0]
+    
+    def test_batches_agree(self):
+        queries = ['rohini', 'dwarka mor', 'laxmi', 'Kashmere', 'Okhla Ind Area', 'Karol'] * 5
+        index = NgramVectorIndex(LOCATIONS)
+        ids, scores = index.best_matches(queries)
+        small_ids, small_scores = index.best_matches(queries, batch_size=4)
+        assert ids.tolist() == small_ids.tolist() and scores == pytest.approx(small_scores)
+    
+    def test_matches_sklearn(self):
+        text = pytest.importorskip('sklearn.feature_extraction.text')
+        vectorizer = text.TfidfVectorizer(analyzer=lambda name: ngrams(match_key(name)))
+        locations_matrix = vectorizer.fit_transform(LOCATIONS)
+        queries = ['Rohni Sector 3', 'lajpat', 'Mayur Vihar Phase 1', 'Pitampur']
+        expected = (vectorizer.transform(queries) @ locations_matrix.T).toarray()
+        ids, scores = NgramVectorIndex(LOCATIONS).best_matches(queries)
+        assert ids.tolist() == expected.argmax(axis=1).tolist()
+        assert scores == pytest.approx(expected.max(axis=1))
+    
+    def test_handler_batch(self):
+        handler = handler_for(LOCATIONS)
+        matches = handler.find_best_location_matches(['Shalimr Bagh', 'cp', 'Somewhere Else'])
+        assert matches[0][0] == 'Shalimar Bagh'
+        assert matches[1] == ('Connaught Place', pytest.approx(1.0))
+        assert matches[2] == ('Somewhere Else', 0.5)
+
+
+def alias_scan(handler, location):
+    """normalize_location as it was before the automaton: check every alias in turn"""
+    location_lower = location.lower().strip()
+    if location_lower in handler.location_aliases:
+        return handler.location_aliases[location_lower]
+    for alias, full_name in handler.location_aliases.items():
+        if alias in location_lower or location_lower in alias:
+            return full_name
+    return location.title()
+
+
+class TestAliasAutomaton:
+    """Aho-Corasick alias and location lookup"""
+    
+    def test_finds_every_occurrence(self):
+        rng = random.Random(1)
+        for _ in range(500):
+            patterns = list({''.join(rng.choice('ab') for _ in range(rng.randint(1, 4))) for _ in range(rng.randint(1, 6))})
+            text = ''.join(rng.choice('abc') for _ in range(rng.randint(0, 20)))
+            expected = [(i, i + len(pattern), pattern_id) for pattern_id, pattern in enumerate(patterns)
+                        for i in range(len(text)) if text.startswith(pattern, i)]
+            assert sorted(AhoCorasick(patterns).find_all(text)) == sorted(expected)
+    
+    def test_normalize_matches_alias_scan(self):
+        handler = LocationHandler()
+        rng = random.Random(2)
+        words = list(handler.location_aliases) + ['bus', 'from', 'to', 'xyz', 'sector 5', 'ka', '', ' a ']
+        for _ in range(2000):
+            query = ' '.join(rng.choice(words) for _ in range(rng.randint(0, 4)))
+            if query and rng.random() < 0.3:
+                start = rng.randrange(len(query))
+                query = query[start:start + rng.randint(1, 6)]
+            assert handler.normalize_location(query) == alias_scan(handler, query)
+    
+    def test_rebuilt_when_aliases_change(self):
+        handler = LocationHandler()
+        assert handler.normalize_location('near vasant vihar') == 'Near Vasant Vihar'
+        handler.location_aliases['vasant vihar'] = 'Vasant Vihar Depot'
+        assert handler.normalize_location('near vasant vihar') == 'Vasant Vihar Depot'
+    
+    def test_mentions(self):
+        handler = handler_for(LOCATIONS)
+        mentions = handler.find_location_mentions('Bus from ISBT kashmere gate to Model Town, cpu fare?')
+        assert mentions == [
+            (9, 27, 'ISBT Kashmere Gate'), (9, 13, 'ISBT Kashmere Gate'), (14, 27, 'Kashmere Gate'),
+            (14, 22, 'Kashmere Gate'), (31, 41, 'Model Town'),
+        ]
+    
+    def test_mentions_follow_location_reload(self):
+        handler = handler_for(['Azadpur'])
+        assert handler.find_location_mentions('to kalkaji mandir') == [(3, 10, 'Kalkaji Mandir')]
+        handler.location_cache = ['Kalkaji Mandir']
+        assert handler.find_location_mentions('to kalkaji mandir')[0] == (3, 17, 'Kalkaji Mandir')
+
+
+class TestFindBestLocationMatch:
+    """Indexed matching gives the full scan's answer"""
+    
+    @pytest.mark.parametrize('query', [
+        'rohini sector 18', 'Rohni Sector 3', 'kashmere', 'nehru place', 'Lajpat', 'Okhla Industrial',
+        'Mayur Vihar Phase 1', 'Shalimar', 'cp', 'Pitampur', 'Somewhere Else',
+    ])
+    def test_matches_full_scan(self, query):
+        handler = handler_for(LOCATIONS)
+        assert handler.find_best_location_match(query) == full_scan(handler, query)
+        handler.strategy = MATCH_SCAN
+        assert handler.find_best_location_match(query) == full_scan(handler, query)
+    
+    def test_matches_full_scan_with_typos(self):
+        rng = random.Random(4)
+        locations = [f'{area} {kind}' for area in ['Rohini', 'Dwarka', 'Janakpuri', 'Vasant', 'Mayur', 'Tilak']
+                     for kind in ['Nagar', 'Vihar', 'Sector 7', 'Sector 11', 'Enclave', 'Depot']]
+        handler = handler_for(locations)
+        for _ in range(100):
+            name = list(rng.choice(locations))
+            name[rng.randrange(len(name))] = rng.choice('aeiou')
+            query = ''.join(name)
+            assert handler.find_best_location_match(query) == full_scan(handler, query)
+    
+    def test_index_follows_location_reload(self):
+        handler = handler_for(['Azadpur'])
+        assert handler.find_best_location_match('Azadpur')[0] == 'Azadpur'
+        handler.location_cache = ['Kalkaji Mandir']
+        assert handler.find_best_location_match('kalkaji mandir') == ('Kalkaji Mandir', 1.0)
+
+
+class TestTripLocations:
+    """Gazetteer-driven source and destination extraction"""
+    
+    @pytest.mark.parametrize('message, expected', [
+        ('Bus from ISBT kashmere gate to Model Town', ['ISBT Kashmere Gate', 'Model Town']),
+        ('how to reach nehru place from cp', ['Connaught Place', 'Nehru Place']),
+        ('I want to go to model town from azadpur', ['Azadpur', 'Model Town']),
+        ('CP to Lajpat Nagar', ['Connaught Place', 'Lajpat Nagar']),
+        ('karol bagh laxmi nagar', ['Karol Bagh', 'Laxmi Nagar']),
+        ('fare to azadpur', ['Azadpur']),
+        ('from rohini east and azadpur to gk', ['Rohini East', 'GK']),
+        ('buses from pitampura', []),
+        ('Azadpur', []),
+    ])
+    def test_roles(self, message, expected):
+        assert handler_for(LOCATIONS).find_trip_locations(message) == expected
+    
+    def test_resolved_without_fuzzy_matching(self, monkeypatch):
+        handler = handler_for(LOCATIONS)
+        monkeypatch.setattr(handler, 'find_best_location_match', lambda query: pytest.fail(query))
+        assert handler.resolve_locations_from_message('from Okhla Industrial Area to Saket District Centre') == [
+            ('Okhla Industrial Area', 1.0), ('Saket District Centre', 1.0)]
+    
+    def test_falls_back_to_fuzzy_chunks(self):
+        handler = handler_for(LOCATIONS)
+        # 'Shalimr Bgh' is no known name, so the regex chunks are fuzzy matched
+        locations = handler.resolve_locations_from_message('from Shalimr Bgh to Pitampura')
+        assert [location for location, _ in locations] == ['Shalimar Bagh', 'Pitampura']
+        assert locations[0][1] < 1.0
+
+
+class TestMatchCache:
+    """Memoized find_best_location_match"""
+    
+    def test_repeated_inputs_hit(self, monkeypatch):
+        handler = handler_for(LOCATIONS)
+        calls = []
+        match_location = handler.match_location
+        monkeypatch.setattr(handler, 'match_location', lambda query: calls.append(query) or match_location(query))
+        for query in ['cp', 'airport', 'cp', 'cp', 'Rohni Sector 3', 'airport']:
+            handler.find_best_location_match(query)
+        assert calls == ['cp', 'airport', 'Rohni Sector 3']
+        stats = handler.match_cache_stats()
+        assert (stats['hits'], stats['misses'], stats['size']) == (3, 3, 3)
+    
+    def test_bounded(self):
+        handler = handler_for(LOCATIONS)
+        handler.match_cache = LRUCache(maxsize=2)
+        for query in ['cp', 'airport', 'dwarka', 'cp']:
+            handler.find_best_location_match(query)
+        stats = handler.match_cache_stats()
+        assert stats['size'] == 2 and stats['evictions'] == 2 and stats['hits'] == 0
+    
+    def test_emptied_when_sources_change(self):
+        handler = handler_for(['Azadpur'])
+        assert handler.find_best_location_match('kalkaji mandir') == ('Kalkaji Mandir', 0.5)
+        handler.location_cache = ['Kalkaji Mandir', 'Azadpur']
+        assert handler.find_best_location_match('kalkaji mandir') == ('Kalkaji Mandir', 1.0)
+        
+        handler.location_aliases['azad'] = 'Kalkaji Mandir'
+        assert handler.find_best_location_match('azad')[0] == 'Kalkaji Mandir'
+        handler.location_aliases['azad'] = 'Azadpur'
+        assert handler.find_best_location_match('azad')[0] == 'Azadpur'
+        assert handler.match_cache_stats()['hits'] == 0
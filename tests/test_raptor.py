@@ -0,0 +1,97 @@
+"""
+Tests for the RAPTOR journey planner
+Runs on hand-built records, no database required
+"""
+
+import pytest
+import sys
+import os
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Load the models package first so the chatbot modules import cleanly
+import app.models  # noqa: F401
+from app.chatbot_modules.transit_graph import TransitGraph, RouteRecord, StopRecord
+from app.chatbot_modules.raptor import RaptorPlanner, parse_clock, format_clock
+from tests.test_transit_graph import split_terminal  # noqa: F401
+
+
+def make_route(route_id, number, start, end, minutes):
+    return RouteRecord(route_id, number, start, end, 10, 20, minutes)
+
+
+@pytest.fixture
+def planner():
+    """
+    A slow direct route from Azadpur to Saket and a faster pair of routes
+    that change at Kashmere Gate
+    """
+    routes = [
+        make_route(1, 'DIRECT', 'Azadpur', 'Saket', 90),
+        make_route(2, 'NORTH', 'Azadpur', 'Kashmere Gate', 20),
+        make_route(3, 'SOUTH', 'Kashmere Gate', 'Saket', 30),
+    ]
+    stops = [
+        StopRecord(1, 'Model Town', 1, None, None, None),
+        StopRecord(1, 'Karol Bagh', 2, None, None, None),
+        StopRecord(3, 'ITO', 1, None, None, None),
+    ]
+    headways = {'DIRECT': 30, 'NORTH': 10, 'SOUTH': 15}
+    return RaptorPlanner(TransitGraph(routes, stops, headways=headways))
+
+
+class TestClock:
+    """Time helpers"""
+    
+    def test_parse(self):
+        assert parse_clock('08:30') == 510
+        assert parse_clock(75) == 75
+    
+    def test_format(self):
+        assert format_clock(510) == '08:30'
+        assert format_clock(24 * 60 + 5) == '00:05'
+
+
+class TestRaptorPlanner:
+    """Round-based planning"""
+    
+    def test_pareto_front(self, planner):
+        journeys = planner.plan('Azadpur', 'Saket', '08:00')
+        assert [j['transfers'] for j in journeys] == [0, 1]
+        direct, with_change = journeys
+        assert direct['arrival'] == '09:30'
+        # NORTH leaves 08:00, reaches Kashmere Gate 08:20; SOUTH leaves there 08:30, arrives 09:00
+        assert with_change['arrival'] == '09:00'
+        assert [leg['route_number'] for leg in with_change['legs']] == ['NORTH', 'SOUTH']
+        assert with_change['legs'][1]['board'] == 'Kashmere Gate'
+    
+    def test_waits_for_next_departure(self, planner):
+        journeys = planner.plan('Azadpur', 'Saket', '08:01')
+        assert journeys[0]['legs'][0]['departure'] == '08:30'
+    
+    def test_intermediate_stop(self, planner):
+        journeys = planner.plan('Model Town', 'Karol Bagh', '08:00')
+        assert len(journeys) == 1 and journeys[0]['transfers'] == 0
+    
+    def test_transfer_limit(self, planner):
+        journeys = planner.plan('Azadpur', 'ITO', '08:00', max_transfers=0)
+        assert journeys == []
+        journeys = planner.plan('Azadpur', 'ITO', '08:00', max_transfers=1)
+        assert journeys[0]['transfers'] == 1
+    
+    def test_after_service(self, planner):
+        assert planner.plan('Azadpur', 'Saket', '23:30') == []
+    
+    def test_unknown_stop(self, planner):
+        assert planner.plan('Nowhere', 'Saket', '08:00') == []
+    
+    def test_walks_between_nearby_stops(self, split_terminal):
+        planner = RaptorPlanner(TransitGraph(*split_terminal))
+        journeys = planner.plan('Kalkaji', 'Okhla', '08:00')
+        assert len(journeys) == 1 and journeys[0]['transfers'] == 1
+        legs = journeys[0]['legs']
+        assert [leg['mode'] for leg in legs] == ['bus', 'walk', 'bus']
+        assert (legs[1]['board'], legs[1]['alight']) == ('Nehru Place(T)', 'Nehru Place')
+        assert legs[2]['route_id'] == 2
+        assert planner.plan('Nehru Place(T)', 'Nehru Place', '08:00')[0]['legs'][0]['mode'] == 'walk'
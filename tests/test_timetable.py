@@ -0,0 +1,136 @@
+"""
+Tests for departure-time-aware routing over the compiled timetable
+Runs on hand-built records, no database required
+"""
+
+import pytest
+import random
+import sys
+import os
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Load the models package first so the chatbot modules import cleanly
+import app.models  # noqa: F401
+from app.chatbot_modules.transit_graph import TransitGraph, StopRecord, parse_stop_time
+from app.chatbot_modules.raptor import RaptorPlanner, parse_clock
+from app.chatbot_modules.timetable import Timetable
+from tests.test_raptor import make_route
+
+
+@pytest.fixture
+def network():
+    """Same network as the RAPTOR tests: a slow direct route and a faster change at Kashmere Gate"""
+    routes = [
+        make_route(1, 'DIRECT', 'Azadpur', 'Saket', 90),
+        make_route(2, 'NORTH', 'Azadpur', 'Kashmere Gate', 20),
+        make_route(3, 'SOUTH', 'Kashmere Gate', 'Saket', 30),
+    ]
+    stops = [
+        StopRecord(1, 'Model Town', 1, None, None, None),
+        StopRecord(1, 'Karol Bagh', 2, None, None, None),
+        StopRecord(3, 'ITO', 1, None, None, None),
+    ]
+    return TransitGraph(routes, stops, headways={'DIRECT': 30, 'NORTH': 10, 'SOUTH': 15})
+
+
+@pytest.fixture
+def scheduled():
+    """One route whose stops carry the first trip's times, every 20 minutes"""
+    routes = [make_route(1, 'EXPRESS', 'Rohini', 'Pitampura', 60)]
+    stops = [
+        StopRecord(1, 'Rohini', 1, None, None, '07:00'),
+        StopRecord(1, 'Shalimar Bagh', 2, None, None, '07:25'),
+        StopRecord(1, 'Pitampura', 3, None, None, '7:40 AM'),
+    ]
+    return TransitGraph(routes, stops, headways={'EXPRESS': 20})
+
+
+class TestStopTimes:
+    """Stop times feed the per-stop schedule"""
+    
+    def test_parse(self):
+        assert parse_stop_time('08:35') == 515
+        assert parse_stop_time('8.35 pm') == 20 * 60 + 35
+        assert parse_stop_time('12:05 AM') == 5
+        assert parse_stop_time('soon') is None and parse_stop_time(None) is None
+    
+    def test_anchored_schedule(self, scheduled):
+        assert scheduled.route_schedule(0).tolist() == [0, 25, 40]
+        assert scheduled.route_first_departure[0] == 7 * 60
+    
+    def test_interpolates_between_times(self):
+        routes = [make_route(1, 'R', 'A', 'D', 30)]
+        stops = [StopRecord(1, 'B', 1, None, None, '09:10'), StopRecord(1, 'C', 2, None, None, None),
+                 StopRecord(1, 'D', 3, None, None, '09:30')]
+        graph = TransitGraph(routes, stops)
+        # A is one even hop (10 min) before B; C sits halfway between B and D
+        assert graph.route_schedule(0).tolist() == [0, 10, 20, 30]
+        assert graph.route_first_departure[0] == 9 * 60
+    
+    def test_even_split_without_times(self, network):
+        assert network.route_schedule(0).tolist() == [0, 30, 60, 90]
+
+
+class TestTimetable:
+    """Time-dependent earliest arrival"""
+    
+    def test_changes_when_faster(self, network):
+        journey = Timetable(network).earliest_arrival('Azadpur', 'Saket', '08:00')
+        assert journey['arrival'] == '09:00' and journey['transfers'] == 1
+        assert [leg['route_number'] for leg in journey['legs']] == ['NORTH', 'SOUTH']
+        # NORTH reaches Kashmere Gate at 08:20 and SOUTH leaves there at 08:30
+        assert journey['waiting_minutes'] == 10
+    
+    def test_waits_for_scheduled_trip(self, scheduled):
+        journey = Timetable(scheduled).earliest_arrival('Shalimar Bagh', 'Pitampura', '07:30')
+        # Trips pass Shalimar Bagh at 07:25, 07:45, ...
+        assert journey['legs'][0]['departure'] == '07:45'
+        assert journey['arrival'] == '08:00' and journey['waiting_minutes'] == 15
+    
+    def test_stays_on_board(self, network):
+        journey = Timetable(network).earliest_arrival('Model Town', 'Saket', '05:00')
+        assert journey['transfers'] == 0 and journey['legs'][0]['stops'] == 2
+    
+    def test_after_service(self, network):
+        assert Timetable(network).earliest_arrival('Azadpur', 'Saket', '23:30') is None
+    
+    def test_unknown_stop(self, network):
+        assert Timetable(network).earliest_arrival('Nowhere', 'Saket', '08:00') is None
+    
+    def test_walks_between_stops(self):
+        routes = [make_route(1, 'IN', 'Kalkaji', 'Nehru Place(T)', 15), make_route(2, 'OUT', 'Nehru Place', 'Okhla', 10)]
+        stops = [
+            StopRecord(1, 'Nehru Place(T)', 1, 28.5495, 77.2530, None),
+            StopRecord(2, 'Nehru Place', 1, 28.5490, 77.2545, None),
+        ]
+        graph = TransitGraph(routes, stops, headways={'IN': 10, 'OUT': 10})
+        journey = Timetable(graph).earliest_arrival('Kalkaji', 'Okhla', '08:00')
+        assert [leg['mode'] for leg in journey['legs']] == ['bus', 'walk', 'bus']
+        assert journey['transfers'] == 1
+        # Off IN at 08:15, a ~2 minute walk, then OUT at 08:20
+        assert journey['legs'][2]['departure'] == '08:20' and journey['arrival'] == '08:30'
+    
+    def test_matches_raptor(self):
+        rng = random.Random(3)
+        names = [f'Stop {i}' for i in range(40)]
+        routes, stops, headways = [], [], {}
+        for route_id in range(1, 25):
+            served = rng.sample(names, rng.randint(3, 7))
+            routes.append(make_route(route_id, f'R{route_id}', served[0], served[-1], rng.randint(15, 70)))
+            headways[f'R{route_id}'] = rng.choice([10, 15, 20, 30])
+            stops += [StopRecord(route_id, name, order, None, None, None) for order, name in enumerate(served[1:-1], 1)]
+        graph = TransitGraph(routes, stops, headways=headways)
+        timetable, planner = Timetable(graph), RaptorPlanner(graph)
+        
+        for _ in range(60):
+            source, destination = rng.sample(names, 2)
+            if source not in graph or destination not in graph:
+                continue
+            journey = timetable.earliest_arrival(source, destination, '08:07')
+            journeys = planner.plan(source, destination, '08:07', max_transfers=len(routes))
+            if not journeys:
+                assert journey is None
+            else:
+                assert parse_clock(journey['arrival']) == parse_clock(journeys[-1]['arrival'])
@@ -0,0 +1,462 @@
+"""
+Tests for the shared transit graph and the pathfinding search
+Runs on hand-built records, no database required
+"""
+
+import pytest
+import numpy as np
+import sys
+import os
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Load the models package first so the chatbot modules import cleanly
+import app.models  # noqa: F401
+from app.chatbot_modules.transit_graph import (
+    TransitGraph, RouteRecord, StopRecord, MISSING_DISTANCE_KM, WALK_ROUTE, haversine_km
+)
+from app.chatbot_modules.contraction import ContractionHierarchy
+from app.chatbot_modules import algorithms
+from app.chatbot_modules.algorithms import PathfindingAlgorithms, DISTANCE, FARE, ROUTE_FARE, ASTAR, BIDIRECTIONAL
+
+
+def make_route(route_id, start, end, distance, fare):
+    return RouteRecord(route_id, f'R{route_id}', start, end, distance, fare, None)
+
+
+def make_stop(route_id, name, order, latitude=None, longitude=None):
+    return StopRecord(route_id, name, order, latitude, longitude, None)
+
+
+def grid_network(size=12, spacing=0.01):
+    """Square grid of stops with coordinates; each row and column is a two-way route pair"""
+    def name(row, col):
+        return f'G{row}-{col}'
+    
+    routes, stops = [], []
+    hop_km = 1.2  # a little longer than the ~1.1 km between neighbouring grid points
+    lines = [[(row, col) for col in range(size)] for row in range(size)]
+    lines += [[(row, col) for row in range(size)] for col in range(size)]
+    for line in lines:
+        for points in (line, line[::-1]):
+            route_id = len(routes) + 1
+            routes.append(make_route(route_id, name(*points[0]), name(*points[-1]), hop_km * (size - 1), 10))
+            for order, (row, col) in enumerate(points, 1):
+                stops.append(make_stop(route_id, name(row, col), order, 28.5 + row * spacing, 77.1 + col * spacing))
+    return TransitGraph(routes, stops)
+
+
+@pytest.fixture
+def network():
+    """Two routes meeting at Kashmere Gate plus an expensive direct route"""
+    routes = [
+        make_route(1, 'Connaught Place', 'Kashmere Gate', 6, 20),
+        make_route(2, 'Kashmere Gate', 'Azadpur', 9, 15),
+        make_route(3, 'Connaught Place', 'Azadpur', 20, 50),
+    ]
+    stops = [
+        make_stop(1, 'Connaught Place', 1),
+        make_stop(1, 'Chandni Chowk', 2),
+        make_stop(1, 'Kashmere Gate', 3),
+        make_stop(2, 'Model Town', 1),
+    ]
+    return TransitGraph(routes, stops, version=7)
+
+
+class TestTransitGraph:
+    """Graph construction"""
+    
+    def test_nodes_include_stops(self, network):
+        for name in ['Connaught Place', 'Chandni Chowk', 'Kashmere Gate', 'Model Town', 'Azadpur']:
+            assert name in network
+    
+    def test_version_is_kept(self, network):
+        assert network.version == 7
+    
+    def test_repeated_endpoints_collapse(self, network):
+        # Route 1 lists its terminals as stops; segments must still sum to the route distance
+        segments = [e for e in network.neighbors('Connaught Place') if e[3] == 1]
+        assert sorted(e[0] for e in segments) == ['Chandni Chowk', 'Kashmere Gate']
+        assert sum(e[1] for e in segments if e[0] == 'Chandni Chowk') == pytest.approx(3)
+    
+    def test_missing_distance_uses_sentinel(self):
+        graph = TransitGraph([make_route(1, 'A', 'B', None, 10)], [])
+        assert graph.neighbors('A')[0][1] == MISSING_DISTANCE_KM
+    
+    def test_edge_count(self, network):
+        # route 1: direct + 2 segments, route 2: direct + 2 segments, route 3: direct
+        assert network.edge_count == 7
+    
+    def test_csr_layout(self, network):
+        assert len(network.offsets) == network.node_count + 1
+        assert network.offsets[-1] == network.edge_count
+        assert network.out_degree().sum() == network.edge_count
+        assert network.targets.dtype == np.int32
+    
+    def test_node_ids_are_interned(self, network):
+        for name, node in network.node_ids.items():
+            assert network.node_names[node] == name
+
+
+@pytest.fixture
+def split_terminal():
+    """Two routes that meet at differently named stops ~150 m apart"""
+    routes = [
+        make_route(1, 'Kalkaji', 'Nehru Place(T)', 4, 10),
+        make_route(2, 'Nehru Place', 'Okhla', 5, 15),
+    ]
+    stops = [
+        make_stop(1, 'Kalkaji', 1, 28.540, 77.259),
+        make_stop(1, 'Nehru Place(T)', 2, 28.5495, 77.2530),
+        make_stop(2, 'Nehru Place', 1, 28.5490, 77.2545),
+        make_stop(2, 'Okhla', 2, 28.560, 77.270),
+    ]
+    return routes, stops
+
+
+class TestWalkingTransfers:
+    """Walking edges between nearby stops"""
+    
+    def test_nearby_stops_are_linked(self, split_terminal):
+        graph = TransitGraph(*split_terminal)
+        walks = graph.walking_edges()
+        assert sorted((graph.node_names[graph.sources[e]], graph.node_names[graph.targets[e]]) for e in walks) == [
+            ('Nehru Place', 'Nehru Place(T)'), ('Nehru Place(T)', 'Nehru Place')
+        ]
+        assert graph.fare[walks].tolist() == [0, 0]
+        assert graph.neighbors('Nehru Place')[0][3] is None   # free to board, so listed first
+    
+    def test_radius(self, split_terminal):
+        assert len(TransitGraph(*split_terminal, walk_radius_km=0).walking_edges()) == 0
+        assert len(TransitGraph(*split_terminal, walk_radius_km=0.1).walking_edges()) == 0
+    
+    def test_every_engine_walks(self, split_terminal):
+        graph = TransitGraph(*split_terminal)
+        for engine in (algorithms.DIJKSTRA, ASTAR, BIDIRECTIONAL):
+            result = PathfindingAlgorithms.search(graph, 'Kalkaji', 'Okhla', DISTANCE, engine=engine)
+            assert result.path == ['Kalkaji', 'Nehru Place(T)', 'Nehru Place', 'Okhla']
+            assert result.route_id == 2
+        assert PathfindingAlgorithms.search(graph, 'Kalkaji', 'Okhla', FARE).cost == 25
+        cost, _, _ = ContractionHierarchy.build(graph).query(graph.node_ids['Kalkaji'], graph.node_ids['Okhla'])
+        assert cost == pytest.approx(PathfindingAlgorithms.search(graph, 'Kalkaji', 'Okhla', DISTANCE).cost)
+    
+    def test_itinerary_has_walk_leg(self, split_terminal):
+        graph = TransitGraph(*split_terminal)
+        legs = PathfindingAlgorithms.yen_k_shortest(graph, 'Kalkaji', 'Okhla', FARE, 1)[0]['legs']
+        assert [leg['mode'] for leg in legs] == ['bus', 'walk', 'bus']
+        assert legs[1]['route_id'] is None
+    
+    def test_matches_brute_force(self):
+        graph = grid_network(size=8, spacing=0.002)
+        walks = graph.walking_edges()
+        found = set(zip(graph.sources[walks].tolist(), graph.targets[walks].tolist()))
+        lat, lon = graph.node_lat, graph.node_lon
+        expected = {
+            (a, b) for a in range(graph.node_count) for b in range(graph.node_count)
+            if a != b and haversine_km(lat[a], lon[a], lat[b], lon[b]) <= graph.walk_radius_km
+        }
+        assert found == expected and len(found) > 0
+    
+    def test_patch_recomputes_walks(self, split_terminal):
+        routes, stops = split_terminal
+        graph = TransitGraph(routes, stops, version=1)
+        patched = graph.with_route(2, routes[1], [make_stop(2, 'Okhla', 2, 28.560, 77.270)])
+        assert (patched.edge_route == WALK_ROUTE).sum() == 0
+        assert patched.history[-1][2] is False   # cached walks are no longer valid
+
+
+class TestSearch:
+    """Dijkstra search on the graph"""
+    
+    def test_shortest_distance_transfers(self, network):
+        route_id, cost, path, _ = PathfindingAlgorithms.search(network, 'Connaught Place', 'Azadpur', DISTANCE)
+        assert cost == pytest.approx(15)
+        assert path[0] == 'Connaught Place' and path[-1] == 'Azadpur'
+        assert route_id == 2
+    
+    def test_minimum_fare(self, network):
+        route_id, cost, path, _ = PathfindingAlgorithms.search(network, 'Connaught Place', 'Azadpur', FARE)
+        assert cost == pytest.approx(35)
+        assert route_id == 2
+    
+    def test_route_fare_paid_once_per_boarding(self, network):
+        # Riding one stop of route 1 costs its whole fare, not a per-stop share
+        assert PathfindingAlgorithms.search(network, 'Connaught Place', 'Chandni Chowk', FARE).cost == pytest.approx(10)
+        assert PathfindingAlgorithms.search(network, 'Connaught Place', 'Chandni Chowk', ROUTE_FARE).cost == 20
+        result = PathfindingAlgorithms.search(network, 'Connaught Place', 'Azadpur', ROUTE_FARE)
+        assert result.cost == 35 and result.route_id == 2
+    
+    def test_route_fare_stays_on_board(self):
+        routes = [make_route(1, 'A', 'D', 9, 10), make_route(2, 'B', 'C', 3, 4)]
+        stops = [make_stop(1, 'B', 1), make_stop(1, 'C', 2)]
+        graph = TransitGraph(routes, stops)
+        # Changing to the cheap route 2 for B-C would mean paying route 1 again
+        result = PathfindingAlgorithms.search(graph, 'A', 'D', ROUTE_FARE)
+        assert result.cost == 10 and result.route_id == 1
+        assert PathfindingAlgorithms.search(graph, 'B', 'C', ROUTE_FARE).cost == 4
+    
+    def test_neighbours_sorted_by_boarding_fare(self, network):
+        for node in range(network.node_count):
+            start, end = network.offsets[node], network.offsets[node + 1]
+            fares = network.route_fare[network.edge_route[start:end]].tolist()
+            assert fares == sorted(fares)
+    
+    def test_unreachable(self, network):
+        assert PathfindingAlgorithms.search(network, 'Azadpur', 'Connaught Place', DISTANCE).path is None
+    
+    def test_unknown_source(self, network):
+        assert PathfindingAlgorithms.search(network, 'Nowhere', 'Azadpur', DISTANCE).path is None
+
+
+class TestAStar:
+    """A* with the great-circle heuristic"""
+    
+    def test_same_cost_as_dijkstra(self):
+        graph = grid_network()
+        for source, destination in [('G0-0', 'G11-11'), ('G3-7', 'G9-1'), ('G5-5', 'G5-6')]:
+            plain = PathfindingAlgorithms.search(graph, source, destination, DISTANCE)
+            guided = PathfindingAlgorithms.search(graph, source, destination, DISTANCE, engine=ASTAR)
+            assert guided.cost == pytest.approx(plain.cost)
+    
+    def test_expands_fewer_nodes(self):
+        graph = grid_network()
+        plain = PathfindingAlgorithms.search(graph, 'G5-5', 'G5-11', DISTANCE)
+        guided = PathfindingAlgorithms.search(graph, 'G5-5', 'G5-11', DISTANCE, engine=ASTAR)
+        assert guided.expanded < plain.expanded
+    
+    def test_heuristic_never_exceeds_edges(self):
+        graph = grid_network()
+        assert 0 < graph.heuristic_scale <= 1.0
+    
+    def test_detour_through_unlocated_stops(self):
+        # S-U-X-T costs 2 km, but U is as far from T as S and X has no coordinates
+        routes = [
+            make_route(1, 'S', 'T', 8, 10),
+            make_route(2, 'S', 'U', 1, 10),
+            make_route(3, 'U', 'X', 0.5, 10),
+            make_route(4, 'X', 'T', 0.5, 10),
+        ]
+        stops = [
+            make_stop(1, 'S', 1, 28.50, 77.10), make_stop(1, 'T', 2, 28.59, 77.10),
+            make_stop(2, 'U', 2, 28.50, 77.09),
+        ]
+        graph = TransitGraph(routes, stops)
+        assert graph.heuristic_scale < 0.2
+        result = PathfindingAlgorithms.search(graph, 'S', 'T', DISTANCE, engine=ASTAR)
+        assert result.path == ['S', 'U', 'X', 'T'] and result.cost == pytest.approx(2)
+    
+    def test_calibrated_on_first_use(self, monkeypatch):
+        calls = []
+        calibrate = TransitGraph._calibrate_heuristic
+        monkeypatch.setattr(TransitGraph, '_calibrate_heuristic', lambda graph: calls.append(graph) or calibrate(graph))
+        graph = grid_network(size=4)
+        patched = graph.with_route(1, None)
+        assert calls == []
+        PathfindingAlgorithms.search(patched, 'G0-0', 'G3-3', DISTANCE, engine=ASTAR)
+        PathfindingAlgorithms.search(patched, 'G3-3', 'G0-0', DISTANCE, engine=ASTAR)
+        assert calls == [patched]
+    
+    def test_missing_coordinates_fall_back(self, network):
+        assert not any(network.distance_lower_bounds(0))
+        result = PathfindingAlgorithms.search(network, 'Connaught Place', 'Azadpur', DISTANCE, engine=ASTAR)
+        assert result.cost == pytest.approx(15)
+
+
+class TestBidirectional:
+    """Bidirectional Dijkstra"""
+    
+    @pytest.mark.parametrize('metric', [DISTANCE, FARE])
+    def test_matches_dijkstra(self, metric):
+        graph = grid_network()
+        for source, destination in [('G0-0', 'G11-11'), ('G3-7', 'G9-1'), ('G5-5', 'G5-6'), ('G2-2', 'G2-2')]:
+            plain = PathfindingAlgorithms.search(graph, source, destination, metric)
+            both = PathfindingAlgorithms.search(graph, source, destination, metric, engine=BIDIRECTIONAL)
+            assert both.cost == pytest.approx(plain.cost)
+            assert both.path[0] == source and both.path[-1] == destination
+    
+    def test_return_contract(self, network):
+        result = PathfindingAlgorithms.search(network, 'Connaught Place', 'Azadpur', DISTANCE, engine=BIDIRECTIONAL)
+        assert result.cost == pytest.approx(15)
+        assert result.route_id == 2
+    
+    def test_unreachable(self, network):
+        result = PathfindingAlgorithms.search(network, 'Azadpur', 'Connaught Place', DISTANCE, engine=BIDIRECTIONAL)
+        assert result.path is None
+    
+    def test_unknown_engine(self, network):
+        with pytest.raises(ValueError):
+            PathfindingAlgorithms.search(network, 'Connaught Place', 'Azadpur', DISTANCE, engine='teleport')
+
+
+class TestYen:
+    """K-shortest loopless itineraries"""
+    
+    def test_ranked_alternatives(self, network):
+        itineraries = PathfindingAlgorithms.yen_k_shortest(network, 'Connaught Place', 'Azadpur', DISTANCE, 3)
+        assert [it['cost'] for it in itineraries] == [15, 20]
+        assert [leg['route_id'] for leg in itineraries[0]['legs']] == [1, 2]
+        assert itineraries[1]['fare'] == 50
+    
+    def test_segments_and_direct_edge_reported_once(self, network):
+        itineraries = PathfindingAlgorithms.yen_k_shortest(network, 'Connaught Place', 'Kashmere Gate', DISTANCE, 3)
+        assert len(itineraries) == 1
+        assert itineraries[0]['legs'][0]['alight'] == 'Kashmere Gate'
+    
+    def test_by_fare(self, network):
+        itineraries = PathfindingAlgorithms.yen_k_shortest(network, 'Connaught Place', 'Azadpur', FARE, 2)
+        assert [it['cost'] for it in itineraries] == [35, 50]
+    
+    def test_fare_is_ticket_price(self, network):
+        # One stop of route 1 then route 2: route 1's fare is paid in full
+        itinerary = PathfindingAlgorithms.yen_k_shortest(network, 'Chandni Chowk', 'Azadpur', FARE, 1)[0]
+        assert itinerary['cost'] == pytest.approx(25)
+        assert itinerary['fare'] == 35
+    
+    def test_matches_enumeration(self):
+        # Single-hop routes with random distances: every loopless edge path is a distinct itinerary
+        rng = np.random.default_rng(5)
+        routes = []
+        for route_id in range(1, 31):
+            start, end = rng.choice(8, size=2, replace=False)
+            routes.append(make_route(route_id, f'N{start}', f'N{end}', float(rng.integers(1, 20)), 10))
+        graph = TransitGraph(routes, [])
+        source, target = graph.node_ids.get('N0'), graph.node_ids.get('N7')
+        
+        def walk(node, visited, cost):
+            if node == target:
+                yield round(cost, 2)
+                return
+            for edge in range(graph.offsets[node], graph.offsets[node + 1]):
+                neighbor = int(graph.targets[edge])
+                if neighbor not in visited:
+                    yield from walk(neighbor, visited | {neighbor}, cost + float(graph.distance[edge]))
+        
+        expected = sorted(walk(source, {source}, 0.0))
+        assert len(expected) >= 5
+        itineraries = PathfindingAlgorithms.yen_k_shortest(graph, 'N0', 'N7', DISTANCE, 5)
+        assert [it['cost'] for it in itineraries] == expected[:5]
+    
+    def test_unreachable(self, network):
+        assert PathfindingAlgorithms.yen_k_shortest(network, 'Azadpur', 'Connaught Place', DISTANCE, 3) == []
+
+
+class TestReachability:
+    """Bounded one-to-many search"""
+    
+    def test_within_distance(self, network):
+        stops = PathfindingAlgorithms.reachable_within(network, 'Connaught Place', 6, DISTANCE)
+        assert [stop['stop'] for stop in stops] == ['Chandni Chowk', 'Kashmere Gate']
+        assert stops[-1]['cost'] == pytest.approx(6)
+    
+    def test_within_fare(self, network):
+        stops = {stop['stop']: stop['cost'] for stop in
+                 PathfindingAlgorithms.reachable_within(network, 'Connaught Place', 30, FARE)}
+        assert set(stops) == {'Chandni Chowk', 'Kashmere Gate', 'Model Town'}
+        assert stops['Model Town'] == pytest.approx(27.5)
+    
+    def test_within_route_fare(self, network, split_terminal):
+        stops = {stop['stop']: stop['cost'] for stop in
+                 PathfindingAlgorithms.reachable_within(network, 'Connaught Place', 30, ROUTE_FARE)}
+        assert stops == {'Chandni Chowk': 20, 'Kashmere Gate': 20}
+        graph = TransitGraph(*split_terminal)
+        stops = PathfindingAlgorithms.reachable_within(graph, 'Kalkaji', 25, ROUTE_FARE)
+        assert [(stop['stop'], stop['cost']) for stop in stops] == [
+            ('Nehru Place(T)', 10), ('Nehru Place', 10), ('Okhla', 25)
+        ]
+    
+    def test_matches_point_to_point(self):
+        graph = grid_network()
+        stops = PathfindingAlgorithms.reachable_within(graph, 'G5-5', 5, DISTANCE)
+        assert stops and all(stop['latitude'] is not None for stop in stops)
+        for stop in stops:
+            assert stop['cost'] <= 5
+            assert stop['cost'] == pytest.approx(PathfindingAlgorithms.search(graph, 'G5-5', stop['stop'], DISTANCE).cost)
+        assert len(stops) == sum(
+            1 for name in graph.node_names
+            if name != 'G5-5' and (PathfindingAlgorithms.search(graph, 'G5-5', name, DISTANCE).cost or 99) <= 5
+        )
+    
+    def test_unknown_source(self, network):
+        assert PathfindingAlgorithms.reachable_within(network, 'Nowhere', 10, DISTANCE) == []
+
+
+class TestODMatrix:
+    """Batch origin-destination costs"""
+    
+    def test_matches_point_to_point(self):
+        graph = grid_network()
+        pairs = [(f'G{i}-0', f'G{11 - i}-{j}') for i in range(0, 12, 3) for j in range(0, 12, 4)]
+        matrix = PathfindingAlgorithms.od_matrix_for_graph(graph, pairs, processes=1)
+        assert matrix.distance.shape == (len(matrix.origins), len(matrix.destinations))
+        for source, destination in pairs:
+            row, col = matrix.origins.index(source), matrix.destinations.index(destination)
+            assert matrix.distance[row, col] == pytest.approx(PathfindingAlgorithms.search(graph, source, destination, DISTANCE).cost)
+            assert matrix.fare[row, col] == pytest.approx(PathfindingAlgorithms.search(graph, source, destination, ROUTE_FARE).cost)
+    
+    def test_unknown_and_unreachable_are_nan(self, network):
+        pairs = [('Azadpur', 'Connaught Place'), ('Nowhere', 'Azadpur'), ('Connaught Place', 'Azadpur')]
+        matrix = PathfindingAlgorithms.od_matrix_for_graph(network, pairs, processes=1)
+        assert np.isnan(matrix.distance[0, 0])
+        assert np.isnan(matrix.distance[1]).all()
+        assert matrix.distance[2, 1] == pytest.approx(15)
+        assert matrix.fare[2, 1] == pytest.approx(35)
+    
+    def test_fare_pays_each_boarding_once(self, network, split_terminal):
+        pairs = [('Chandni Chowk', 'Azadpur'), ('Connaught Place', 'Chandni Chowk')]
+        matrix = PathfindingAlgorithms.od_matrix_for_graph(network, pairs, processes=1)
+        assert matrix.fare[0, 0] == 35 and matrix.fare[1, 1] == 20
+        matrix = PathfindingAlgorithms.od_matrix_for_graph(TransitGraph(*split_terminal), [('Kalkaji', 'Okhla')], processes=1)
+        assert matrix.fare[0, 0] == 25
+    
+    def test_process_pool_matches_inline(self):
+        graph = grid_network()
+        pairs = [(name, 'G11-11') for name in graph.node_names[:40]] + [('G0-0', name) for name in graph.node_names[::7]]
+        inline = PathfindingAlgorithms.od_matrix_for_graph(graph, pairs, processes=1)
+        pooled = PathfindingAlgorithms.od_matrix_for_graph(graph, pairs, processes=2)
+        assert np.array_equal(inline.distance, pooled.distance, equal_nan=True)
+        assert np.array_equal(inline.fare, pooled.fare, equal_nan=True)
+
+
+class TestPathCache:
+    """Cached point-to-point search"""
+    
+    @pytest.fixture(autouse=True)
+    def fresh_cache(self, monkeypatch):
+        monkeypatch.setattr(algorithms, '_path_cache', None)
+    
+    def test_repeat_is_a_hit(self, network):
+        first = PathfindingAlgorithms.cached_search(network, 'Connaught Place', 'Azadpur', DISTANCE)
+        second = PathfindingAlgorithms.cached_search(network, 'Connaught Place', 'Azadpur', DISTANCE)
+        assert second is first
+        stats = PathfindingAlgorithms.cache_stats()
+        assert (stats['hits'], stats['misses']) == (1, 1)
+    
+    def test_names_are_not_folded(self):
+        # Case-variant names are distinct nodes; a warm cache must not answer for the other one
+        graph = TransitGraph([make_route(1, 'Sector 62', 'Okhla', 5, 10), make_route(2, 'sector 62', 'Noida', 3, 10)], [])
+        assert PathfindingAlgorithms.cached_search(graph, 'Sector 62', 'Okhla', DISTANCE).path is not None
+        assert PathfindingAlgorithms.cached_search(graph, 'sector 62', 'Okhla', DISTANCE).path is None
+        assert PathfindingAlgorithms.cached_search(graph, 'sector 62 ', 'Okhla', DISTANCE).path is None
+    
+    def test_engine_is_part_of_the_key(self):
+        graph = grid_network()
+        plain = PathfindingAlgorithms.cached_search(graph, 'G5-5', 'G5-11', DISTANCE)
+        guided = PathfindingAlgorithms.cached_search(graph, 'G5-5', 'G5-11', DISTANCE, engine=ASTAR)
+        assert guided is not plain and guided.expanded < plain.expanded
+    
+    def test_metric_is_part_of_the_key(self, network):
+        by_distance = PathfindingAlgorithms.cached_search(network, 'Connaught Place', 'Azadpur', DISTANCE)
+        by_fare = PathfindingAlgorithms.cached_search(network, 'Connaught Place', 'Azadpur', FARE)
+        assert (by_distance.cost, by_fare.cost) == (pytest.approx(15), pytest.approx(35))
+    
+    def test_new_graph_version_empties_cache(self, network):
+        PathfindingAlgorithms.cached_search(network, 'Connaught Place', 'Azadpur', DISTANCE)
+        rebuilt = TransitGraph([make_route(1, 'Connaught Place', 'Azadpur', 4, 10)], [], version=8)
+        result = PathfindingAlgorithms.cached_search(rebuilt, 'Connaught Place', 'Azadpur', DISTANCE)
+        assert result.cost == pytest.approx(4)
+        assert PathfindingAlgorithms.cache_stats()['size'] == 1
+    
+    def test_unknown_locations_not_cached(self, network):
+        PathfindingAlgorithms.cached_search(network, 'Nowhere', 'Azadpur', DISTANCE)
+        assert PathfindingAlgorithms.cache_stats()['size'] == 0